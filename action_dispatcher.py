@@ -0,0 +1,271 @@
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from config import GESTURE_ACTIONS, ACTION_LIMITS
+from metrics import metrics as default_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ActionResult:
+    """Resultado de una acción despachada, entregado al callback de finalización.
+
+    repeat es el número de pedidos agrupados en esta llamada; dropped, cuántos
+    de ellos descartó el límite de tasa (todos si la acción no se ejecutó).
+    """
+
+    __slots__ = ('gesture', 'command', 'context', 'repeat', 'dropped', 'success', 'timed_out', 'error',
+                 'queued_at', 'ready_at', 'started_at', 'finished_at')
+
+    def __init__(self, gesture, command, context, queued_at, ready_at):
+        self.gesture = gesture
+        self.command = command
+        self.context = context
+        self.repeat = 1
+        self.dropped = 0
+        self.success = False
+        self.timed_out = False
+        self.error = None
+        self.queued_at = queued_at
+        self.ready_at = ready_at
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def queue_wait(self):
+        return (self.started_at or self.queued_at) - self.queued_at
+
+    @property
+    def latency(self):
+        return (self.finished_at or self.queued_at) - self.queued_at
+
+
+class TokenBucket:
+    """rate acciones por segundo con ráfagas de hasta burst"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self._updated = time.perf_counter()
+
+    def take(self, count=1, now=None):
+        """Tomar hasta count fichas; retorna cuántas se concedieron"""
+        now = time.perf_counter() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        granted = min(count, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+
+class ActionDispatcher:
+    """Ejecuta las acciones del sistema fuera de la pipeline de la cámara.
+
+    submit() solo encola (cola acotada: si está llena la acción se rechaza) y
+    un hilo propio las ejecuta de a una, en orden, para que las teclas de dos
+    gestos no se mezclen. Cada acción tiene un timeout (por gesto con 'timeout'
+    en GESTURE_ACTIONS); si lo supera se informa como fallida y el despachador
+    sigue con la siguiente en un ejecutor nuevo, dejando la colgada terminar por
+    su cuenta. on_done(resultado) se llama en el hilo del despachador.
+
+    Con ACTION_LIMITS, los comandos repetibles (volumen, F5) esperan 'window'
+    segundos en la cola y los pedidos del mismo comando que llegan mientras
+    tanto se suman a ese (repeat) en lugar de encolarse: una ráfaga cuesta una
+    sola llamada. Antes de ejecutar, un token bucket por comando descarta lo que
+    supera su tasa.
+    """
+
+    def __init__(self, controller, queue_size=8, timeout=5.0, limits=None, metrics=None):
+        self.controller = controller
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.limits = ACTION_LIMITS if limits is None else limits
+        self.metrics = metrics or default_metrics
+        self._jobs = deque()
+        self._cond = threading.Condition()
+        self._buckets = {command: TokenBucket(limit['rate'], limit.get('burst', 1))
+                         for command, limit in self.limits.items() if limit.get('rate')}
+        self._executor = self._new_executor()
+        self._closed = False
+        self.submitted = 0
+        self.completed = 0
+        self.executed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.merged = 0
+        self.dropped = 0
+        self.per_command = {}
+        self._thread = threading.Thread(target=self._run, name='action-dispatcher', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _new_executor():
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix='action')
+
+    def _command_stats(self, command):
+        stats = self.per_command.get(command)
+        if stats is None:
+            stats = self.per_command[command] = {'dispatched': 0, 'merged': 0, 'dropped': 0}
+        return stats
+
+    def submit(self, gesture, on_done=None, context=None):
+        """Encolar la acción de un gesto; False si la cola está llena o el despachador cerró.
+
+        Un pedido agrupado con otro ya encolado retorna True y no llama a su
+        on_done: el resultado del grupo llega una vez, con repeat.
+        """
+        if self._closed:
+            return False
+        command = GESTURE_ACTIONS.get(gesture, {}).get('command')
+        limit = self.limits.get(command, {})
+        now = time.perf_counter()
+        with self._cond:
+            if limit.get('coalesce'):
+                for job, _ in self._jobs:
+                    if job.command == command and job.started_at is None:
+                        if job.repeat < limit.get('max_repeat', 1 << 30):
+                            job.repeat += 1
+                            self.merged += 1
+                            self._command_stats(command)['merged'] += 1
+                            self.metrics.increment('actions_merged')
+                        else:
+                            self._drop(command, 1)
+                        return True
+            if len(self._jobs) >= self.queue_size:
+                self.rejected += 1
+                self.metrics.increment('actions_rejected')
+                logger.warning(f"Cola de acciones llena: se descarta {gesture}")
+                return False
+            ready_at = now + limit.get('window', 0.0) if limit.get('coalesce') else now
+            self._jobs.append((ActionResult(gesture, command, context, now, ready_at), on_done))
+            self.submitted += 1
+            self.metrics.set_gauge('action_queue_depth', len(self._jobs))
+            self._cond.notify()
+        return True
+
+    def _drop(self, command, count):
+        self.dropped += count
+        self._command_stats(command)['dropped'] += count
+        self.metrics.increment('actions_dropped', count)
+
+    def _next_job(self):
+        """Primera acción lista: las que esperan su ventana de agrupación no frenan a las demás"""
+        with self._cond:
+            while True:
+                if not self._jobs:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                now = time.perf_counter()
+                for item in self._jobs:
+                    job = item[0]
+                    if job.ready_at <= now or self._closed:
+                        self._jobs.remove(item)
+                        # Desde aquí no se le suman más repeticiones
+                        job.started_at = now
+                        self.metrics.set_gauge('action_queue_depth', len(self._jobs))
+                        return item
+                self._cond.wait(min(job.ready_at for job, _ in self._jobs) - now)
+
+    def _run(self):
+        while True:
+            item = self._next_job()
+            if item is None:
+                break
+            result, on_done = item
+            self._execute(result)
+            if on_done:
+                try:
+                    on_done(result)
+                except Exception as e:
+                    logger.error(f"Error en el callback de la acción {result.gesture}: {e}")
+            self.completed += 1
+
+    def _execute(self, result):
+        gesture = result.gesture
+        command = result.command
+        limit = self.limits.get(command, {})
+        self.metrics.observe('action_queue_wait', result.queue_wait)
+
+        # Un comando idempotente (F5) se ejecuta una vez aunque agrupe varios pedidos
+        repeat = 1 if limit.get('idempotent') else result.repeat
+        bucket = self._buckets.get(command)
+        if bucket:
+            granted = bucket.take(repeat)
+            if granted < repeat:
+                self._drop(command, repeat - granted)
+            repeat = granted
+        if repeat == 0:
+            result.dropped = result.repeat
+            result.error = "Límite de tasa superado"
+            result.finished_at = time.perf_counter()
+            return
+        result.dropped = result.repeat - repeat if not limit.get('idempotent') else 0
+
+        timeout = float(GESTURE_ACTIONS.get(gesture, {}).get('timeout', self.timeout))
+        self._command_stats(command)['dispatched'] += 1
+        future = self._executor.submit(self.controller.execute_action, gesture, repeat)
+        try:
+            result.success = bool(future.result(timeout=timeout))
+        except FutureTimeout:
+            result.timed_out = True
+            result.error = f"La acción superó {timeout:.1f} s"
+            self.timed_out += 1
+            self.metrics.increment('actions_timed_out')
+            logger.error(f"Acción {gesture} sin respuesta tras {timeout:.1f} s")
+            # El hilo colgado sigue ocupado: las siguientes acciones van a un ejecutor nuevo
+            self._executor.shutdown(wait=False)
+            self._executor = self._new_executor()
+        except Exception as e:
+            result.error = str(e)
+        result.finished_at = time.perf_counter()
+        self.metrics.observe('action', result.finished_at - result.started_at)
+        if result.success:
+            self.executed += 1
+            self.metrics.increment('actions_executed')
+        else:
+            self.failed += 1
+            self.metrics.increment('actions_failed')
+
+    def wait_idle(self, timeout=None):
+        """Esperar a que se vacíe la cola (benchmarks y pruebas)"""
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        while True:
+            with self._cond:
+                idle = not self._jobs and self.completed >= self.submitted
+            if idle:
+                return True
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.005)
+
+    def close(self, timeout=5.0):
+        """Ejecutar lo ya encolado (sin esperar las ventanas) y detener el despachador"""
+        if self._closed:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._jobs)
+        return {
+            'queued': queued,
+            'submitted': self.submitted,
+            'executed': self.executed,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'rejected': self.rejected,
+            'merged': self.merged,
+            'dropped': self.dropped,
+            'per_command': {command: dict(stats) for command, stats in self.per_command.items()}
+        }
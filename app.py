@@ -1,17 +1,17 @@
 from flask import Flask, render_template, jsonify, request, Response
 from database import DatabaseManager
-from config import GESTURE_ACTIONS, CAMERA_CONFIG
-import cv2
-import mediapipe as mp
-import numpy as np
+from config import GESTURE_ACTIONS, CAMERA_CONFIG, ACTIONS_CONFIG
 import time
 import logging
-from gesture_detector import GestureDetector
 from system_controller import SystemController
-import threading
+from action_dispatcher import ActionDispatcher
+from camera_manager import CameraManager, parse_sources
+from event_stream import EventBroadcaster
+from metrics import metrics, render_prometheus
+from motion_gate import CpuUsage
 from datetime import datetime
 import pytz
-import gc
+import atexit
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -19,259 +19,212 @@ logger = logging.getLogger(__name__)
 
 # Inicializar componentes
 db = DatabaseManager()
-gesture_detector = GestureDetector()
 system_controller = SystemController()
+# Las acciones corren en su propio hilo, de a una: no bloquean la pipeline de ninguna cámara
+dispatcher = ActionDispatcher(system_controller, queue_size=ACTIONS_CONFIG['queue_size'],
+                              timeout=ACTIONS_CONFIG['timeout'])
+# Canal SSE: gestos, acciones y estadísticas se empujan a las plantillas
+events = EventBroadcaster()
+db.add_stats_listener(lambda stats, replace: events.publish('stats', {'stats': stats, 'replace': replace}))
+process_cpu = CpuUsage('process_cpu_percent')
 
-# Variables globales para el último gesto detectado y frame
-last_gesture = None
-last_confidence = 0.0
-last_frame = None
-camera_running = False
-camera_thread_instance = None
-lock = threading.Lock()
+def execute_gesture_action(source_id, gesture, confidence):
+    """Encolar la acción de un gesto decidido por una cámara; se registra al terminar"""
+    return dispatcher.submit(gesture, on_done=_log_action,
+                             context={'source': source_id, 'confidence': confidence})
 
-# Añadir variable global para el índice de cámara
-camera_index = 0
-
-def camera_thread():
-    global last_gesture, last_confidence, last_frame, camera_running, camera_index
-    
-    logger.info(f"Iniciando hilo de cámara con índice {camera_index}")
+def _log_action(result):
+    """Callback del despachador: registrar en la base de datos y avisar por SSE.
     
-    while camera_running:  # Solo ejecutar mientras camera_running sea True
-        cap = None
-        try:
-            # Liberar memoria antes de conectar
-            gc.collect()
-            
-            cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)  # Usar DirectShow en Windows
-            if not cap.isOpened():
-                logger.error(f'No se pudo abrir la cámara {camera_index}')
-                break  # Salir del bucle si no se puede abrir la cámara
-                
-            # Configurar cámara con valores más conservadores
-            try:
-                cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                cap.set(cv2.CAP_PROP_FPS, 15)  # Reducir FPS para mayor estabilidad
-                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)  # Desactivar autofocus
-                cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)  # Configurar exposición manual
-            except Exception as e:
-                logger.warning(f'Error al configurar cámara: {e}')
-                
-            # Verificar que la cámara esté funcionando
-            ret, test_frame = cap.read()
-            if not ret or test_frame is None:
-                logger.error('La cámara no puede leer frames')
-                break
-                
-            logger.info(f'Cámara {camera_index} conectada exitosamente')
-            last_action_time = 0
-            action_cooldown = 2.0  # segundos entre acciones
-            last_gesture_executed = None
-            consecutive_errors = 0
-            max_consecutive_errors = 5  # Reducir tolerancia
-            frame_count = 0
-            last_gc_time = time.time()
-            
-            while camera_running:  # Verificar camera_running en cada iteración
-                try:
-                    ret, frame = cap.read()
-                    if not ret or frame is None:
-                        consecutive_errors += 1
-                        if consecutive_errors > max_consecutive_errors:
-                            logger.error(f'Demasiados errores consecutivos ({consecutive_errors}). Deteniendo cámara...')
-                            break
-                        else:
-                            logger.warning(f'Error al leer frame (intento {consecutive_errors}/{max_consecutive_errors})')
-                        time.sleep(0.1)
-                        continue
-                        
-                    consecutive_errors = 0
-                    frame_count += 1
-                    
-                    # Limpiar memoria cada 100 frames
-                    if frame_count % 100 == 0:
-                        current_time = time.time()
-                        if current_time - last_gc_time > 5:  # Cada 5 segundos máximo
-                            gc.collect()
-                            last_gc_time = current_time
-                    
-                    # Procesar frame con manejo de errores mejorado
-                    try:
-                        processed_frame, gesture, confidence = gesture_detector.process_frame(frame)
-                        
-                        # Verificar que el frame procesado sea válido
-                        if processed_frame is not None and processed_frame.size > 0:
-                            with lock:
-                                # Liberar memoria del frame anterior
-                                if last_frame is not None:
-                                    del last_frame
-                                last_frame = processed_frame.copy()
-                                last_gesture = gesture
-                                last_confidence = confidence
-                                
-                            # Ejecutar acción si corresponde
-                            current_time = time.time()
-                            if gesture in GESTURE_ACTIONS:
-                                min_conf = float(GESTURE_ACTIONS[gesture].get('min_confidence', 0.7))
-                                if confidence >= min_conf:
-                                    if (last_gesture_executed != gesture or (current_time - last_action_time) > action_cooldown):
-                                        success = system_controller.execute_action(gesture)
-                                        if success:
-                                            action_info = GESTURE_ACTIONS[gesture]
-                                            lima = pytz.timezone('America/Lima')
-                                            now = datetime.now(lima).isoformat()
-                                            db.insert_action(
-                                                gesto=gesture,
-                                                accion_ejecutada=action_info['description'],
-                                                confianza=confidence,
-                                                timestamp=now
-                                            )
-                                            logger.info(f"Acción ejecutada y registrada: {gesture}")
-                                            last_action_time = current_time
-                                            last_gesture_executed = gesture
-                        else:
-                            logger.warning("Frame procesado inválido, saltando...")
-                            
-                    except Exception as e:
-                        logger.error(f'Error al procesar frame: {e}')
-                        consecutive_errors += 1
-                        if consecutive_errors > max_consecutive_errors:
-                            break
-                        continue
-                        
-                except Exception as e:
-                    logger.error(f'Error general en hilo de cámara: {e}')
-                    consecutive_errors += 1
-                    if consecutive_errors > max_consecutive_errors:
-                        logger.error('Demasiados errores, deteniendo cámara...')
-                        break
-                    time.sleep(0.1)
-                    continue
-                    
-                time.sleep(0.05)  # ~20 FPS para mayor estabilidad
-                
-            # Limpiar recursos
-            if cap:
-                cap.release()
-            logger.info('Hilo de cámara detenido')
-            break  # Salir del bucle principal
-            
-        except Exception as e:
-            logger.error(f'Error crítico en bucle de cámara: {e}')
-            if cap:
-                cap.release()
-            break  # Salir del bucle principal
+    Una ráfaga agrupada (result.repeat > 1) se registra como una sola acción.
+    """
+    process_cpu.update()
+    if not result.success:
+        return
+    gesture = result.gesture
+    confidence = result.context['confidence']
+    source_id = result.context['source']
+    t0 = time.perf_counter()
+    action_info = GESTURE_ACTIONS[gesture]
+    lima = pytz.timezone('America/Lima')
+    now = datetime.now(lima).isoformat()
+    db.insert_action(
+        gesto=gesture,
+        accion_ejecutada=action_info['description'],
+        confianza=confidence,
+        timestamp=now
+    )
+    metrics.observe('db_insert', time.perf_counter() - t0)
+    events.publish('action', {
+        'gesto': gesture,
+        'accion_ejecutada': action_info['description'],
+        'confianza': round(float(confidence), 2),
+        'timestamp': now,
+        'source': source_id,
+        'repeat': result.repeat
+    })
+    logger.info(f"Acción ejecutada y registrada: {gesture} x{result.repeat} (cámara {source_id})")
 
-# Función para iniciar el hilo de cámara de forma segura
-def start_camera_thread():
-    global camera_running, camera_thread_instance
-    
-    if camera_thread_instance and camera_thread_instance.is_alive():
-        logger.warning("Hilo de cámara ya está ejecutándose")
-        return False
-    
-    camera_running = True
-    camera_thread_instance = threading.Thread(target=camera_thread, daemon=True)
-    camera_thread_instance.start()
-    logger.info("Hilo de cámara iniciado")
-    return True
+# Cámaras: CAMERA_SOURCES define varias; si no, una sola con CAMERA_SOURCE o el índice 0
+camera_sources = parse_sources(CAMERA_CONFIG.get('sources', '')) or [('0', CAMERA_CONFIG.get('source') or '0')]
+cameras = CameraManager(camera_sources, on_action=execute_gesture_action, events=events)
 
-# Función para detener el hilo de cámara de forma segura
-def stop_camera_thread():
-    global camera_running, camera_thread_instance
-    
-    camera_running = False
-    
-    if camera_thread_instance and camera_thread_instance.is_alive():
-        camera_thread_instance.join(timeout=3.0)  # Esperar máximo 3 segundos
-        if camera_thread_instance.is_alive():
-            logger.warning("Hilo de cámara no se detuvo correctamente")
-        else:
-            logger.info("Hilo de cámara detenido correctamente")
-    
-    camera_thread_instance = None
+# Detener las cámaras, terminar las acciones en cola y escribirlas antes de salir
+# (atexit ejecuta en orden inverso)
+atexit.register(db.close)
+atexit.register(system_controller.close)
+atexit.register(dispatcher.close)
+atexit.register(cameras.close)
+
+def _camera_or_404():
+    """Cámara indicada por ?id= (la predeterminada si falta)"""
+    try:
+        return cameras.get(request.args.get('id')), None
+    except KeyError:
+        return None, (jsonify({'success': False, 'error': f"Cámara desconocida: {request.args.get('id')}"}), 404)
 
 @app.route('/')
 def index():
-    return render_template('index.html', camera_index=camera_index)
+    return render_template('index.html', camera_source=cameras.default_id,
+                           camera_ids=[worker.source_id for worker in cameras.workers()])
 
 @app.route('/video_feed')
-def video_feed():
-    def gen_frames():
-        consecutive_empty_frames = 0
-        max_empty_frames = 10
-        
-        while True:
-            try:
-                with lock:
-                    frame = last_frame.copy() if last_frame is not None else None
-                    
-                if frame is not None and frame.size > 0:
-                    consecutive_empty_frames = 0
-                    # Comprimir con menor calidad para mejor rendimiento
-                    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]
-                    ret, buffer = cv2.imencode('.jpg', frame, encode_param)
-                    
-                    if ret:
-                        frame_bytes = buffer.tobytes()
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                    else:
-                        logger.warning("Error al codificar frame")
-                        
-                else:
-                    consecutive_empty_frames += 1
-                    if consecutive_empty_frames > max_empty_frames:
-                        logger.warning("Demasiados frames vacíos, reiniciando stream...")
-                        consecutive_empty_frames = 0
-                        
-                time.sleep(0.05)  # ~20 FPS
-                
-            except Exception as e:
-                logger.error(f"Error en video_feed: {e}")
-                time.sleep(0.1)
-                continue
-                
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed/<source_id>')
+def video_feed(source_id=None):
+    try:
+        worker = cameras.get(source_id)
+    except KeyError:
+        return Response('Cámara desconocida', status=404)
+    # Todos los clientes de una cámara comparten el mismo JPEG por frame
+    return Response(worker.video_hub.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/api/events')
+def event_stream():
+    """Server-Sent Events: estado inicial y luego solo los cambios (sin consultas a la base de datos)"""
+    initial = []
+    for worker in cameras.workers():
+        gesture, confidence = worker.current_gesture()
+        initial.append(('camera', {'is_streaming': worker.is_streaming, 'name': worker.source_name,
+                                   'source': worker.source_id}))
+        initial.append(('gesture', {'gesture': gesture, 'confidence': confidence,
+                                    'gesture_info': GESTURE_ACTIONS.get(gesture, {}) if gesture else {},
+                                    'source': worker.source_id}))
+    initial.append(('stats', {'stats': db.get_gesture_stats(), 'replace': True}))
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    response = Response(events.stream(initial, last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/start_camera')
 def start_camera():
-    success = start_camera_thread()
-    return jsonify({'success': success, 'message': 'Cámara iniciada' if success else 'Cámara ya está ejecutándose'})
+    # Sin ?id= se inicia la cámara predeterminada; ?id=all inicia todas
+    if request.args.get('id') == 'all':
+        started = cameras.start()
+        return jsonify({'success': bool(started), 'started': started,
+                        'message': 'Cámaras iniciadas' if started else 'Cámaras ya están ejecutándose'})
+    worker, error = _camera_or_404()
+    if error:
+        return error
+    success = worker.start()
+    return jsonify({'success': success, 'id': worker.source_id,
+                    'message': 'Cámara iniciada' if success else 'Cámara ya está ejecutándose'})
 
 @app.route('/api/stop_camera')
 def stop_camera():
-    stop_camera_thread()
-    return jsonify({'success': True, 'message': 'Cámara detenida'})
+    if request.args.get('id') == 'all':
+        cameras.stop()
+        return jsonify({'success': True, 'message': 'Cámaras detenidas'})
+    worker, error = _camera_or_404()
+    if error:
+        return error
+    worker.stop()
+    return jsonify({'success': True, 'id': worker.source_id, 'message': 'Cámara detenida'})
 
 @app.route('/api/camera_status')
 def camera_status():
-    with lock:
-        gesture = last_gesture
-        confidence = last_confidence
-    
-    is_running = camera_thread_instance is not None and camera_thread_instance.is_alive()
-    
-    return jsonify({
-        'is_streaming': is_running,
-        'current_gesture': gesture,
-        'current_confidence': confidence,
-        'gesture_info': GESTURE_ACTIONS.get(gesture, {}) if gesture else {}
-    })
+    # Campos de la cámara predeterminada al nivel superior; todas en 'sources'
+    sources = cameras.status()
+    status = dict(sources.get(cameras.default_id, {}))
+    status['sources'] = sources
+    status['events'] = events.stats()
+    return jsonify(status)
+
+@app.route('/api/metrics')
+def get_metrics():
+    extra_gauges = {
+        'event_subscribers': events.subscribers,
+        'process_cpu_percent': process_cpu.update(),
+        'db_pending_rows': db.writer_stats()['pending'],
+        'action_queue_depth': dispatcher.stats()['queued']
+    }
+    # Una serie por cámara con la etiqueta source
+    entries = [({}, metrics, extra_gauges)]
+    entries.extend(({'source': worker.source_id}, worker.metrics, worker.metric_gauges())
+                   for worker in cameras.workers())
+    return Response(render_prometheus(entries, metrics.prefix), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/summary')
+def get_metrics_summary():
+    try:
+        process_cpu.update()
+        summary = metrics.summary()
+        summary['database'] = db.writer_stats()
+        summary['actions'] = dispatcher.stats()
+        summary['screenshots'] = system_controller.screenshots.stats()
+        summary['sources'] = {worker.source_id: worker.metrics_summary() for worker in cameras.workers()}
+        return jsonify({'success': True, 'metrics': summary})
+    except Exception as e:
+        logger.error(f"Error al obtener métricas: {e}")
+        return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/actions')
 def get_actions():
     try:
         limit = request.args.get('limit', 50, type=int)
-        actions = db.get_recent_actions(limit)
-        return jsonify({'success': True, 'actions': actions})
+        # Paginación por cursor: next_cursor se pasa como ?cursor= para la página siguiente
+        actions, next_cursor = db.get_actions_page(limit, request.args.get('cursor'))
+        return jsonify({'success': True, 'actions': actions, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error al obtener acciones: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/classifier', methods=['GET', 'POST'])
+def classifier():
+    # POST {"engine": "rules"|"learned", "model_path": opcional, "id": opcional} cambia el clasificador en caliente
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            workers = [cameras.get(data['id'])] if data.get('id') else cameras.workers()
+        except KeyError:
+            return jsonify({'success': False, 'error': f"Cámara desconocida: {data.get('id')}"}), 404
+        try:
+            for worker in workers:
+                worker.detector.set_engine(data.get('engine', 'rules'), data.get('model_path'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except OSError as e:
+            return jsonify({'success': False, 'error': f"No se pudo cargar el modelo: {e}"}), 400
+    return jsonify({'success': True,
+                    'sources': {worker.source_id: worker.detector.classifier_info() for worker in cameras.workers()}})
+
+@app.route('/api/screenshots')
+def get_screenshots():
+    # Solo las capturas que siguen en memoria (SCREENSHOT_RING), sin leer el disco
+    screenshots = system_controller.screenshots
+    return jsonify({'success': True, 'screenshots': [capture.info() for capture in screenshots.recent()],
+                    'stats': screenshots.stats()})
+
+@app.route('/api/screenshots/<name>')
+def get_screenshot(name):
+    capture = system_controller.screenshots.get(name)
+    if capture is None:
+        return jsonify({'success': False, 'error': f"Captura no disponible en memoria: {name}"}), 404
+    return Response(capture.data, mimetype=capture.mimetype,
+                    headers={'Cache-Control': 'private, max-age=3600'})
+
 @app.route('/api/stats')
 def get_stats():
     try:
@@ -281,6 +234,12 @@ def get_stats():
         logger.error(f"Error al obtener estadísticas: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    # Recalcula el resumen desde la tabla completa: solo bajo demanda
+    success = db.rebuild_stats()
+    return jsonify({'success': success})
+
 @app.route('/api/gestures')
 def get_gestures():
     try:
@@ -302,23 +261,18 @@ def dashboard():
 
 @app.route('/set_camera', methods=['POST'])
 def set_camera():
-    global camera_index
     data = request.get_json()
-    idx = data.get('camera_index', 0)
     try:
-        idx = int(idx)
-        
-        # Detener cámara actual si está ejecutándose
-        if camera_running:
-            stop_camera_thread()
-            time.sleep(1)  # Esperar a que se libere la cámara
-        
-        camera_index = idx
+        # Índice de cámara o fuente alternativa (video, imágenes o 'synthetic')
+        spec = data.get('source') or str(int(data.get('camera_index', 0)))
+        source_id = data.get('id', cameras.default_id)
         
-        # Reiniciar cámara con nuevo índice
-        start_camera_thread()
+        # Reiniciar la cámara con la nueva fuente
+        worker = cameras.set_spec(source_id, spec)
         
-        return jsonify({'success': True, 'camera_index': camera_index})
+        return jsonify({'success': True, 'id': worker.source_id, 'source': worker.spec})
+    except KeyError:
+        return jsonify({'success': False, 'error': f"Cámara desconocida: {data.get('id')}"}), 404
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
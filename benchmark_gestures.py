@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de la clasificación de gestos
+Se ejecutan sin cámara sobre landmarks sintéticos
+"""
+
+import argparse
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def make_hand_landmarks(rng, count):
+    """Generar manos sintéticas con la misma forma que los resultados de MediaPipe"""
+    hands = []
+    for _ in range(count):
+        coords = rng.random((21, 3))
+        hands.append(SimpleNamespace(
+            landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z)) for x, y, z in coords]
+        ))
+    return hands
+
+
+# Mano derecha de frente en coordenadas de imagen (y hacia abajo), muñeca en el origen
+_MCP = {1: (-0.06, -0.05), 5: (-0.05, -0.2), 9: (0.0, -0.22), 13: (0.05, -0.2), 17: (0.09, -0.17)}
+
+
+def make_posed_hands(rng, count, rotation=0.0, noise=0.004):
+    """Manos sintéticas con una combinación de dedos conocida (máscara, bit 0 = pulgar).
+
+    Cada dedo se arma extendido o doblado a partir de su base, y la mano se
+    escala, se gira hasta +-rotation grados y se traslada. Retorna (landmarks
+    Nx21x3 float32, máscaras).
+    """
+    masks = rng.integers(0, 32, count)
+    hands = np.zeros((count, 21, 3), dtype=np.float32)
+    for n, mask in enumerate(masks):
+        hand = hands[n]
+        # Pulgar: 1-4
+        hand[1, :2] = _MCP[1]
+        if mask & 1:
+            hand[2:5, :2] = [(-0.11, -0.09), (-0.15, -0.12), (-0.19, -0.15)]
+            hand[2:5, 2] = [-0.01, -0.015, -0.02]
+        else:
+            hand[2:5, :2] = [(-0.09, -0.1), (-0.05, -0.14), (-0.01, -0.15)]
+            hand[2:5, 2] = [-0.02, -0.04, -0.05]
+        for finger, base in enumerate((5, 9, 13, 17), start=1):
+            bx, by = _MCP[base]
+            hand[base, :2] = bx, by
+            if mask >> finger & 1:
+                hand[base + 1:base + 4, 0] = bx * np.array([1.05, 1.1, 1.15])
+                hand[base + 1:base + 4, 1] = by - np.array([0.08, 0.13, 0.17])
+                hand[base + 1:base + 4, 2] = [-0.01, -0.015, -0.02]
+            else:
+                hand[base + 1:base + 4, 0] = bx
+                hand[base + 1:base + 4, 1] = by + np.array([-0.04, 0.0, 0.04])
+                hand[base + 1:base + 4, 2] = [-0.04, -0.06, -0.06]
+    scale = rng.uniform(0.6, 1.4, (count, 1, 1))
+    angle = np.radians(rng.uniform(-rotation, rotation, count))
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    x, y = hands[..., 0].copy(), hands[..., 1].copy()
+    hands[..., 0] = cos * x - sin * y
+    hands[..., 1] = sin * x + cos * y
+    hands *= scale
+    hands[..., :2] += rng.uniform(0.3, 0.7, (count, 1, 2))
+    hands += rng.normal(0, noise, hands.shape)
+    return hands.astype(np.float32), masks
+
+
+def legacy_finger_states(hand_landmarks):
+    """Implementación anterior: lista de listas + np.array + bucle por dedo"""
+    landmarks = []
+    for lm in hand_landmarks.landmark:
+        landmarks.append([lm.x, lm.y, lm.z])
+    landmarks = np.array(landmarks)
+
+    fingers_extended = [landmarks[4][0] < landmarks[2][0] + 0.02]
+    for tip, base in [(8, 5), (12, 9), (16, 13), (20, 17)]:
+        fingers_extended.append(landmarks[tip][1] < landmarks[base][1] + 0.02)
+    return fingers_extended
+
+
+def legacy_identify_gesture(fingers_extended):
+    """Implementación anterior: cadena de if/elif evaluada en cada frame"""
+    extended_count = int(np.count_nonzero(fingers_extended))
+    if extended_count == 5:
+        return 'mano_abierta', 0.95
+    elif extended_count == 0:
+        return 'puño_cerrado', 0.90
+    elif fingers_extended[0] and not any(fingers_extended[1:]):
+        return 'pulgar_arriba', 0.85
+    elif fingers_extended[1] and fingers_extended[2] and not fingers_extended[3] and not fingers_extended[4]:
+        return 'dos_dedos', 0.88
+    elif fingers_extended[1] and fingers_extended[4] and not fingers_extended[2] and not fingers_extended[3]:
+        return 'rock_roll', 0.82
+    elif fingers_extended[0] and sum(fingers_extended[1:]) <= 1:
+        return 'pulgar_arriba', 0.80
+    elif extended_count >= 3:
+        return 'mano_abierta', 0.85
+    else:
+        return None, 0.0
+
+
+def time_per_call(func, items, repeat):
+    """Microsegundos promedio por llamada"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(items)) * 1e6
+
+
+def bench_landmarks(args):
+    """Comparar el costo por frame del cálculo de dedos antes y después"""
+    from gesture_detector import GestureDetector, DEBUG_INDEX, DEBUG_SLACK
+
+    rng = np.random.default_rng(args.seed)
+    hands = make_hand_landmarks(rng, args.hands)
+    detector = GestureDetector()
+
+    def current(hand):
+        landmarks = detector._fill_landmarks(hand)
+        return detector._finger_states(landmarks, DEBUG_INDEX, DEBUG_SLACK)
+
+    # Verificar que ambas versiones coinciden antes de medir
+    mismatches = sum(
+        [bool(f) for f in current(hand)] != [bool(f) for f in legacy_finger_states(hand)]
+        for hand in hands
+    )
+
+    before = time_per_call(legacy_finger_states, hands, args.repeat)
+    after = time_per_call(current, hands, args.repeat)
+    detector.release()
+
+    print(f"Manos sintéticas: {len(hands)} x {args.repeat} repeticiones")
+    print(f"Antes (lista + np.array + bucle): {before:8.2f} us/frame")
+    print(f"Después (buffer + vectorizado):   {after:8.2f} us/frame")
+    print(f"Aceleración: {before / after:.2f}x | Diferencias: {mismatches}")
+
+
+def bench_rules(args):
+    """Cadena de if/elif anterior contra la tabla de 32 entradas compilada desde GESTURE_ACTIONS"""
+    from gesture_rules import compile_rules, finger_mask, fingers_from_mask
+
+    table = compile_rules()
+    # Las 32 combinaciones deben dar lo mismo que antes con la configuración por defecto
+    mismatches = [mask for mask in range(32)
+                  if table.classify(mask) != legacy_identify_gesture(fingers_from_mask(mask))]
+
+    rng = np.random.default_rng(args.seed)
+    fingers = list(rng.random((args.hands, 5)) < 0.5)
+    masks = [finger_mask(f) for f in fingers]
+    before = time_per_call(legacy_identify_gesture, fingers, args.repeat)
+    after = time_per_call(table.lookup, fingers, args.repeat)
+    indexed = time_per_call(table.classify, masks, args.repeat)
+
+    print(f"Combinaciones de dedos: {args.hands} x {args.repeat} repeticiones")
+    print(f"Antes (if/elif):              {before:8.2f} us/frame")
+    print(f"Tabla (máscara + índice):     {after:8.2f} us/frame")
+    print(f"Tabla (máscara ya calculada): {indexed:8.2f} us/frame")
+    print(f"Diferencias con la cadena anterior: {mismatches or 0}")
+
+
+def bench_classifier(args):
+    """Reglas contra los clasificadores aprendidos: exactitud y microsegundos por frame"""
+    import logging
+    from gesture_batch import classify_batch
+    from gesture_detector import GestureDetector, GESTURE_RULES
+    from landmark_classifier import train_classifier, load_labelled_sessions, accuracy
+
+    logging.getLogger('landmark_classifier').setLevel(logging.WARNING)
+    rng = np.random.default_rng(args.seed)
+    if args.sessions:
+        # Sesiones etiquetadas: se reserva una parte al azar para evaluar
+        landmarks, labels = load_labelled_sessions(args.sessions)
+        order = rng.permutation(len(labels))
+        split = int(len(labels) * 0.8)
+        train = (landmarks[order[:split]], labels[order[:split]])
+        tests = {'sesiones': (landmarks[order[split:]], labels[order[split:]])}
+    else:
+        # Manos sintéticas: la etiqueta es la del gesto que forma la pose, sin girar
+        hands, masks = make_posed_hands(rng, args.train, max(args.rotations))
+        train = (hands, GESTURE_RULES.labels[masks])
+        tests = {}
+        for rotation in args.rotations:
+            hands, masks = make_posed_hands(rng, args.test, rotation)
+            tests[f"giro ±{rotation:g}°"] = (hands, GESTURE_RULES.labels[masks])
+
+    models = {}
+    for kind in args.kinds:
+        start = time.perf_counter()
+        params = {'k': args.k, 'max_prototypes': args.max_prototypes} if kind == 'knn' else {}
+        model = train_classifier(train[0], train[1], kind, **params)
+        model.fit_budget(args.budget)
+        models[kind] = model
+        print(f"{kind}: entrenado con {len(train[1])} manos en {time.perf_counter() - start:.2f} s | {model.info()}")
+
+    # Costo por frame en el camino en vivo del detector (detect_gesture_debug)
+    detector = GestureDetector()
+    sample = list(next(iter(tests.values()))[0][:500])
+    engines = {'reglas': None, **models}
+    print(f"{'motor':>8} " + " ".join(f"{name:>14}" for name in tests) + f" {'us/frame':>9} {'lote us/mano':>12}")
+    for name, model in engines.items():
+        detector.classifier = model
+        per_frame = time_per_call(detector.detect_gesture_debug, sample, args.repeat)
+        scores = []
+        for landmarks, labels in tests.values():
+            if model is None:
+                predicted, _, _ = classify_batch(landmarks)
+            else:
+                predicted, _ = model.classify_batch(landmarks)
+            scores.append(accuracy(predicted, labels))
+        landmarks = next(iter(tests.values()))[0]
+        start = time.perf_counter()
+        if model is None:
+            classify_batch(landmarks)
+        else:
+            model.classify_batch(landmarks)
+        batch = (time.perf_counter() - start) / max(1, len(landmarks)) * 1e6
+        print(f"{name:>8} " + " ".join(f"{score:>14.1%}" for score in scores) + f" {per_frame:>9.1f} {batch:>12.2f}")
+    detector.release()
+
+
+def bench_batch(args):
+    """Medir filas por segundo del clasificador por lotes y compararlo con el de un frame"""
+    from gesture_detector import GestureDetector
+    from gesture_batch import classify_batch, FINGER_RULES
+
+    rng = np.random.default_rng(args.seed)
+    landmarks = rng.random((args.rows, 21, 3), dtype=np.float32)
+    index, slack = FINGER_RULES[args.rule]
+
+    # Verificar sobre una muestra que los resultados coinciden con el camino de un frame
+    detector = GestureDetector()
+    labels, confidences, masks = classify_batch(landmarks[:args.check], args.rule)
+    mismatches = 0
+    for row, label, confidence in zip(landmarks[:args.check], labels, confidences):
+        fingers = detector._finger_states(row, index, slack)
+        if detector._identify_gesture(fingers, row) != (label, confidence):
+            mismatches += 1
+    detector.release()
+
+    classify_batch(landmarks[:1000], args.rule)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        classify_batch(landmarks, args.rule)
+    elapsed = (time.perf_counter() - start) / args.repeat
+
+    print(f"Filas: {args.rows} | Regla: {args.rule}")
+    print(f"Tiempo por lote: {elapsed * 1e3:.2f} ms | {args.rows / elapsed / 1e6:.2f} M filas/s")
+    print(f"Diferencias con el camino de un frame ({args.check} filas): {mismatches}")
+
+
+def bench_pipeline(args):
+    """Procesar una fuente sin cámara, frame a frame o a través del pipeline"""
+    from frame_sources import create_source
+    from gesture_detector import GestureDetector
+    from pipeline import GesturePipeline
+
+    # En modo pipeline la fuente va a su ritmo nativo: sin pausa el pipeline descarta casi todo
+    realtime = args.realtime or args.mode == 'pipeline'
+    source = create_source(args.source, {'width': args.width, 'height': args.height, 'fps': args.fps},
+                           prefetch=args.prefetch, realtime=realtime)
+    if not source.open():
+        print(f"No se pudo abrir la fuente {args.source}")
+        return
+
+    detector = GestureDetector()
+    gestures = {}
+
+    def infer(item):
+        _, _, frame = item
+        _, gesture, _ = detector.process_frame(frame)
+        gestures[gesture] = gestures.get(gesture, 0) + 1
+        return None
+
+    start = time.perf_counter()
+    if args.mode == 'inline':
+        # Determinista: cada frame pasa por el detector en orden
+        processed = 0
+        while processed < args.frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            infer((processed, time.time(), frame))
+            processed += 1
+        stats = None
+    else:
+        pipeline = GesturePipeline(source.read, infer, lambda event: None, max_consecutive_errors=0)
+        pipeline.start()
+        pipeline.run_capture(lambda: pipeline.captured < args.frames)
+        # Dejar que la inferencia termine el último frame encolado
+        while pipeline.frame_queue.qsize():
+            time.sleep(0.01)
+        pipeline.stop()
+        pipeline.join()
+        stats = pipeline.stats()
+        processed = stats['stages'][0]['processed']
+    elapsed = time.perf_counter() - start
+    source.release()
+    detector.release()
+
+    print(f"Fuente: {source.name} | Modo: {args.mode}")
+    print(f"Frames procesados: {processed} en {elapsed:.2f} s ({processed / elapsed:.1f} FPS)")
+    print(f"Gestos: {gestures}")
+    if stats:
+        for q in stats['queues']:
+            print(f"Cola {q['name']}: {q['put']} encolados, {q['dropped']} descartados")
+
+
+def bench_roi(args):
+    """Comparar la inferencia en frame completo contra el seguimiento por ROI sobre la misma fuente"""
+    from frame_sources import create_source
+    from gesture_detector import GestureDetector
+    from metrics import MetricsRegistry
+
+    if args.input_size is not None:
+        from config import ROI_CONFIG
+        ROI_CONFIG['input_size'] = args.input_size
+
+    results = {}
+    for roi in (False, True):
+        source = create_source(args.source, {'width': args.width, 'height': args.height}, realtime=False)
+        if not source.open():
+            print(f"No se pudo abrir la fuente {args.source}")
+            return
+        registry = MetricsRegistry()
+        detector = GestureDetector(metrics=registry, roi_tracking=roi)
+        gestures = {}
+        processed = 0
+        start = time.perf_counter()
+        while processed < args.frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            _, gesture, _ = detector.process_frame(frame)
+            gestures[gesture] = gestures.get(gesture, 0) + 1
+            processed += 1
+        elapsed = time.perf_counter() - start
+        source.release()
+        detector.release()
+        histogram = registry.histograms.get('hands_process')
+        per_frame = histogram.sum / processed if histogram and processed else 0.0
+        results[roi] = per_frame
+        print(f"ROI: {'sí' if roi else 'no'} | Frames: {processed} en {elapsed:.2f} s ({processed / elapsed:.1f} FPS)")
+        print(f"  MediaPipe por frame: {per_frame * 1e3:.2f} ms | Gestos: {gestures}")
+        if roi:
+            print(f"  Seguimiento: {detector.roi_stats()}")
+
+    if results[False]:
+        saved = results[False] - results[True]
+        print(f"Inferencia ahorrada por frame: {saved * 1e3:.2f} ms ({saved / results[False] * 100:.1f}%)")
+
+
+def bench_pool(args):
+    """Throughput y latencia de MediaPipe en el hilo contra el pool de procesos"""
+    from frame_sources import create_source
+    from gesture_detector import GestureDetector
+    from inference_pool import ProcessInferencePool
+    from metrics import MetricsRegistry
+
+    def read_frames(count):
+        source = create_source(args.source, {'width': args.width, 'height': args.height}, realtime=False)
+        if not source.open():
+            raise SystemExit(f"No se pudo abrir la fuente {args.source}")
+        frames = []
+        while len(frames) < count:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(frame)
+        source.release()
+        return frames
+
+    # Los frames se leen antes para medir solo la inferencia
+    frames = read_frames(args.frames)
+
+    def report(name, elapsed, latencies, hands):
+        latencies = np.sort(np.asarray(latencies))
+        print(f"{name}: {len(latencies) / elapsed:.1f} FPS | latencia p50 {np.percentile(latencies, 50) * 1e3:.1f} ms"
+              f" p95 {np.percentile(latencies, 95) * 1e3:.1f} ms | manos {hands}")
+
+    detector = GestureDetector(metrics=MetricsRegistry(), roi_tracking=False, debug_log=False)
+    latencies = []
+    hands = 0
+    start = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        detector.process_frame(frame, draw=False)
+        latencies.append(time.perf_counter() - t0)
+        hands += detector.last_landmarks is not None
+    report("Hilo", time.perf_counter() - start, latencies, hands)
+    detector.release()
+
+    # Un pool de un proceso por fuente, como en CameraManager: la secuencia de cada
+    # cámara queda en un solo proceso y las fuentes extra usan procesos extra
+    for sources in args.sources:
+        pools = [ProcessInferencePool(workers=1, frame_shape=(args.height, args.width, 3),
+                                      metrics=MetricsRegistry()) for _ in range(sources)]
+        for pool in pools:
+            pool.wait_ready()
+        latencies = []
+        hands = 0
+        order_ok = True
+        expected = [0] * sources
+        submitted = [0] * sources
+        active = set(range(sources))
+        start = time.perf_counter()
+        # Mantener cada anillo lleno: enviar mientras haya slots y recoger en orden
+        while active:
+            for i in list(active):
+                pool = pools[i]
+                while submitted[i] < len(frames) and pool.submit(frames[submitted[i]], submitted[i]) is not None:
+                    submitted[i] += 1
+                result = pool.get(timeout=0.001 if sources > 1 else pool.result_timeout * 2)
+                if result is None:
+                    if sources == 1 or pool.stats()['in_flight'] == 0 and submitted[i] >= len(frames):
+                        active.discard(i)
+                    continue
+                order_ok &= result.tag == expected[i]
+                expected[i] += 1
+                latencies.append(result.latency)
+                hands += result.landmarks is not None
+                if expected[i] >= len(frames):
+                    active.discard(i)
+        elapsed = time.perf_counter() - start
+        lost = sum(pool.stats()['lost'] for pool in pools)
+        for pool in pools:
+            pool.close()
+        report(f"Procesos ({sources} fuente{'s' if sources > 1 else ''})", elapsed, latencies, hands)
+        print(f"  Orden correcto: {order_ok} | perdidos {lost} | FPS por fuente "
+              f"{len(latencies) / elapsed / sources:.1f}")
+
+
+def bench_actions(args):
+    """Despachador de acciones con el backend de grabación (sin escritorio)"""
+    from action_dispatcher import ActionDispatcher
+    from config import GESTURE_ACTIONS
+    from metrics import MetricsRegistry
+    from config import SCREENSHOT_CONFIG
+    from system_controller import RecordingBackend, SystemController
+
+    import logging
+    logging.getLogger('action_dispatcher').setLevel(logging.ERROR)
+    logging.getLogger('system_controller').setLevel(logging.WARNING)
+    backend = RecordingBackend(delay_scale=args.delay_scale, latency=args.latency)
+    controller = SystemController(backend=backend, screenshot_config=dict(SCREENSHOT_CONFIG, save=False))
+    dispatcher = ActionDispatcher(controller, queue_size=args.queue_size, timeout=args.timeout,
+                                  limits={} if args.no_limits else None, metrics=MetricsRegistry())
+    gestures = [g for g in GESTURE_ACTIONS if g != 'mano_abierta' or controller.chrome_command]
+    if args.gesture:
+        # Ráfaga de un solo gesto: mide la agrupación y el límite de tasa
+        gestures = [args.gesture]
+    latencies = []
+    submit_times = []
+    repeats = []
+
+    def on_done(result):
+        latencies.append(result.latency)
+        # Solo cuentan como llamadas las que no descartó por completo el límite de tasa
+        if result.dropped < result.repeat:
+            repeats.append(result.repeat - result.dropped)
+
+    start = time.perf_counter()
+    for i in range(args.actions):
+        while True:
+            t0 = time.perf_counter()
+            accepted = dispatcher.submit(gestures[i % len(gestures)], on_done=on_done)
+            submit_times.append(time.perf_counter() - t0)
+            if accepted:
+                break
+            # Cola llena: esperar a que el despachador avance (cuenta como rechazo)
+            time.sleep(0.001)
+        if args.interval:
+            time.sleep(args.interval)
+    dispatcher.wait_idle()
+    elapsed = time.perf_counter() - start
+    dispatcher.close()
+    controller.close()
+
+    latencies = np.sort(np.asarray(latencies)) if latencies else np.zeros(1)
+    print(f"Pedidos: {args.actions} en {elapsed:.2f} s | llamadas al controlador: {len(repeats)}"
+          f" (repeticiones por llamada {np.mean(repeats) if repeats else 0:.1f})")
+    print(f"submit() p50 {np.percentile(submit_times, 50) * 1e6:.1f} us | "
+          f"latencia hasta terminar p50 {np.percentile(latencies, 50) * 1e3:.2f} ms"
+          f" p95 {np.percentile(latencies, 95) * 1e3:.2f} ms")
+    print(f"Despachador: {dispatcher.stats()} | llamadas registradas: {len(backend.calls)}")
+
+
+def make_screen_image(width, height, seed=0):
+    """Imagen parecida a un escritorio: zonas planas, texto simulado y una foto con ruido"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    screen = np.full((height, width, 3), 235, dtype=np.uint8)
+    screen[:height // 20] = (40, 44, 52)
+    # Líneas de "texto"
+    for y in range(height // 10, height // 2, 18):
+        length = int(rng.integers(width // 4, width // 2))
+        screen[y:y + 8, 40:40 + length] = rng.integers(0, 80, (8, length, 1), dtype=np.uint8)
+    # Un recuadro con contenido fotográfico
+    photo = screen[height // 2:height - 40, width // 2:width - 40]
+    photo[:] = rng.integers(0, 256, photo.shape, dtype=np.uint8)
+    return Image.fromarray(screen)
+
+
+def bench_screenshots(args):
+    """Captura en línea (antes) contra el pipeline de capturas, por formato"""
+    import shutil
+    import tempfile
+    import logging
+    from metrics import MetricsRegistry
+    from screenshot_pipeline import ScreenshotPipeline, encode_params
+
+    logging.getLogger('screenshot_pipeline').setLevel(logging.WARNING)
+    image = make_screen_image(args.width, args.height)
+    directory = tempfile.mkdtemp(prefix='bench_capturas_')
+    try:
+        # Antes: PNG con la compresión por defecto de Pillow, todo en el hilo de la acción
+        times = []
+        for i in range(args.captures):
+            t0 = time.perf_counter()
+            image.copy().save(f"{directory}/antes_{i}.png")
+            times.append(time.perf_counter() - t0)
+        print(f"En línea PNG (nivel por defecto): bloquea la acción p50 {np.percentile(times, 50) * 1e3:.1f} ms")
+
+        for fmt in args.formats:
+            config = {'directory': directory, 'save': not args.memory_only, 'format': fmt,
+                      'png_compress_level': args.png_level, 'quality': args.quality,
+                      'workers': args.workers, 'max_pending': args.captures, 'ring_size': args.captures}
+            pipeline = ScreenshotPipeline(image.copy, config, metrics=MetricsRegistry())
+            capture_times = []
+            start = time.perf_counter()
+            for _ in range(args.captures):
+                t0 = time.perf_counter()
+                pipeline.capture()
+                capture_times.append(time.perf_counter() - t0)
+            pipeline.wait_idle()
+            elapsed = time.perf_counter() - start
+            recent = pipeline.recent()
+            names = [capture.name for capture in reversed(recent)]
+            pipeline.close()
+            encode = np.array([capture.encode_time for capture in recent]) if recent else np.zeros(1)
+            size = np.mean([len(capture.data) for capture in recent]) if recent else 0
+            print(f"{fmt:5s} {encode_params(config)}: capture() p50 {np.percentile(capture_times, 50) * 1e3:.2f} ms"
+                  f" | codificar p50 {np.percentile(encode, 50) * 1e3:.1f} ms | {size / 1024:.0f} KB"
+                  f" | {args.captures / elapsed:.1f} capturas/s"
+                  f" | nombres únicos y ordenados: {len(set(names)) == len(names) and names == sorted(names)}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_db(args):
+    """Prueba de carga del pool: lectores concurrentes mientras se escriben acciones"""
+    import threading
+    from database import DatabaseManager
+    from db_pool import SQLiteBackend
+
+    backend = SQLiteBackend(args.sqlite_path) if args.backend == 'sqlite' else None
+    db = DatabaseManager(backend=backend, pool_size=args.pool_size)
+    latencies = []
+    lock = threading.Lock()
+
+    def reader():
+        local = []
+        for _ in range(args.reads):
+            start = time.perf_counter()
+            db.get_recent_actions(50)
+            db.get_gesture_stats()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    def writer():
+        for i in range(args.writes):
+            db.insert_action('mano_abierta', 'Abrir navegador Chrome', 0.95,
+                             timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+    threads = [threading.Thread(target=reader) for _ in range(args.threads)]
+    threads.append(threading.Thread(target=writer))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.flush()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(f"Backend: {db.backend.name} | Pool: {db.pool_size} | Lectores: {args.threads}")
+    print(f"Lecturas: {len(latencies)} en {elapsed:.2f} s ({len(latencies) / elapsed:.0f}/s) | p95 {p95 * 1e3:.2f} ms")
+    print(f"Pool: {db.pool.stats()}")
+    print(f"Escritura: {db.writer_stats()}")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del detector de gestos")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    landmarks_parser = subparsers.add_parser('landmarks', help="Costo por frame del cálculo de dedos")
+    landmarks_parser.add_argument('--hands', type=int, default=1000)
+    landmarks_parser.add_argument('--repeat', type=int, default=20)
+    landmarks_parser.add_argument('--seed', type=int, default=0)
+    landmarks_parser.set_defaults(func=bench_landmarks)
+
+    rules_parser = subparsers.add_parser('rules', help="Clasificación por tabla contra la cadena de if/elif")
+    rules_parser.add_argument('--hands', type=int, default=1000)
+    rules_parser.add_argument('--repeat', type=int, default=50)
+    rules_parser.add_argument('--seed', type=int, default=0)
+    rules_parser.set_defaults(func=bench_rules)
+
+    classifier_parser = subparsers.add_parser('classifier', help="Reglas contra kNN/softmax sobre landmarks")
+    classifier_parser.add_argument('--sessions', nargs='+', help="Sesiones etiquetadas (ruta.gsr o ruta.gsr:gesto)")
+    classifier_parser.add_argument('--kinds', nargs='+', choices=['knn', 'softmax'], default=['knn', 'softmax'])
+    classifier_parser.add_argument('--train', type=int, default=20000, help="Manos sintéticas de entrenamiento")
+    classifier_parser.add_argument('--test', type=int, default=5000, help="Manos sintéticas por giro")
+    classifier_parser.add_argument('--rotations', type=float, nargs='+', default=[0, 30, 60])
+    classifier_parser.add_argument('--k', type=int, default=5)
+    classifier_parser.add_argument('--max-prototypes', type=int, default=2000)
+    classifier_parser.add_argument('--budget', type=float, default=200, help="Microsegundos por frame")
+    classifier_parser.add_argument('--repeat', type=int, default=5)
+    classifier_parser.add_argument('--seed', type=int, default=0)
+    classifier_parser.set_defaults(func=bench_classifier)
+
+    batch_parser = subparsers.add_parser('batch', help="Throughput del clasificador por lotes")
+    batch_parser.add_argument('--rows', type=int, default=1_000_000)
+    batch_parser.add_argument('--rule', choices=['debug', 'strict'], default='debug')
+    batch_parser.add_argument('--check', type=int, default=20000)
+    batch_parser.add_argument('--repeat', type=int, default=5)
+    batch_parser.add_argument('--seed', type=int, default=0)
+    batch_parser.set_defaults(func=bench_batch)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="FPS del detector sobre una fuente sin cámara")
+    pipeline_parser.add_argument('--source', default='synthetic')
+    pipeline_parser.add_argument('--mode', choices=['inline', 'pipeline'], default='inline')
+    pipeline_parser.add_argument('--frames', type=int, default=300)
+    pipeline_parser.add_argument('--width', type=int, default=640)
+    pipeline_parser.add_argument('--height', type=int, default=480)
+    pipeline_parser.add_argument('--fps', type=float, default=30)
+    pipeline_parser.add_argument('--prefetch', type=int, default=0)
+    pipeline_parser.add_argument('--realtime', action='store_true', help="Respetar los FPS de la fuente")
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    roi_parser = subparsers.add_parser('roi', help="Inferencia en frame completo contra seguimiento por ROI")
+    roi_parser.add_argument('--source', required=True, help="Video o directorio de imágenes con una mano")
+    roi_parser.add_argument('--frames', type=int, default=300)
+    roi_parser.add_argument('--width', type=int, default=640)
+    roi_parser.add_argument('--height', type=int, default=480)
+    roi_parser.add_argument('--input-size', type=int, default=None, help="Lado del recorte (0 = sin escalar)")
+    roi_parser.set_defaults(func=bench_roi)
+
+    pool_parser = subparsers.add_parser('pool', help="MediaPipe en el hilo contra el pool de procesos")
+    pool_parser.add_argument('--source', default='synthetic')
+    pool_parser.add_argument('--frames', type=int, default=200)
+    pool_parser.add_argument('--width', type=int, default=640)
+    pool_parser.add_argument('--height', type=int, default=480)
+    pool_parser.add_argument('--sources', type=int, nargs='+', default=[1, 2, 4],
+                             help="Fuentes simultáneas, cada una con su proceso")
+    pool_parser.set_defaults(func=bench_pool)
+
+    actions_parser = subparsers.add_parser('actions', help="Despachador de acciones con el backend de grabación")
+    actions_parser.add_argument('--actions', type=int, default=1000)
+    actions_parser.add_argument('--interval', type=float, default=0.0, help="Segundos entre gestos")
+    actions_parser.add_argument('--gesture', help="Enviar solo este gesto (ráfaga)")
+    actions_parser.add_argument('--no-limits', action='store_true', help="Sin agrupación ni límite de tasa")
+    actions_parser.add_argument('--queue-size', type=int, default=8)
+    actions_parser.add_argument('--timeout', type=float, default=5.0)
+    actions_parser.add_argument('--delay-scale', type=float, default=0.0, help="Fracción de las pausas reales")
+    actions_parser.add_argument('--latency', type=float, default=0.0, help="Costo simulado por llamada (s)")
+    actions_parser.set_defaults(func=bench_actions)
+
+    screenshots_parser = subparsers.add_parser('screenshots', help="Codificación de capturas por formato")
+    screenshots_parser.add_argument('--captures', type=int, default=20)
+    screenshots_parser.add_argument('--width', type=int, default=1920)
+    screenshots_parser.add_argument('--height', type=int, default=1080)
+    screenshots_parser.add_argument('--formats', nargs='+', choices=['png', 'jpeg', 'webp'], default=['png', 'jpeg', 'webp'])
+    screenshots_parser.add_argument('--png-level', type=int, default=1)
+    screenshots_parser.add_argument('--quality', type=int, default=85)
+    screenshots_parser.add_argument('--workers', type=int, default=2)
+    screenshots_parser.add_argument('--memory-only', action='store_true', help="No escribir a disco")
+    screenshots_parser.set_defaults(func=bench_screenshots)
+
+    db_parser = subparsers.add_parser('db', help="Carga concurrente sobre el pool de conexiones")
+    db_parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    db_parser.add_argument('--sqlite-path', default='benchmark_gestos.db')
+    db_parser.add_argument('--pool-size', type=int, default=5)
+    db_parser.add_argument('--threads', type=int, default=8)
+    db_parser.add_argument('--reads', type=int, default=200)
+    db_parser.add_argument('--writes', type=int, default=2000)
+    db_parser.set_defaults(func=bench_db)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+import gc
+import os
+import threading
+import time
+import logging
+from config import (GESTURE_ACTIONS, GESTURE_CONFIG, CAMERA_CONFIG, RECORDING_CONFIG, MOTION_CONFIG,
+                    DECISION_CONFIG, DEBUG_LOG_CONFIG, INFERENCE_CONFIG)
+from debug_log import create_debug_log
+from frame_slot import VersionedSlot
+from frame_sources import create_source
+from gesture_decision import GestureDecisionEngine
+from gesture_detector import GestureDetector
+from inference_pool import ProcessInferencePool
+from metrics import MetricsRegistry
+from motion_gate import MotionGate, CpuUsage
+from pipeline import GesturePipeline
+from session_recording import SessionRecorder
+from video_hub import MJPEGBroadcastHub
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_sources(value):
+    """Lista "0,videos/a.mp4,puerta=1" -> [('0', '0'), ('1', 'videos/a.mp4'), ('puerta', '1')]"""
+    sources = []
+    for position, item in enumerate(part.strip() for part in value.split(',')):
+        if not item:
+            continue
+        source_id, sep, spec = item.partition('=')
+        if not sep:
+            source_id, spec = str(position), item
+        sources.append((source_id.strip(), spec.strip()))
+    return sources
+
+
+class CameraWorker:
+    """Una fuente de video con su propio detector, estado, métricas y stream.
+
+    Cada cámara tiene su pipeline (captura -> inferencia -> publicación) y su
+    propio lock de estado, así que varias fuentes no compiten entre sí. La
+    etapa de publicación llama a on_action(source_id, gesto, confianza).
+    """
+
+    def __init__(self, source_id, spec, on_action, events=None):
+        self.source_id = source_id
+        self.spec = spec
+        self.on_action = on_action
+        self.events = events
+        self.metrics = MetricsRegistry()
+        self.video_hub = MJPEGBroadcastHub(quality=70, metrics=self.metrics)
+        # La ROI recorta antes de MediaPipe: no aplica cuando la inferencia corre en otros procesos
+        self.detector = GestureDetector(
+            metrics=self.metrics,
+            roi_tracking=False if INFERENCE_CONFIG['mode'] == 'process' else None,
+            debug_log=create_debug_log(DEBUG_LOG_CONFIG, prefix=f'debug_gestos_{source_id}')
+        )
+        self.source_name = None
+        self.pipeline = None
+        self.pool = None
+        # True si los procesos del pool murieron y la inferencia siguió en el hilo de la cámara
+        self.inference_fallback = False
+        self.running = False
+        self._thread = None
+        # Último frame procesado con su gesto: los lectores no bloquean a la inferencia
+        self.latest = VersionedSlot()
+
+    @property
+    def is_streaming(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_streaming:
+            logger.warning(f"Cámara {self.source_id} ya está ejecutándose")
+            return False
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name=f'camera-{self.source_id}', daemon=True)
+        self._thread.start()
+        logger.info(f"Hilo de cámara {self.source_id} iniciado")
+        return True
+
+    def stop(self, timeout=3.0):
+        self.running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Hilo de cámara {self.source_id} no se detuvo correctamente")
+            else:
+                logger.info(f"Hilo de cámara {self.source_id} detenido correctamente")
+        self._thread = None
+
+    def _publish_event(self, event_type, data):
+        if self.events:
+            data['source'] = self.source_id
+            self.events.publish(event_type, data)
+
+    def _run(self):
+        logger.info(f"Iniciando cámara {self.source_id} con fuente {self.spec}")
+        source = None
+        pipeline = None
+        recorder = None
+        pool = None
+        results_thread = None
+        results_stop = threading.Event()
+        try:
+            # Liberar memoria antes de conectar
+            gc.collect()
+
+            source = create_source(self.spec, CAMERA_CONFIG)
+            if not source.open():
+                logger.error(f'No se pudo abrir la fuente {source.name}')
+                return
+
+            # Verificar que la fuente esté entregando frames
+            ret, test_frame = source.read()
+            if not ret or test_frame is None:
+                logger.error(f'La fuente {source.name} no puede leer frames')
+                return
+
+            self.source_name = source.name
+            logger.info(f'Fuente {source.name} conectada exitosamente')
+            self._publish_event('camera', {'is_streaming': True, 'name': source.name})
+
+            if RECORDING_CONFIG['enabled']:
+                filename = f"sesion_{self.source_id}_{time.strftime('%Y%m%d_%H%M%S')}.gsr"
+                recorder = SessionRecorder(os.path.join(RECORDING_CONFIG['directory'], filename))
+                logger.info(f"Grabando sesión en {recorder.path}")
+
+            if INFERENCE_CONFIG['mode'] == 'process':
+                # MediaPipe en procesos aparte; este proceso solo recibe landmarks
+                pool = ProcessInferencePool(
+                    workers=INFERENCE_CONFIG['workers'],
+                    slots=INFERENCE_CONFIG['slots'] or None,
+                    frame_shape=(CAMERA_CONFIG['height'], CAMERA_CONFIG['width'], 3),
+                    result_timeout=INFERENCE_CONFIG['result_timeout'],
+                    min_tracking_confidence=GESTURE_CONFIG['min_tracking_confidence'],
+                    metrics=self.metrics
+                )
+                self.pool = pool
+            self.inference_fallback = False
+
+            # La captura corre en este hilo; inferencia y publicación en sus propias etapas
+            decision_engine = GestureDecisionEngine(
+                window=DECISION_CONFIG['window'],
+                enter_ratio=DECISION_CONFIG['enter_ratio'],
+                exit_ratio=DECISION_CONFIG['exit_ratio'],
+                cooldown=DECISION_CONFIG['cooldown'],
+                metrics=self.metrics
+            )
+            infer, on_result = self._make_inference_handler(decision_engine, recorder, pool)
+            pipeline = GesturePipeline(
+                read_frame=source.read,
+                infer=infer,
+                publish=self._publish_action,
+                metrics=self.metrics
+            )
+            self.pipeline = pipeline
+            pipeline.start()
+            if pool:
+                results_thread = threading.Thread(target=self._consume_results,
+                                                  args=(pool, on_result, pipeline, results_stop),
+                                                  name=f'camera-{self.source_id}-results', daemon=True)
+                results_thread.start()
+            pipeline.run_capture(lambda: self.running)
+
+        except Exception as e:
+            logger.error(f'Error crítico en bucle de cámara {self.source_id}: {e}')
+        finally:
+            # Limpiar recursos
+            if pipeline:
+                pipeline.stop()
+                pipeline.join(timeout=2.0)
+            results_stop.set()
+            if results_thread:
+                results_thread.join(timeout=2.0)
+            if pool:
+                pool.close()
+                self.pool = None
+            if recorder:
+                recorder.close()
+            if source:
+                source.release()
+            self._publish_event('camera', {'is_streaming': False})
+            logger.info(f'Hilo de cámara {self.source_id} detenido')
+
+    def _make_inference_handler(self, decision_engine, recorder=None, pool=None):
+        """Etapa de inferencia: detectar el gesto y publicar el último frame.
+
+        Sin pool retorna (infer, None). Con pool, la etapa solo envía el frame a
+        los procesos y retorna (submit, on_result): on_result completa cada
+        resultado en orden y retorna el evento para la etapa de publicación.
+        """
+        detector = self.detector
+        video_hub = self.video_hub
+        metrics = self.metrics
+        state = {'frame_count': 0, 'last_gc_time': time.time(),
+                 'sent_gesture': None, 'sent_confidence': 0.0, 'sent_at': 0.0,
+                 'inference_cpu': None}
+        gate = MotionGate(
+            width=MOTION_CONFIG['width'],
+            pixel_delta=MOTION_CONFIG['pixel_delta'],
+            motion_fraction=MOTION_CONFIG['motion_fraction'],
+            idle_fps=MOTION_CONFIG['idle_fps'],
+            active_hold=MOTION_CONFIG['active_hold'],
+            metrics=metrics
+        ) if MOTION_CONFIG['enabled'] else None
+
+        def admit(frame, captured_at):
+            """Decisión del filtro de movimiento, o None si el frame no pasa a inferencia"""
+            # CPU del hilo de inferencia: thread_time mide el hilo que lo llama, así que
+            # la lectura inicial también se toma aquí y no en el hilo de la cámara
+            if state['inference_cpu'] is None:
+                state['inference_cpu'] = CpuUsage('inference_cpu_percent', clock=time.thread_time,
+                                                  metrics=metrics)
+            state['inference_cpu'].update()
+
+            # Escena quieta y sin mano: mostrar el frame sin pasar por MediaPipe
+            decision = gate.check(frame, captured_at) if gate else 'active'
+            if decision is None:
+                video_hub.publish(frame)
+                return None
+
+            # Limpiar memoria cada 100 frames
+            state['frame_count'] += 1
+            if state['frame_count'] % 100 == 0:
+                current_time = time.time()
+                if current_time - state['last_gc_time'] > 5:  # Cada 5 segundos máximo
+                    gc.collect()
+                    state['last_gc_time'] = current_time
+            return decision
+
+        def complete(captured_at, decision, processed):
+            processed_frame, gesture, confidence = processed
+            if gate:
+                gate.report_hand(detector.last_landmarks is not None, captured_at)
+                if decision == 'wake':
+                    # Desde la captura del primer frame con movimiento hasta tener su resultado
+                    metrics.observe('motion_wake', time.time() - captured_at)
+            if recorder:
+                recorder.record(captured_at, detector.last_landmarks,
+                                detector.last_handedness, gesture, confidence)
+
+            # Verificar que el frame procesado sea válido
+            if processed_frame is None or processed_frame.size == 0:
+                logger.warning("Frame procesado inválido, saltando...")
+                return None
+
+            # Referencia al frame sin copiar: desde aquí es de solo lectura
+            self.latest.publish(processed_frame, detector.last_overlay, gesture, confidence, captured_at)
+            video_hub.publish(processed_frame, detector.last_overlay)
+            self._publish_gesture(state, gesture, confidence)
+
+            # Solo pasan a publicación los gestos estables que ya cumplieron hold y cooldown
+            decision = decision_engine.update(captured_at, gesture, confidence)
+            if decision:
+                return (decision[0], decision[1], captured_at)
+            return None
+
+        if pool is None:
+            def infer(item):
+                seq, captured_at, frame = item
+                decision = admit(frame, captured_at)
+                if decision is None:
+                    return None
+                # Sin dibujar: el hub aplica el overlay solo si hay clientes mirando el video
+                return complete(captured_at, decision, detector.process_frame(frame, draw=False))
+
+            return infer, None
+
+        # Con el pool el detector y complete() corren en el hilo de resultados; si los
+        # procesos mueren pasan al de inferencia y el lock evita que ambos se crucen
+        detector_lock = threading.Lock()
+
+        def submit(item):
+            seq, captured_at, frame = item
+            decision = admit(frame, captured_at)
+            if decision is None:
+                return None
+            if pool.alive:
+                # Si el anillo está lleno el frame se descarta (pool_frames_dropped)
+                pool.submit(frame, (captured_at, frame, decision))
+                return None
+            if not self.inference_fallback:
+                self.inference_fallback = True
+                metrics.increment('pool_fallback')
+                logger.error(f"Cámara {self.source_id}: no quedan procesos de inferencia, "
+                             f"MediaPipe sigue en el hilo de la cámara")
+            with detector_lock:
+                return complete(captured_at, decision, detector.process_frame(frame, draw=False))
+
+        def on_result(result):
+            captured_at, frame, decision = result.tag
+            with detector_lock:
+                processed = detector.process_landmarks(frame, result.landmarks, result.handedness,
+                                                       result.score, draw=False)
+                return complete(captured_at, decision, processed)
+
+        return submit, on_result
+
+    def _consume_results(self, pool, on_result, pipeline, stop):
+        """Hilo que recibe los landmarks del pool en orden y alimenta la etapa de publicación"""
+        while not stop.is_set():
+            result = pool.get(timeout=0.2)
+            if result is None:
+                continue
+            try:
+                event = on_result(result)
+                if event is not None:
+                    pipeline.event_queue.put(event)
+            except Exception as e:
+                self.metrics.increment('errors')
+                logger.error(f"Error al completar el resultado {result.seq}: {e}")
+
+    def _publish_gesture(self, state, gesture, confidence, min_interval=0.5, min_change=0.05):
+        """Enviar el gesto por SSE al cambiar, o su confianza como máximo cada min_interval"""
+        now = time.time()
+        if gesture == state['sent_gesture']:
+            if now - state['sent_at'] < min_interval or abs(confidence - state['sent_confidence']) < min_change:
+                return
+        state['sent_gesture'] = gesture
+        state['sent_confidence'] = confidence
+        state['sent_at'] = now
+        self._publish_event('gesture', {
+            'gesture': gesture,
+            'confidence': confidence,
+            'gesture_info': GESTURE_ACTIONS.get(gesture, {}) if gesture else {}
+        })
+
+    def _publish_action(self, event):
+        """Etapa de publicación: delegar la acción del gesto decidido"""
+        gesture, confidence, captured_at = event
+        self.on_action(self.source_id, gesture, confidence)
+        return None
+
+    @property
+    def last_frame(self):
+        return self.latest.current.frame
+
+    def current_gesture(self):
+        snapshot = self.latest.current
+        return snapshot.gesture, snapshot.confidence
+
+    def status(self):
+        snapshot = self.latest.current
+        gesture, confidence = snapshot.gesture, snapshot.confidence
+        pipeline = self.pipeline
+        return {
+            'id': self.source_id,
+            'spec': self.spec,
+            'name': self.source_name,
+            'is_streaming': self.is_streaming,
+            'current_gesture': gesture,
+            'current_confidence': confidence,
+            'generation': snapshot.generation,
+            'gesture_info': GESTURE_ACTIONS.get(gesture, {}) if gesture else {},
+            'pipeline': pipeline.stats() if pipeline and self.is_streaming else None,
+            'inference_pool': self.pool.stats() if self.pool else None,
+            'inference_fallback': self.inference_fallback,
+            'classifier': self.detector.classifier_info(),
+            'video': self.video_hub.stats()
+        }
+
+    def metric_gauges(self):
+        """Gauges de colas y suscriptores para /api/metrics"""
+        pipeline = self.pipeline
+        gauges = pipeline.queue_gauges() if pipeline and self.is_streaming else {}
+        gauges['video_subscribers'] = self.video_hub.subscribers
+        pool = self.pool
+        if pool:
+            stats = pool.stats()
+            gauges['pool_in_flight'] = stats['in_flight']
+            gauges['pool_workers_alive'] = stats['alive']
+        return gauges
+
+    def metrics_summary(self):
+        summary = self.metrics.summary()
+        summary['gauges'].update(self.metric_gauges())
+        summary['roi'] = self.detector.roi_stats()
+        summary['debug_log'] = self.detector.debug_log.stats() if self.detector.debug_log else None
+        return summary
+
+    def close(self):
+        self.stop()
+        self.detector.release()
+
+
+class CameraManager:
+    """Conjunto de cámaras independientes, identificadas por id"""
+
+    def __init__(self, sources, on_action, events=None):
+        self.on_action = on_action
+        self.events = events
+        self._workers = {}
+        self._lock = threading.Lock()
+        # La primera cámara agregada es la predeterminada
+        self.default_id = None
+        for source_id, spec in sources:
+            self.add(source_id, spec)
+
+    def add(self, source_id, spec):
+        with self._lock:
+            if source_id in self._workers:
+                raise ValueError(f"Ya existe una cámara con id {source_id}")
+            worker = CameraWorker(source_id, spec, self.on_action, self.events)
+            self._workers[source_id] = worker
+            if self.default_id is None:
+                self.default_id = source_id
+        return worker
+
+    def get(self, source_id=None):
+        """Cámara por id (la predeterminada si es None); KeyError si no existe"""
+        return self._workers[self.default_id if source_id is None else source_id]
+
+    def workers(self):
+        with self._lock:
+            return list(self._workers.values())
+
+    def start(self, source_id=None):
+        """Iniciar una cámara, o todas si source_id es None"""
+        targets = [self.get(source_id)] if source_id is not None else self.workers()
+        return [worker.source_id for worker in targets if worker.start()]
+
+    def stop(self, source_id=None):
+        targets = [self.get(source_id)] if source_id is not None else self.workers()
+        for worker in targets:
+            worker.stop()
+
+    def set_spec(self, source_id, spec):
+        """Cambiar la fuente de una cámara y (re)iniciarla"""
+        worker = self.get(source_id)
+        if worker.is_streaming:
+            worker.stop()
+            time.sleep(1)  # Esperar a que se libere la cámara
+        worker.spec = spec
+        worker.start()
+        return worker
+
+    def status(self):
+        return {worker.source_id: worker.status() for worker in self.workers()}
+
+    def close(self):
+        for worker in self.workers():
+            worker.close()
@@ -15,11 +15,33 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306))
 }
 
+# Pool de conexiones; DB_BACKEND=sqlite permite probar sin servidor MySQL
+DB_POOL_CONFIG = {
+    'backend': os.getenv('DB_BACKEND', 'mysql'),              # 'mysql' o 'sqlite'
+    'size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'checkout_timeout': float(os.getenv('DB_POOL_TIMEOUT', 5.0)),  # Segundos esperando una conexión libre
+    'sqlite_path': os.getenv('SQLITE_PATH', 'control_gestos.db')
+}
+
+# Escritura diferida de acciones (DatabaseManager)
+DB_WRITE_CONFIG = {
+    'batch_size': int(os.getenv('DB_BATCH_SIZE', 50)),          # Filas por transacción
+    'flush_interval': float(os.getenv('DB_FLUSH_INTERVAL', 1.0)),  # Segundos máximos entre escrituras
+    'max_pending': int(os.getenv('DB_MAX_PENDING', 1000)),       # Límite de filas en memoria
+    'max_retries': int(os.getenv('DB_MAX_RETRIES', 5)),          # Reintentos de un lote ante errores transitorios
+    'overflow_policy': os.getenv('DB_OVERFLOW_POLICY', 'drop_oldest')  # 'drop_oldest' o 'drop_newest'
+}
+
 # Configuración de la cámara
 CAMERA_CONFIG = {
     'width': 640,
     'height': 480,
-    'fps': 15  # Reducido para mayor estabilidad
+    'fps': 15,  # Reducido para mayor estabilidad
+    # Índice de cámara, ruta de video, directorio de imágenes o 'synthetic' (frame_sources.py)
+    'source': os.getenv('CAMERA_SOURCE', ''),
+    # Varias cámaras con pipelines independientes: "0,1" o "entrada=0,pasillo=videos/a.mp4"
+    # Vacío = una sola cámara con 'source' (o el índice 0)
+    'sources': os.getenv('CAMERA_SOURCES', '')
 }
 
 # Configuración de detección de gestos
@@ -29,36 +51,150 @@ GESTURE_CONFIG = {
     'gesture_hold_time': 0.5          # Tiempo que debe mantenerse el gesto
 }
 
+# Decisión temporal (gesture_decision.py): votación en una ventana de frames con histéresis.
+# hold_time, cooldown y min_confidence se pueden ajustar por gesto en GESTURE_ACTIONS
+DECISION_CONFIG = {
+    'window': int(os.getenv('DECISION_WINDOW', 8)),   # Frames en la ventana de votación
+    'enter_ratio': 0.6,                               # Votos para que un gesto pase a candidato
+    'exit_ratio': 0.4,                                # Votos por debajo de los cuales deja de serlo
+    'cooldown': 2.0                                   # Segundos entre repeticiones del mismo gesto
+}
+
+# Seguimiento de la mano por región de interés: tras una detección confiable
+# MediaPipe recibe solo un recorte alrededor de la mano en los frames siguientes
+ROI_CONFIG = {
+    'enabled': os.getenv('ROI_TRACKING', '0') == '1',
+    'padding': float(os.getenv('ROI_PADDING', 0.35)),      # Margen alrededor de la mano (fracción del tamaño)
+    'input_size': int(os.getenv('ROI_INPUT_SIZE', 0)),     # Lado del recorte enviado a MediaPipe (0 = sin escalar)
+    'min_score': float(os.getenv('ROI_MIN_SCORE', 0.8)),   # Confianza mínima para empezar a seguir la mano
+    'min_size': 96,                                        # Lado mínimo del recorte en píxeles
+    'min_fill': float(os.getenv('ROI_MIN_FILL', 0.2)),     # Fracción mínima del recorte que ocupa la mano
+    'refresh_frames': int(os.getenv('ROI_REFRESH_FRAMES', 30))  # Búsqueda en el frame completo cada N frames (0 = nunca)
+}
+
+# Filtro de movimiento antes de la inferencia: con la escena quieta y sin mano
+# MediaPipe baja a idle_fps y vuelve a la tasa completa al detectar movimiento
+MOTION_CONFIG = {
+    'enabled': os.getenv('MOTION_GATE', '1') == '1',
+    'width': 64,                                              # Ancho del frame reducido que se compara
+    'pixel_delta': 12,                                        # Cambio mínimo de gris por píxel (0-255)
+    'motion_fraction': float(os.getenv('MOTION_FRACTION', 0.01)),  # Fracción de píxeles que deben cambiar
+    'idle_fps': float(os.getenv('IDLE_FPS', 2.0)),            # Inferencias por segundo en reposo
+    'active_hold': float(os.getenv('ACTIVE_HOLD', 3.0))       # Segundos a tasa completa tras movimiento o mano
+}
+
+# Registro de depuración de decisiones de gesto (debug_log.py), escrito por lotes con rotación
+DEBUG_LOG_CONFIG = {
+    'enabled': os.getenv('DEBUG_LOG', '1') == '1',                # Activo por defecto; DEBUG_LOG=0 lo desactiva
+    'directory': os.getenv('DEBUG_LOG_DIR', 'logs'),
+    'format': os.getenv('DEBUG_LOG_FORMAT', 'binary'),            # 'binary' (16 bytes por registro) o 'text'
+    'max_bytes': int(os.getenv('DEBUG_LOG_MAX_BYTES', 5 * 1024 * 1024)),  # Rotar al superar este tamaño
+    'max_age': float(os.getenv('DEBUG_LOG_MAX_AGE', 3600)),       # ...o esta antigüedad en segundos
+    'retention': int(os.getenv('DEBUG_LOG_RETENTION', 10))        # Archivos que se conservan
+}
+
+# Dónde corre MediaPipe: 'thread' (hilo de inferencia) o 'process' (procesos con memoria compartida)
+INFERENCE_CONFIG = {
+    'mode': os.getenv('INFERENCE_MODE', 'thread'),
+    'workers': int(os.getenv('INFERENCE_WORKERS', 1)),            # Procesos por cámara: uno activo, el resto de reserva
+    'slots': int(os.getenv('INFERENCE_SLOTS', 0)),                # Frames en vuelo (0 = 2)
+    'result_timeout': float(os.getenv('INFERENCE_RESULT_TIMEOUT', 2.0))  # Segundos antes de dar un frame por perdido
+}
+
+# Ejecución de acciones (action_dispatcher.py)
+ACTIONS_CONFIG = {
+    'backend': os.getenv('ACTION_BACKEND', 'pyautogui'),          # 'pyautogui' o 'recording' (sin escritorio)
+    'queue_size': int(os.getenv('ACTION_QUEUE_SIZE', 8)),         # Acciones en espera antes de rechazar nuevas
+    'timeout': float(os.getenv('ACTION_TIMEOUT', 5.0)),           # Segundos por acción (o 'timeout' por gesto)
+    'chrome_path': os.getenv('CHROME_PATH', '')                  # Vacío = buscar en rutas habituales y PATH
+}
+
+# Límites por comando. coalesce: las repeticiones que llegan dentro de 'window' segundos
+# se agrupan en una sola llamada (hasta max_repeat; idempotent = se ejecuta una vez).
+# rate/burst: token bucket; lo que lo supera se descarta
+ACTION_LIMITS = {
+    'volume_up': {'coalesce': True, 'window': 0.25, 'max_repeat': 10, 'rate': 5.0, 'burst': 10},
+    'f5': {'coalesce': True, 'window': 0.5, 'idempotent': True, 'rate': 1.0, 'burst': 2},
+    'chrome': {'rate': 0.2, 'burst': 1},
+    'screenshot': {'rate': 1.0, 'burst': 3}
+}
+
+# Capturas de pantalla (screenshot_pipeline.py)
+SCREENSHOT_CONFIG = {
+    'directory': os.getenv('SCREENSHOTS_DIR', 'screenshots'),
+    'save': os.getenv('SCREENSHOTS_SAVE', '1') == '1',            # 0 = solo en memoria (requiere ring_size)
+    'format': os.getenv('SCREENSHOT_FORMAT', 'png'),              # 'png', 'jpeg' o 'webp'
+    'png_compress_level': int(os.getenv('SCREENSHOT_PNG_LEVEL', 1)),  # 0-9: 1 comprime rápido
+    'quality': int(os.getenv('SCREENSHOT_QUALITY', 85)),          # JPEG/WebP, 1-100
+    'workers': int(os.getenv('SCREENSHOT_WORKERS', 2)),           # Hilos de codificación
+    'max_pending': int(os.getenv('SCREENSHOT_MAX_PENDING', 4)),   # Capturas sin codificar antes de descartar
+    'ring_size': int(os.getenv('SCREENSHOT_RING', 5))             # Últimas capturas en memoria (0 = ninguna)
+}
+
+# Clasificador de gestos: 'rules' (tabla de patrones de dedos) o 'learned' (modelo
+# entrenado con landmark_classifier.py). Se puede cambiar en caliente con /api/classifier
+CLASSIFIER_CONFIG = {
+    'engine': os.getenv('CLASSIFIER_ENGINE', 'rules'),
+    'model_path': os.getenv('CLASSIFIER_MODEL', 'models/gestos.npz'),
+    'budget_us': float(os.getenv('CLASSIFIER_BUDGET_US', 200))   # Costo máximo por frame del modelo
+}
+
+# Grabación de sesiones de landmarks para reproducirlas sin cámara (session_recording.py)
+RECORDING_CONFIG = {
+    'enabled': os.getenv('RECORD_SESSIONS', '0') == '1',
+    'directory': os.getenv('RECORDINGS_DIR', 'sessions')
+}
+
 # Mapeo de gestos a acciones
 GESTURE_ACTIONS = {
     'mano_abierta': {
         'action': 'abrir_navegador',
         'description': 'Abrir navegador Chrome',
         'command': 'chrome',
-        'min_confidence': 0.7
+        'min_confidence': 0.7,
+        # Dedos de pulgar a meñique: '1' extendido, '0' doblado, 'x' cualquiera
+        'patterns': [
+            {'fingers': '11111', 'confidence': 0.95},
+            # Mano semi-abierta (3-4 dedos)
+            {'fingers': 'xxxxx', 'extended': (3, 4), 'confidence': 0.85}
+        ]
     },
     'puño_cerrado': {
         'action': 'cerrar_ventana',
         'description': 'Cerrar ventana activa',
         'command': 'alt+f4',
-        'min_confidence': 0.7
+        'min_confidence': 0.7,
+        'patterns': [
+            {'fingers': '00000', 'confidence': 0.90}
+        ]
     },
     'pulgar_arriba': {
         'action': 'subir_volumen',
         'description': 'Subir volumen del sistema',
         'command': 'volume_up',
-        'min_confidence': 0.7
+        'min_confidence': 0.7,
+        'patterns': [
+            {'fingers': '10000', 'confidence': 0.85},
+            # Variación: pulgar y a lo sumo otro dedo
+            {'fingers': '1xxxx', 'extended': (1, 2), 'confidence': 0.80}
+        ]
     },
     'dos_dedos': {
         'action': 'captura_pantalla',
         'description': 'Tomar captura de pantalla',
         'command': 'screenshot',
-        'min_confidence': 0.7
+        'min_confidence': 0.7,
+        'patterns': [
+            {'fingers': 'x1100', 'confidence': 0.88}
+        ]
     },
     'rock_roll': {
         'action': 'refrescar',
         'description': 'Refrescar página (F5)',
         'command': 'f5',
-        'min_confidence': 0.7
+        'min_confidence': 0.7,
+        'patterns': [
+            {'fingers': 'x1001', 'confidence': 0.82}
+        ]
     }
 } 
\ No newline at end of file
@@ -1,134 +1,571 @@
-import mysql.connector
-from mysql.connector import Error
-from datetime import datetime
-from config import DB_CONFIG
+from datetime import datetime, timezone
+from collections import deque
+from config import DB_CONFIG, DB_WRITE_CONFIG, DB_POOL_CONFIG
+from db_pool import ConnectionPool, create_backend, DB_ERRORS, is_permanent_error
+from metrics import metrics
+import base64
+import threading
+import time
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INSERT_WITH_TIMESTAMP = """
+INSERT INTO acciones (usuario_id, gesto, accion_ejecutada, confianza, timestamp, created_at)
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_WITHOUT_TIMESTAMP = """
+INSERT INTO acciones (usuario_id, gesto, accion_ejecutada, confianza, created_at)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+# Páginas por (created_at, id) descendente: recorren idx_acciones_created_at sin OFFSET
+ACTIONS_COLUMNS = "id, usuario_id, gesto, accion_ejecutada, confianza, timestamp, created_at"
+
+SELECT_FIRST_PAGE = f"""
+SELECT {ACTIONS_COLUMNS} FROM acciones
+ORDER BY created_at DESC, id DESC
+LIMIT %s
+"""
+
+SELECT_NEXT_PAGE = f"""
+SELECT {ACTIONS_COLUMNS} FROM acciones
+WHERE (created_at, id) < (%s, %s)
+ORDER BY created_at DESC, id DESC
+LIMIT %s
+"""
+
+SELECT_BACKFILL = """
+SELECT id, timestamp FROM acciones
+WHERE created_at IS NULL AND id > %s
+ORDER BY id
+LIMIT %s
+"""
+
+UPDATE_CREATED_AT = "UPDATE acciones SET created_at = %s WHERE id = %s"
+
+MAX_PAGE_SIZE = 200
+# created_at de filas antiguas con timestamp ilegible: quedan al final de la paginación
+# en lugar de en NULL, que cortaría el cursor y las dejaría inalcanzables
+LEGACY_CREATED_AT = datetime(1970, 1, 1)
+BACKFILL_BATCH_SIZE = 1000
+
+REBUILD_SUMMARY = """
+INSERT INTO acciones_resumen (gesto, total_uses, confidence_sum, last_used)
+SELECT gesto, COUNT(*), SUM(confianza), MAX(timestamp)
+FROM acciones
+GROUP BY gesto
+"""
+
+def _fetch_dicts(cursor):
+    """Filas como diccionarios, igual en MySQL y SQLite"""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _utc_now():
+    """Hora UTC sin tzinfo, el formato de la columna created_at"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _parse_legacy_timestamp(value):
+    """Convertir el timestamp ISO en texto (con zona horaria) a UTC sin tzinfo"""
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    # Sin zona horaria se asume la hora local del servidor
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+def encode_cursor(created_at, action_id):
+    """Cursor opaco con la posición (created_at, id) de la última fila entregada"""
+    raw = f"{created_at.isoformat(timespec='microseconds')}|{action_id}"
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverso de encode_cursor; lanza ValueError si el cursor no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        created_at, action_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(action_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+
+def _aggregate_rows(rows):
+    """Agregados por gesto de un lote: {gesto: (usos, suma de confianza, último uso)}"""
+    deltas = {}
+    for _, gesto, _, confianza, timestamp, _ in rows:
+        count, confidence_sum, last_used = deltas.get(gesto, (0, 0.0, None))
+        # La columna confianza es DECIMAL(5,2): sumar el valor tal como queda guardado
+        confidence_sum += round(float(confianza), 2)
+        if timestamp is not None and (last_used is None or timestamp > last_used):
+            last_used = timestamp
+        deltas[gesto] = (count + 1, confidence_sum, last_used)
+    return deltas
+
 class DatabaseManager:
-    def __init__(self):
-        self.connection = None
+    def __init__(self, batch_size=None, flush_interval=None, max_pending=None, overflow_policy=None,
+                 backend=None, pool_size=None, max_retries=None):
+        # Cada operación pide prestada una conexión del pool y la devuelve al terminar
+        self.backend = backend or create_backend(DB_POOL_CONFIG, DB_CONFIG)
+        self.pool_size = pool_size or DB_POOL_CONFIG['size']
+        self.pool = None
+        
+        # Cola de escritura diferida: insert_action nunca espera a la base de datos
+        self.batch_size = batch_size or DB_WRITE_CONFIG['batch_size']
+        self.flush_interval = flush_interval or DB_WRITE_CONFIG['flush_interval']
+        self.max_pending = max_pending or DB_WRITE_CONFIG['max_pending']
+        self.overflow_policy = overflow_policy or DB_WRITE_CONFIG['overflow_policy']
+        self.max_retries = DB_WRITE_CONFIG['max_retries'] if max_retries is None else max_retries
+        if self.overflow_policy not in ('drop_oldest', 'drop_newest'):
+            raise ValueError(f"Política de desborde no válida: {self.overflow_policy}")
+        self._pending = deque()
+        self._pending_cond = threading.Condition()
+        self._writer_running = False
+        self._writer_thread = None
+        # Interrumpe la espera entre reintentos al cerrar (insert_action no la despierta)
+        self._writer_stop = threading.Event()
+        self._in_flight = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.batches_written = 0
+        self.write_failures = 0
+        self.rows_rejected = 0
+        self._retries = 0
+        
+        # Agregados por gesto: {gesto: [total_uses, confidence_sum, last_used]}
+        self._gesture_stats = {}
+        self._stats_lock = threading.Lock()
+        # Funciones (stats, replace) llamadas cuando cambian las estadísticas
+        self._stats_listeners = []
+        # Serializa las transacciones que modifican acciones_resumen
+        self._summary_lock = threading.Lock()
+        
+        # Relleno de created_at en filas anteriores a la migración
+        self._backfill_thread = None
+        self._backfill_running = False
+        self.rows_backfilled = 0
+        
         self.connect()
         self.create_tables()
+        self.rebuild_stats()
+        self.start_writer()
     
     def connect(self):
-        """Establecer conexión con la base de datos MySQL"""
+        """Crear el pool de conexiones y verificar que la base de datos responde"""
         try:
-            self.connection = mysql.connector.connect(**DB_CONFIG)
-            if self.connection.is_connected():
-                logger.info("Conexión exitosa a MySQL")
-        except Error as e:
-            logger.error(f"Error al conectar a MySQL: {e}")
+            self.pool = ConnectionPool(self.backend, self.pool_size, DB_POOL_CONFIG['checkout_timeout'])
+            with self.pool.connection():
+                logger.info(f"Conexión exitosa a {self.backend.name} (pool de {self.pool_size})")
+        except DB_ERRORS as e:
+            logger.error(f"Error al conectar a {self.backend.name}: {e}")
             raise
     
     def create_tables(self):
         """Crear las tablas necesarias si no existen"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Crear tabla de acciones
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS acciones (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                usuario_id INT DEFAULT 1,
-                gesto VARCHAR(50) NOT NULL,
-                accion_ejecutada VARCHAR(100) NOT NULL,
-                confianza DECIMAL(5,2) NOT NULL,
-                timestamp VARCHAR(40) NOT NULL
-            )
-            """
-            cursor.execute(create_table_query)
-            self.connection.commit()
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    # Crear tabla de acciones y su resumen por gesto
+                    cursor.execute(self.backend.create_table_sql())
+                    cursor.execute(self.backend.create_summary_table_sql())
+                    connection.commit()
+                finally:
+                    cursor.close()
             logger.info("Tabla 'acciones' creada/verificada exitosamente")
             
-        except Error as e:
+        except DB_ERRORS as e:
             logger.error(f"Error al crear tablas: {e}")
             raise
-        finally:
-            if cursor:
-                cursor.close()
+        self.migrate_schema()
+    
+    def migrate_schema(self):
+        """Agregar created_at y su índice a tablas antiguas sin detener la aplicación.
+        
+        Es idempotente: solo aplica los pasos que faltan. Las filas existentes se
+        rellenan por lotes en un hilo aparte mientras las nuevas ya se escriben con
+        created_at; ninguna queda en NULL, que cortaría la paginación por cursor.
+        """
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    if not self.backend.has_column(cursor, 'acciones', 'created_at'):
+                        logger.info("Migrando 'acciones': agregando columna created_at")
+                        cursor.execute(self.backend.add_time_column_sql())
+                    if not self.backend.has_index(cursor, 'acciones', 'idx_acciones_created_at'):
+                        logger.info("Migrando 'acciones': creando índice idx_acciones_created_at")
+                        cursor.execute(self.backend.create_time_index_sql())
+                    connection.commit()
+                    cursor.execute("SELECT 1 FROM acciones WHERE created_at IS NULL LIMIT 1")
+                    needs_backfill = cursor.fetchone() is not None
+                finally:
+                    cursor.close()
+        except DB_ERRORS as e:
+            logger.error(f"Error al migrar el esquema: {e}")
+            raise
+        if needs_backfill:
+            self._backfill_running = True
+            self._backfill_thread = threading.Thread(target=self._backfill_created_at, name='db-backfill', daemon=True)
+            self._backfill_thread.start()
+    
+    def _backfill_created_at(self):
+        """Copiar el timestamp en texto a created_at en lotes cortos por id"""
+        last_id = 0
+        skipped = 0
+        while self._backfill_running:
+            try:
+                with self.pool.connection() as connection:
+                    cursor = connection.cursor()
+                    try:
+                        cursor.execute(self.backend.sql(SELECT_BACKFILL), (last_id, BACKFILL_BATCH_SIZE))
+                        rows = cursor.fetchall()
+                        if not rows:
+                            break
+                        last_id = rows[-1][0]
+                        updates = []
+                        for action_id, timestamp in rows:
+                            created_at = _parse_legacy_timestamp(timestamp)
+                            if created_at is None:
+                                skipped += 1
+                                created_at = LEGACY_CREATED_AT
+                            updates.append((self.backend.time_param(created_at), action_id))
+                        if updates:
+                            cursor.executemany(self.backend.sql(UPDATE_CREATED_AT), updates)
+                        connection.commit()
+                    finally:
+                        cursor.close()
+                self.rows_backfilled += len(updates)
+            except DB_ERRORS as e:
+                logger.error(f"Error al rellenar created_at: {e}")
+                time.sleep(1.0)
+                continue
+            # Ceder la base de datos a las escrituras en curso entre lotes
+            time.sleep(0.01)
+        self._backfill_running = False
+        logger.info(f"Relleno de created_at terminado: {self.rows_backfilled} filas"
+                    + (f", {skipped} con timestamp ilegible (created_at {LEGACY_CREATED_AT:%Y-%m-%d})"
+                       if skipped else ""))
     
     def insert_action(self, gesto, accion_ejecutada, confianza, usuario_id=1, timestamp=None):
-        """Insertar una nueva acción en la base de datos, usando hora de Perú en formato ISO 8601 si se provee.
+        """Encolar una acción para escribirla en lote desde el hilo de escritura.
+        
+        No bloquea: si la cola está llena se aplica overflow_policy ('drop_oldest'
+        descarta la fila más antigua, 'drop_newest' rechaza la nueva). Retorna False
+        si la fila fue rechazada.
         IMPORTANTE: El campo 'timestamp' en la tabla 'acciones' debe ser VARCHAR(40) para soportar zona horaria.
         """
-        try:
-            cursor = self.connection.cursor()
-            if timestamp is not None:
-                insert_query = """
-                INSERT INTO acciones (usuario_id, gesto, accion_ejecutada, confianza, timestamp)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                cursor.execute(insert_query, (usuario_id, gesto, accion_ejecutada, confianza, timestamp))
+        row = (usuario_id, gesto, accion_ejecutada, confianza, timestamp, self.backend.time_param(_utc_now()))
+        with self._pending_cond:
+            if len(self._pending) >= self.max_pending:
+                self.rows_dropped += 1
+                metrics.increment('db_rows_dropped')
+                if self.rows_dropped % 100 == 1:
+                    logger.warning(f"Cola de escritura llena ({self.overflow_policy}): "
+                                   f"{self.rows_dropped} acciones descartadas")
+                if self.overflow_policy == 'drop_newest':
+                    return False
+                self._pending.popleft()
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._pending_cond.notify()
+        return True
+    
+    def start_writer(self):
+        """Iniciar el hilo de escritura en segundo plano"""
+        if self._writer_thread and self._writer_thread.is_alive():
+            return
+        self._writer_running = True
+        self._writer_stop.clear()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer_thread.start()
+    
+    def _writer_loop(self):
+        while True:
+            with self._pending_cond:
+                # Escribir al llenar un lote o al vencer el intervalo
+                if self._writer_running and len(self._pending) < self.batch_size:
+                    self._pending_cond.wait(self.flush_interval)
+                if not self._pending:
+                    if not self._writer_running:
+                        break
+                    continue
+                count = min(len(self._pending), self.batch_size)
+                rows = [self._pending.popleft() for _ in range(count)]
+                self._in_flight = count
+            
+            error = self._write_batch(rows)
+            if error is None:
+                self._retries = 0
+                backoff = 0.0
             else:
-                insert_query = """
-                INSERT INTO acciones (usuario_id, gesto, accion_ejecutada, confianza)
-                VALUES (%s, %s, %s, %s)
-                """
-                cursor.execute(insert_query, (usuario_id, gesto, accion_ejecutada, confianza))
-            self.connection.commit()
-            logger.info(f"Acción registrada: {gesto} -> {accion_ejecutada}")
-            return cursor.lastrowid
-        except Error as e:
-            logger.error(f"Error al insertar acción: {e}")
-            raise
-        finally:
-            if cursor:
-                cursor.close()
+                backoff = self._handle_failed_batch(rows, error)
+            with self._pending_cond:
+                self._in_flight = 0
+                self._pending_cond.notify_all()
+            if backoff and self._writer_stop.wait(backoff):
+                # Cierre durante la espera: un último intento con lo que quedó en la cola
+                self._final_flush()
+                break
     
-    def get_recent_actions(self, limit=50):
-        """Obtener las acciones más recientes"""
-        cursor = None
+    def _final_flush(self):
+        """Al cerrar: intentar una vez escribir lo pendiente y registrar lo que se pierda"""
+        with self._pending_cond:
+            remaining = list(self._pending)
+            self._pending.clear()
+            self._in_flight = len(remaining)
+        while remaining:
+            batch, remaining = remaining[:self.batch_size], remaining[self.batch_size:]
+            error = self._write_batch(batch)
+            if error is None:
+                continue
+            if is_permanent_error(error):
+                batch = self._write_rows_individually(batch)
+                if not batch:
+                    continue
+            lost = len(batch) + len(remaining)
+            self.rows_dropped += lost
+            metrics.increment('db_rows_dropped', lost)
+            logger.error(f"Al cerrar se descartan {lost} acciones sin escribir: {error}")
+            break
+        with self._pending_cond:
+            self._in_flight = 0
+            self._pending_cond.notify_all()
+    
+    def _handle_failed_batch(self, rows, error):
+        """Decidir qué hacer con un lote fallido; retorna los segundos a esperar antes de seguir.
+        
+        Un error permanente (fila inválida, restricción) no se arregla reintentando:
+        el lote se escribe fila por fila y las que fallan se descartan. Un error
+        transitorio devuelve las filas a la cola con espera exponencial, hasta
+        max_retries intentos seguidos; después se descartan para no frenar la cola.
+        """
+        if is_permanent_error(error):
+            rows = self._write_rows_individually(rows)
+            if not rows:
+                self._retries = 0
+                return 0.0
+        self._retries += 1
+        if self._retries > self.max_retries:
+            self.rows_dropped += len(rows)
+            metrics.increment('db_rows_dropped', len(rows))
+            logger.error(f"Se descartan {len(rows)} acciones tras {self.max_retries} reintentos: {error}")
+            self._retries = 0
+            return 0.0
+        self._requeue(rows)
+        return min(self.flush_interval * 2 ** (self._retries - 1), 30.0)
+    
+    def _write_rows_individually(self, rows):
+        """Escribir de a una fila; retorna las que quedan sin escribir por un error transitorio"""
+        for i, row in enumerate(rows):
+            error = self._write_batch([row])
+            if error is None:
+                continue
+            if not is_permanent_error(error):
+                return rows[i:]
+            self.rows_rejected += 1
+            metrics.increment('db_rows_rejected')
+            logger.error(f"Acción descartada por datos inválidos ({row[1]!r}): {error}")
+        return []
+    
+    def _write_batch(self, rows):
+        """Insertar un lote con executemany en una sola transacción; retorna None o el error"""
+        start = time.perf_counter()
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
-            cursor = self.connection.cursor(dictionary=True)
-            select_query = """
-            SELECT * FROM acciones 
-            ORDER BY timestamp DESC 
-            LIMIT %s
-            """
-            cursor.execute(select_query, (limit,))
-            actions = cursor.fetchall()
-            return actions
-        except Error as e:
-            logger.error(f"Error al obtener acciones: {e}")
-            return []
-        finally:
-            if cursor:
-                cursor.close()
-    
-    def get_gesture_stats(self):
-        """Obtener estadísticas de gestos"""
-        cursor = None
+            deltas = _aggregate_rows(rows)
+            with self._summary_lock, self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    with_timestamp = [row for row in rows if row[4] is not None]
+                    without_timestamp = [row[:4] + row[5:] for row in rows if row[4] is None]
+                    if with_timestamp:
+                        cursor.executemany(self.backend.sql(INSERT_WITH_TIMESTAMP), with_timestamp)
+                    if without_timestamp:
+                        cursor.executemany(self.backend.sql(INSERT_WITHOUT_TIMESTAMP), without_timestamp)
+                    # El resumen se actualiza en la misma transacción que las filas
+                    cursor.executemany(self.backend.upsert_summary_sql(),
+                                       [(gesto, *delta) for gesto, delta in deltas.items()])
+                    connection.commit()
+                finally:
+                    cursor.close()
+                self._apply_stats(deltas)
+            self._notify_stats(self.get_gesture_stats(deltas.keys()), replace=False)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+            metrics.observe('db_flush', time.perf_counter() - start)
+            logger.info(f"Acciones registradas: {len(rows)}")
+            return None
+        except DB_ERRORS + (TypeError, ValueError) as e:
+            self.write_failures += 1
+            metrics.increment('errors')
+            logger.error(f"Error al insertar acciones: {e}")
+            return e
+    
+    def _apply_stats(self, deltas):
+        """Sumar los agregados de un lote ya confirmado a las estadísticas en memoria"""
+        with self._stats_lock:
+            for gesto, (count, confidence_sum, last_used) in deltas.items():
+                current = self._gesture_stats.setdefault(gesto, [0, 0.0, None])
+                current[0] += count
+                current[1] += confidence_sum
+                if last_used is not None and (current[2] is None or last_used > current[2]):
+                    current[2] = last_used
+    
+    def add_stats_listener(self, listener):
+        """Registrar listener(stats, replace) para recibir los cambios de estadísticas.
+        
+        Con replace=False, stats contiene solo los gestos modificados por un lote;
+        con replace=True, la lista completa. Se llama desde el hilo de escritura.
+        """
+        self._stats_listeners.append(listener)
+    
+    def _notify_stats(self, stats, replace):
+        for listener in self._stats_listeners:
+            try:
+                listener(stats, replace)
+            except Exception as e:
+                logger.error(f"Error en listener de estadísticas: {e}")
+    
+    def rebuild_stats(self):
+        """Recalcular acciones_resumen y las estadísticas en memoria desde la tabla base.
+        
+        Recorre toda la tabla 'acciones': solo se usa al iniciar o bajo demanda.
+        """
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
-            cursor = self.connection.cursor(dictionary=True)
-            stats_query = """
-            SELECT 
-                gesto,
-                COUNT(*) as total_uses,
-                AVG(confianza) as avg_confidence,
-                MAX(timestamp) as last_used
-            FROM acciones 
-            GROUP BY gesto 
-            ORDER BY total_uses DESC
-            """
-            cursor.execute(stats_query)
-            stats = cursor.fetchall()
-            return stats
-        except Error as e:
-            logger.error(f"Error al obtener estadísticas: {e}")
-            return []
-        finally:
-            if cursor:
-                cursor.close()
+            with self._summary_lock, self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("DELETE FROM acciones_resumen")
+                    cursor.execute(REBUILD_SUMMARY)
+                    connection.commit()
+                    cursor.execute("SELECT gesto, total_uses, confidence_sum, last_used FROM acciones_resumen")
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+                with self._stats_lock:
+                    self._gesture_stats = {
+                        gesto: [int(total), float(confidence_sum), last_used]
+                        for gesto, total, confidence_sum, last_used in rows
+                    }
+            logger.info(f"Estadísticas reconstruidas: {len(rows)} gestos")
+            self._notify_stats(self.get_gesture_stats(), replace=True)
+            return True
+        except DB_ERRORS as e:
+            logger.error(f"Error al reconstruir estadísticas: {e}")
+            return False
+    
+    def _requeue(self, rows):
+        """Devolver un lote fallido al frente de la cola respetando el límite"""
+        with self._pending_cond:
+            space = self.max_pending - len(self._pending)
+            if space < len(rows):
+                self.rows_dropped += len(rows) - max(space, 0)
+                metrics.increment('db_rows_dropped', len(rows) - max(space, 0))
+                rows = rows[len(rows) - max(space, 0):]
+            self._pending.extendleft(reversed(rows))
+    
+    def flush(self, timeout=5.0):
+        """Esperar a que se escriban las acciones pendientes"""
+        deadline = time.time() + timeout
+        with self._pending_cond:
+            self._pending_cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not (self._writer_thread and self._writer_thread.is_alive()):
+                    return False
+                self._pending_cond.wait(remaining)
+        return True
+    
+    def writer_stats(self):
+        """Estado de la cola de escritura"""
+        with self._pending_cond:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'batches_written': self.batches_written,
+            'write_failures': self.write_failures,
+            'rows_rejected': self.rows_rejected,
+            'rows_backfilled': self.rows_backfilled,
+            'backfill_running': self._backfill_running
+        }
+    
+    def get_actions_page(self, limit=50, cursor=None):
+        """Obtener una página de acciones, de la más reciente a la más antigua.
+        
+        Retorna (acciones, next_cursor); next_cursor es None en la última página.
+        Cada página es un recorrido acotado del índice (created_at, id), sin importar
+        cuántas filas tenga la tabla. Lanza ValueError si el cursor no es válido.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        position = decode_cursor(cursor) if cursor else None
+        try:
+            with self.pool.connection() as connection:
+                db_cursor = connection.cursor()
+                try:
+                    # Una fila extra indica si hay página siguiente
+                    if position is None:
+                        db_cursor.execute(self.backend.sql(SELECT_FIRST_PAGE), (limit + 1,))
+                    else:
+                        created_at = self.backend.time_param(position[0])
+                        db_cursor.execute(self.backend.sql(SELECT_NEXT_PAGE),
+                                          (created_at, position[1], limit + 1))
+                    actions = _fetch_dicts(db_cursor)
+                finally:
+                    db_cursor.close()
+        except DB_ERRORS as e:
+            logger.error(f"Error al obtener acciones: {e}")
+            return [], None
+        
+        next_cursor = None
+        if len(actions) > limit:
+            actions = actions[:limit]
+            last = actions[-1]
+            if last['created_at'] is not None:
+                next_cursor = encode_cursor(self.backend.time_value(last['created_at']), last['id'])
+        for action in actions:
+            created_at = self.backend.time_value(action['created_at'])
+            action['created_at'] = created_at.isoformat(timespec='microseconds') + 'Z' if created_at else None
+        return actions, next_cursor
+    
+    def get_recent_actions(self, limit=50):
+        """Obtener las acciones más recientes"""
+        return self.get_actions_page(limit)[0]
+    
+    def get_gesture_stats(self, gestures=None):
+        """Obtener estadísticas de gestos (O(número de gestos), sin consultar la base de datos)
+        
+        gestures limita el resultado a esos gestos.
+        """
+        with self._stats_lock:
+            items = (self._gesture_stats.items() if gestures is None else
+                     [(gesto, self._gesture_stats[gesto]) for gesto in gestures if gesto in self._gesture_stats])
+            snapshot = [(gesto, values[0], values[1], values[2]) for gesto, values in items]
+        stats = [{
+            'gesto': gesto,
+            'total_uses': total,
+            'avg_confidence': round(confidence_sum / total, 4) if total else 0.0,
+            'last_used': last_used
+        } for gesto, total, confidence_sum, last_used in snapshot]
+        stats.sort(key=lambda stat: stat['total_uses'], reverse=True)
+        return stats
     
     def close(self):
-        """Cerrar la conexión a la base de datos"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("Conexión a MySQL cerrada") 
\ No newline at end of file
+        """Escribir las acciones pendientes y cerrar la conexión a la base de datos"""
+        self._backfill_running = False
+        if self._backfill_thread:
+            self._backfill_thread.join(timeout=5.0)
+        with self._pending_cond:
+            self._writer_running = False
+            self._pending_cond.notify_all()
+        self._writer_stop.set()
+        if self._writer_thread:
+            self._writer_thread.join(timeout=10.0)
+            if self._writer_thread.is_alive():
+                logger.warning(f"No se pudieron escribir {len(self._pending)} acciones pendientes")
+        if self.pool:
+            self.pool.close_all()
+            logger.info(f"Conexiones a {self.backend.name} cerradas") 
\ No newline at end of file
@@ -0,0 +1,306 @@
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+import mysql.connector
+from mysql.connector import Error as MySQLError
+from metrics import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+
+# Errores que el código de base de datos debe tratar como fallos recuperables
+DB_ERRORS = (MySQLError, sqlite3.Error, PoolTimeoutError)
+
+# Errores de los datos o de la sentencia: reintentar el mismo lote no los resuelve.
+# Conexión caída, base bloqueada o pool agotado son transitorios
+PERMANENT_DB_ERRORS = (mysql.connector.errors.DataError, mysql.connector.errors.IntegrityError,
+                       mysql.connector.errors.ProgrammingError, mysql.connector.errors.NotSupportedError,
+                       sqlite3.DataError, sqlite3.IntegrityError, sqlite3.ProgrammingError,
+                       sqlite3.InterfaceError, TypeError, ValueError)
+
+
+def is_permanent_error(error):
+    return isinstance(error, PERMANENT_DB_ERRORS)
+
+
+class MySQLBackend:
+    """Conexiones mysql.connector con los parámetros de DB_CONFIG"""
+
+    name = 'MySQL'
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def is_healthy(self, connection):
+        # is_connected() hace ping al servidor
+        return connection.is_connected()
+
+    def sql(self, query):
+        return query
+
+    def create_table_sql(self):
+        return """
+        CREATE TABLE IF NOT EXISTS acciones (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            usuario_id INT DEFAULT 1,
+            gesto VARCHAR(50) NOT NULL,
+            accion_ejecutada VARCHAR(100) NOT NULL,
+            confianza DECIMAL(5,2) NOT NULL,
+            timestamp VARCHAR(40) NOT NULL,
+            created_at DATETIME(6) NOT NULL DEFAULT (UTC_TIMESTAMP(6))
+        )
+        """
+
+    def add_time_column_sql(self):
+        # ALGORITHM=INPLACE: la tabla sigue aceptando escrituras durante el cambio
+        return "ALTER TABLE acciones ADD COLUMN created_at DATETIME(6) NULL, ALGORITHM=INPLACE, LOCK=NONE"
+
+    def create_time_index_sql(self):
+        return "CREATE INDEX idx_acciones_created_at ON acciones (created_at, id) ALGORITHM=INPLACE LOCK=NONE"
+
+    def has_column(self, cursor, table, column):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (table, column)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def has_index(self, cursor, table, index):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (table, index)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def time_param(self, value):
+        """datetime UTC (sin tzinfo) tal como lo espera la columna created_at"""
+        return value
+
+    def time_value(self, value):
+        return value
+
+    def create_summary_table_sql(self):
+        return """
+        CREATE TABLE IF NOT EXISTS acciones_resumen (
+            gesto VARCHAR(50) NOT NULL PRIMARY KEY,
+            total_uses BIGINT NOT NULL DEFAULT 0,
+            confidence_sum DECIMAL(16,2) NOT NULL DEFAULT 0,
+            last_used VARCHAR(40) NULL
+        )
+        """
+
+    def upsert_summary_sql(self):
+        return """
+        INSERT INTO acciones_resumen (gesto, total_uses, confidence_sum, last_used)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_uses = total_uses + VALUES(total_uses),
+            confidence_sum = confidence_sum + VALUES(confidence_sum),
+            last_used = COALESCE(GREATEST(last_used, VALUES(last_used)), last_used, VALUES(last_used))
+        """
+
+
+class SQLiteBackend:
+    """Base SQLite en un archivo local, para pruebas de carga sin servidor MySQL"""
+
+    name = 'SQLite'
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        # Cada conexión la usa un solo hilo a la vez (la garantiza el pool)
+        connection = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def is_healthy(self, connection):
+        try:
+            connection.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def sql(self, query):
+        """Adaptar los parámetros de estilo MySQL (%s) a SQLite (?)"""
+        return query.replace('%s', '?')
+
+    def create_table_sql(self):
+        return """
+        CREATE TABLE IF NOT EXISTS acciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER DEFAULT 1,
+            gesto VARCHAR(50) NOT NULL,
+            accion_ejecutada VARCHAR(100) NOT NULL,
+            confianza DECIMAL(5,2) NOT NULL,
+            timestamp VARCHAR(40) NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        """
+
+    def add_time_column_sql(self):
+        return "ALTER TABLE acciones ADD COLUMN created_at TEXT NULL"
+
+    def create_time_index_sql(self):
+        return "CREATE INDEX IF NOT EXISTS idx_acciones_created_at ON acciones (created_at, id)"
+
+    def has_column(self, cursor, table, column):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+
+    def has_index(self, cursor, table, index):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?",
+                       (table, index))
+        return cursor.fetchone()[0] > 0
+
+    def time_param(self, value):
+        """SQLite guarda la hora UTC como texto ISO con microsegundos (ordenable)"""
+        return value.isoformat(sep=' ', timespec='microseconds')
+
+    def time_value(self, value):
+        return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+    def create_summary_table_sql(self):
+        return """
+        CREATE TABLE IF NOT EXISTS acciones_resumen (
+            gesto VARCHAR(50) NOT NULL PRIMARY KEY,
+            total_uses INTEGER NOT NULL DEFAULT 0,
+            confidence_sum REAL NOT NULL DEFAULT 0,
+            last_used VARCHAR(40) NULL
+        )
+        """
+
+    def upsert_summary_sql(self):
+        return """
+        INSERT INTO acciones_resumen (gesto, total_uses, confidence_sum, last_used)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(gesto) DO UPDATE SET
+            total_uses = total_uses + excluded.total_uses,
+            confidence_sum = confidence_sum + excluded.confidence_sum,
+            last_used = COALESCE(MAX(last_used, excluded.last_used), last_used, excluded.last_used)
+        """
+
+
+def create_backend(pool_config, db_config):
+    backend = pool_config.get('backend', 'mysql').lower()
+    if backend == 'sqlite':
+        return SQLiteBackend(pool_config.get('sqlite_path', 'control_gestos.db'))
+    if backend == 'mysql':
+        return MySQLBackend(db_config)
+    raise ValueError(f"Backend de base de datos no soportado: {backend}")
+
+
+class ConnectionPool:
+    """Pool de conexiones thread-safe con verificación al prestar y reconexión automática"""
+
+    def __init__(self, backend, size=5, checkout_timeout=5.0):
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1")
+        self.backend = backend
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.checkouts = 0
+        self.reconnects = 0
+
+    def _create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self.backend.connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        deadline = time.time() + self.checkout_timeout
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._create()
+                if connection is None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"Pool agotado ({self.size} conexiones en uso)")
+                    try:
+                        connection = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        raise PoolTimeoutError(f"Pool agotado ({self.size} conexiones en uso)")
+
+            if self.backend.is_healthy(connection):
+                self.checkouts += 1
+                return connection
+
+            # Conexión caída: descartarla y abrir otra
+            logger.warning(f"Conexión a {self.backend.name} perdida, reconectando...")
+            self.reconnects += 1
+            metrics.increment('db_reconnects')
+            self._discard(connection)
+
+    @contextmanager
+    def connection(self):
+        """Prestar una conexión durante un bloque with y devolverla al pool.
+
+        Al devolverla se cierra cualquier transacción abierta: mysql.connector
+        trabaja con autocommit=False y en REPEATABLE READ un SELECT deja fija
+        su instantánea, así que sin esto una conexión que solo leyó no vería
+        las filas que otras conexiones del pool confirmaron después. Las
+        escrituras hacen commit() dentro del bloque.
+        """
+        connection = self._checkout()
+        try:
+            yield connection
+        finally:
+            try:
+                connection.rollback()
+            except Exception:
+                # Si la conexión se cayó, _checkout() la descarta la próxima vez
+                pass
+            self._idle.put(connection)
+
+    def close_all(self):
+        """Cerrar las conexiones libres"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'size': self.size,
+            'open': self._created,
+            'idle': self._idle.qsize(),
+            'checkouts': self.checkouts,
+            'reconnects': self.reconnects
+        }
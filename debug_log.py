@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Registro de depuración de las decisiones de gesto
+Los registros se acumulan en memoria y un hilo los escribe por lotes, con rotación
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+from config import GESTURE_ACTIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GSTDBG01'
+
+# 16 bytes por decisión; fingers es la máscara de dedos (bit i = dedo i, pulgar = bit 0)
+DEBUG_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('confidence', '<f4'),
+    ('fingers', 'u1'),
+    ('gesture', 'u1'),
+    ('handedness', 'u1'),
+    ('reserved', 'u1')
+])
+
+HANDEDNESS_CODES = {None: 0, 'Left': 1, 'Right': 2}
+HANDEDNESS_NAMES = {code: name for name, code in HANDEDNESS_CODES.items()}
+EXTENSIONS = {'binary': '.gdl', 'text': '.txt'}
+
+
+def fingers_mask(fingers):
+    """Máscara de 5 bits con los dedos extendidos"""
+    mask = 0
+    for i, extended in enumerate(fingers):
+        if extended:
+            mask |= 1 << i
+    return mask
+
+
+def format_record(timestamp, fingers, confidence, gesture, handedness=None):
+    """Línea de texto con el mismo formato que el antiguo debug_gestos.txt"""
+    clock = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+    millis = int((timestamp % 1) * 1000)
+    extended = [bool(fingers >> i & 1) for i in range(5)]
+    hand = f" | Mano: {handedness}" if handedness else ""
+    return f"{clock}.{millis:03d} - Dedos: {extended} | Confianza: {confidence:.2f} | Gesto: {gesture}{hand}"
+
+
+class DebugLogWriter:
+    """Registro no bloqueante: log() solo agrega a una cola en memoria.
+
+    Un hilo en segundo plano vacía la cola cada flush_interval y escribe el lote
+    completo de una vez. El archivo rota al superar max_bytes o max_age segundos,
+    y solo se conservan los últimos retention archivos.
+    """
+
+    def __init__(self, directory='logs', prefix='debug_gestos', fmt='binary', max_bytes=5 * 1024 * 1024,
+                 max_age=3600.0, retention=10, flush_interval=1.0, max_pending=10000):
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"Formato de registro no soportado: {fmt}")
+        self.directory = directory
+        self.prefix = prefix
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retention = retention
+        self.flush_interval = flush_interval
+        self.gesture_names = [None] + list(GESTURE_ACTIONS.keys())
+        self._gesture_codes = {name: code for code, name in enumerate(self.gesture_names)}
+        # deque con maxlen: si el disco no da abasto se pierden los registros más antiguos
+        self._pending = deque(maxlen=max_pending)
+        self._stop = threading.Event()
+        self._file = None
+        self._file_path = None
+        self._file_size = 0
+        self._file_opened = 0.0
+        self.records_logged = 0
+        self.records_written = 0
+        self.rotations = 0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='debug-log', daemon=True)
+        self._thread.start()
+
+    def log(self, timestamp, fingers, confidence, gesture, handedness=None):
+        """Encolar una decisión (sin E/S; seguro desde el hilo de inferencia)"""
+        self._pending.append((timestamp, confidence, fingers_mask(fingers),
+                              self._gesture_codes.get(gesture, 0), HANDEDNESS_CODES.get(handedness, 0), 0))
+        self.records_logged += 1
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+        self._flush()
+        self._close_file()
+
+    def _flush(self):
+        count = len(self._pending)
+        if not count:
+            return
+        records = [self._pending.popleft() for _ in range(count)]
+        try:
+            if self._needs_rotation():
+                self._rotate()
+            data = self._encode(records)
+            self._file.write(data)
+            self._file.flush()
+            self._file_size += len(data)
+            self.records_written += count
+        except OSError as e:
+            logger.error(f"Error al escribir el registro de depuración: {e}")
+
+    def _encode(self, records):
+        if self.fmt == 'binary':
+            return np.array(records, dtype=DEBUG_DTYPE).tobytes()
+        lines = [format_record(ts, fingers, conf, self.gesture_names[gesture], HANDEDNESS_NAMES.get(hand))
+                 for ts, conf, fingers, gesture, hand, _ in records]
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def _needs_rotation(self):
+        return (self._file is None or self._file_size >= self.max_bytes or
+                time.time() - self._file_opened >= self.max_age)
+
+    def _rotate(self):
+        self._close_file()
+        # Fecha y número de rotación: el orden alfabético es el cronológico
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        sequence = self.rotations
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{sequence:04d}{EXTENSIONS[self.fmt]}")
+        while os.path.exists(path):
+            sequence += 1
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{sequence:04d}{EXTENSIONS[self.fmt]}")
+        self._file = open(path, 'wb')
+        self._file_path = path
+        self._file_opened = time.time()
+        self._file_size = 0
+        if self.fmt == 'binary':
+            header = _build_header(self.gesture_names)
+            self._file.write(header)
+            self._file_size = len(header)
+        self.rotations += 1
+        self._apply_retention()
+
+    def _apply_retention(self):
+        # Solo los archivos de este prefijo exacto: 'debug_gestos_*' también abarcaría los
+        # de cada cámara (debug_gestos_<id>_...), y sus ids pueden ser números
+        pattern = re.compile(re.escape(self.prefix) + r'_\d{8}_\d{6}_\d{4}' + re.escape(EXTENSIONS[self.fmt]))
+        files = sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                       if pattern.fullmatch(name))
+        for path in files[:-self.retention] if self.retention > 0 else []:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"No se pudo borrar {path}: {e}")
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Escribir lo pendiente y cerrar el archivo actual"""
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'logged': self.records_logged,
+            'written': self.records_written,
+            'dropped': max(0, self.records_logged - self.records_written - len(self._pending)),
+            'rotations': self.rotations,
+            'file': self._file_path
+        }
+
+
+def _build_header(gesture_names):
+    meta = json.dumps({'version': 1, 'record_size': DEBUG_DTYPE.itemsize,
+                       'gestures': gesture_names}).encode('utf-8')
+    return MAGIC + struct.pack('<I', len(meta)) + meta
+
+
+def read_log(path):
+    """Registros de un archivo binario como (arreglo estructurado, nombres de gestos)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un registro de depuración binario")
+        (meta_size,) = struct.unpack('<I', f.read(4))
+        meta = json.loads(f.read(meta_size).decode('utf-8'))
+        offset = len(MAGIC) + 4 + meta_size
+    # Ignorar un registro final incompleto
+    count = (os.path.getsize(path) - offset) // DEBUG_DTYPE.itemsize
+    return np.fromfile(path, dtype=DEBUG_DTYPE, count=count, offset=offset), meta['gestures']
+
+
+def create_debug_log(config, prefix='debug_gestos'):
+    """Crear el registro según DEBUG_LOG_CONFIG (None si está desactivado)"""
+    if not config.get('enabled'):
+        return None
+    return DebugLogWriter(
+        directory=config['directory'],
+        prefix=prefix,
+        fmt=config['format'],
+        max_bytes=config['max_bytes'],
+        max_age=config['max_age'],
+        retention=config['retention']
+    )
+
+
+def main():
+    """Mostrar registros binarios en texto, en orden cronológico"""
+    parser = argparse.ArgumentParser(description="Leer el registro de depuración de gestos")
+    parser.add_argument('paths', nargs='*', default=['logs'], help="Archivos .gdl o directorios")
+    parser.add_argument('--gesture', help="Mostrar solo este gesto")
+    parser.add_argument('--tail', type=int, default=0, help="Mostrar solo los últimos N registros")
+    parser.add_argument('--summary', action='store_true', help="Conteo por gesto en lugar de registros")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, f"*{EXTENSIONS['binary']}"))))
+        else:
+            files.append(path)
+
+    lines = []
+    counts = {}
+    for path in files:
+        records, names = read_log(path)
+        for rec in records:
+            gesture = names[rec['gesture']]
+            if args.gesture and gesture != args.gesture:
+                continue
+            counts[gesture] = counts.get(gesture, 0) + 1
+            if not args.summary:
+                lines.append(format_record(float(rec['timestamp']), int(rec['fingers']), float(rec['confidence']),
+                                           gesture, HANDEDNESS_NAMES.get(int(rec['handedness']))))
+
+    if args.summary:
+        for gesture, count in sorted(counts.items(), key=lambda item: -item[1]):
+            print(f"{gesture}: {count}")
+        return 0
+    for line in lines[-args.tail:] if args.tail else lines:
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import json
+import threading
+import logging
+from collections import deque
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _encode_event(seq, event_type, data):
+    """Formato de un evento Server-Sent Events"""
+    payload = json.dumps(data, default=str, ensure_ascii=False)
+    prefix = f"id: {seq}\n" if seq is not None else ""
+    return f"{prefix}event: {event_type}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class EventBroadcaster:
+    """Canal SSE: un solo productor y cualquier número de suscriptores.
+
+    Cada evento se serializa una vez y se guarda con su número de secuencia en
+    un historial acotado. Los suscriptores esperan en la misma condición y leen
+    del historial lo que les falta, como el hub de video con sus generaciones.
+    Un suscriptor que se atrasa más que el historial recibe 'resync'.
+    """
+
+    def __init__(self, history=256, keepalive=15.0):
+        self.keepalive = keepalive
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self.events_published = 0
+        self.subscribers = 0
+
+    def publish(self, event_type, data):
+        """Publicar un evento para todos los suscriptores (no bloquea al productor)"""
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, _encode_event(self._seq, event_type, data)))
+            self.events_published += 1
+            self._cond.notify_all()
+
+    def _pending(self, last_seq):
+        """Eventos posteriores a last_seq; None si ya salieron del historial"""
+        if not self._events or self._events[-1][0] <= last_seq:
+            return []
+        if self._events[0][0] > last_seq + 1:
+            return None
+        return [chunk for seq, chunk in self._events if seq > last_seq]
+
+    def stream(self, initial=None, last_event_id=None):
+        """Generador text/event-stream para un cliente.
+
+        initial: lista de (tipo, datos) que se envían primero solo a este cliente
+        (estado actual). last_event_id: reanudar tras una reconexión del navegador.
+        """
+        with self._cond:
+            self.subscribers += 1
+            last_seq = self._seq
+            if last_event_id is not None and last_event_id <= self._seq:
+                last_seq = last_event_id
+        try:
+            yield b"retry: 3000\n\n"
+            for event_type, data in initial or ():
+                yield _encode_event(None, event_type, data)
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq > last_seq, self.keepalive)
+                    chunks = self._pending(last_seq)
+                    current = self._seq
+                if chunks is None:
+                    # Se perdieron eventos: el cliente debe recargar su estado
+                    chunks = [_encode_event(current, 'resync', {})]
+                elif not chunks:
+                    # Comentario SSE para mantener viva la conexión
+                    chunks = [b": keepalive\n\n"]
+                last_seq = current
+                yield b"".join(chunks)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def stats(self):
+        return {
+            'sequence': self._seq,
+            'events_published': self.events_published,
+            'subscribers': self.subscribers
+        }
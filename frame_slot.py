@@ -0,0 +1,49 @@
+import itertools
+
+
+class Snapshot:
+    """Resultado publicado de un frame: no se modifica después de publicarse"""
+
+    __slots__ = ('generation', 'frame', 'overlay', 'gesture', 'confidence', 'captured_at')
+
+    def __init__(self, generation=0, frame=None, overlay=None, gesture=None, confidence=0.0, captured_at=None):
+        self.generation = generation
+        self.frame = frame
+        self.overlay = overlay
+        self.gesture = gesture
+        self.confidence = confidence
+        self.captured_at = captured_at
+
+
+EMPTY_SNAPSHOT = Snapshot()
+
+
+class VersionedSlot:
+    """Último resultado publicado, sin locks para el productor ni para los lectores.
+
+    publish() arma un Snapshot nuevo y reemplaza la referencia actual (una
+    asignación, atómica en CPython). Un lector toma `current` una vez y tiene una
+    vista consistente de frame, overlay y gesto de la misma generación, aunque
+    el productor publique otros mientras tanto. El frame se marca de solo
+    lectura al publicarlo: se comparte sin copiarlo y quien necesite dibujar
+    sobre él debe hacerlo en su propio buffer.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self._current = EMPTY_SNAPSHOT
+
+    def publish(self, frame=None, overlay=None, gesture=None, confidence=0.0, captured_at=None):
+        if frame is not None:
+            frame.flags.writeable = False
+        snapshot = Snapshot(next(self._counter), frame, overlay, gesture, confidence, captured_at)
+        self._current = snapshot
+        return snapshot
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def generation(self):
+        return self._current.generation
@@ -0,0 +1,268 @@
+import os
+import sys
+import time
+import queue
+import threading
+import logging
+import cv2
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FrameSource:
+    """Fuente de frames con la misma interfaz que cv2.VideoCapture (read -> ret, frame)"""
+
+    name = 'source'
+
+    def open(self):
+        """Abrir la fuente; retorna True si está lista para leer"""
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class CameraSource(FrameSource):
+    """Cámara física mediante cv2.VideoCapture"""
+
+    def __init__(self, index=0, width=640, height=480, fps=15, backend=None):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        # DirectShow en Windows; en otros sistemas el backend por defecto
+        if backend is None:
+            backend = cv2.CAP_DSHOW if sys.platform.startswith('win') else cv2.CAP_ANY
+        self.backend = backend
+        self.cap = None
+        self.name = f'camera:{index}'
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index, self.backend)
+        if not self.cap.isOpened():
+            logger.error(f'No se pudo abrir la cámara {self.index}')
+            return False
+
+        # Configurar cámara con valores más conservadores
+        try:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)  # Desactivar autofocus
+            self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)  # Configurar exposición manual
+        except Exception as e:
+            logger.warning(f'Error al configurar cámara: {e}')
+        return True
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+
+class VideoFileSource(FrameSource):
+    """Archivo de video, una vez o en bucle, a velocidad nativa o máxima"""
+
+    def __init__(self, path, loop=False, realtime=True):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.cap = None
+        self.frame_interval = 0.0
+        self._next_time = 0.0
+        self.name = f'video:{os.path.basename(path)}'
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            logger.error(f'No se pudo abrir el video {self.path}')
+            return False
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if self.realtime and fps and fps > 0 else 0.0
+        self._next_time = time.perf_counter()
+        return True
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if ret and self.frame_interval:
+            _wait_until(self._next_time)
+            self._next_time += self.frame_interval
+        return ret, frame
+
+    def release(self):
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+
+class ImageDirectorySource(FrameSource):
+    """Imágenes de un directorio en orden alfabético"""
+
+    def __init__(self, directory, loop=False, fps=None):
+        self.directory = directory
+        self.loop = loop
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.files = []
+        self._position = 0
+        self._next_time = 0.0
+        self.name = f'images:{os.path.basename(os.path.normpath(directory))}'
+
+    def open(self):
+        self.files = sorted(
+            os.path.join(self.directory, f) for f in os.listdir(self.directory)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.files:
+            logger.error(f'No hay imágenes en {self.directory}')
+            return False
+        self._position = 0
+        self._next_time = time.perf_counter()
+        return True
+
+    def read(self):
+        if self._position >= len(self.files):
+            if not self.loop:
+                return False, None
+            self._position = 0
+        frame = cv2.imread(self.files[self._position])
+        self._position += 1
+        if self.frame_interval:
+            _wait_until(self._next_time)
+            self._next_time += self.frame_interval
+        return frame is not None, frame
+
+
+class SyntheticSource(FrameSource):
+    """Generador determinista de frames (un rectángulo que se desplaza) para pruebas sin cámara"""
+
+    def __init__(self, width=640, height=480, fps=None, count=None, seed=0):
+        self.width = width
+        self.height = height
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.count = count
+        self.seed = seed
+        self._index = 0
+        self._next_time = 0.0
+        self._background = None
+        self.name = f'synthetic:{width}x{height}'
+
+    def open(self):
+        rng = np.random.default_rng(self.seed)
+        self._background = rng.integers(0, 64, (self.height, self.width, 3), dtype=np.uint8)
+        self._index = 0
+        self._next_time = time.perf_counter()
+        return True
+
+    def read(self):
+        if self.count is not None and self._index >= self.count:
+            return False, None
+        frame = self._background.copy()
+        size = min(self.width, self.height) // 4
+        x = (self._index * 7) % max(1, self.width - size)
+        y = (self._index * 3) % max(1, self.height - size)
+        cv2.rectangle(frame, (x, y), (x + size, y + size), (200, 180, 160), -1)
+        self._index += 1
+        if self.frame_interval:
+            _wait_until(self._next_time)
+            self._next_time += self.frame_interval
+        return True, frame
+
+
+class PrefetchSource(FrameSource):
+    """Lee frames de otra fuente en un hilo propio y los deja en una cola acotada"""
+
+    def __init__(self, source, queue_size=4):
+        self.source = source
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._running = False
+        self._thread = None
+        self.name = f'{source.name}+prefetch'
+
+    def open(self):
+        if not self.source.open():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'prefetch-{self.source.name}', daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.source.read()
+            # Bloquea si el consumidor va atrasado: el prefetch no descarta frames
+            while self._running:
+                try:
+                    self.queue.put((ret, frame), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if not ret:
+                break
+
+    def read(self):
+        try:
+            return self.queue.get(timeout=1.0)
+        except queue.Empty:
+            return False, None
+
+    def release(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        self.source.release()
+
+
+def _wait_until(deadline):
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def create_source(spec, camera_config=None, prefetch=0, loop=False, realtime=True):
+    """Crear una fuente a partir de una especificación.
+
+    - entero o "0", "1"...: cámara con ese índice
+    - "synthetic" o "synthetic:640x480": generador sintético
+    - directorio: imágenes del directorio
+    - cualquier otra ruta: archivo de video
+    """
+    camera_config = camera_config or {}
+    spec = str(spec).strip()
+
+    if spec.isdigit():
+        source = CameraSource(int(spec), camera_config.get('width', 640),
+                              camera_config.get('height', 480), camera_config.get('fps', 15))
+    elif spec.startswith('synthetic'):
+        width, height = camera_config.get('width', 640), camera_config.get('height', 480)
+        if ':' in spec:
+            width, height = (int(v) for v in spec.split(':', 1)[1].split('x'))
+        source = SyntheticSource(width, height, fps=camera_config.get('fps') if realtime else None)
+    elif os.path.isdir(spec):
+        source = ImageDirectorySource(spec, loop=loop, fps=camera_config.get('fps') if realtime else None)
+    else:
+        source = VideoFileSource(spec, loop=loop, realtime=realtime)
+
+    if prefetch:
+        source = PrefetchSource(source, queue_size=prefetch)
+    return source
@@ -0,0 +1,36 @@
+import numpy as np
+from gesture_detector import (GESTURE_RULES, STRICT_INDEX, STRICT_SLACK,
+                              DEBUG_INDEX, DEBUG_SLACK)
+
+# Reglas de dedos extendidos disponibles: 'debug' es la que usa process_frame,
+# 'strict' la de detect_gesture/_classify_gesture
+FINGER_RULES = {
+    'debug': (DEBUG_INDEX, DEBUG_SLACK),
+    'strict': (STRICT_INDEX, STRICT_SLACK)
+}
+
+
+# Misma tabla que el camino de un solo frame: el resultado por lotes es idéntico por construcción
+LABEL_TABLE = GESTURE_RULES.labels
+CONFIDENCE_TABLE = GESTURE_RULES.confidences
+
+
+def finger_masks(landmarks, rule='debug'):
+    """Máscaras de dedos extendidos (uint8, bit 0 = pulgar) para un arreglo Nx21x3"""
+    index, slack = FINGER_RULES[rule]
+    flat = np.asarray(landmarks, dtype=np.float32).reshape(-1, 63)
+    left = flat[:, index[0]]
+    right = flat[:, index[1]]
+    right += slack
+    extended = left < right
+    return np.packbits(extended, axis=1, bitorder='little').reshape(-1)
+
+
+def classify_batch(landmarks, rule='debug'):
+    """Clasificar N manos a la vez.
+
+    Retorna (etiquetas, confianzas, máscaras): etiquetas es un arreglo de objetos
+    con el nombre del gesto o None, igual que el camino de un solo frame.
+    """
+    masks = finger_masks(landmarks, rule)
+    return LABEL_TABLE[masks], CONFIDENCE_TABLE[masks], masks
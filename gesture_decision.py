@@ -0,0 +1,157 @@
+import math
+import numpy as np
+from config import GESTURE_CONFIG, GESTURE_ACTIONS
+from metrics import metrics as default_metrics
+
+
+class GestureDecisionEngine:
+    """Decidir cuándo un gesto dispara su acción a partir de la secuencia de frames.
+
+    Guarda las últimas `window` etiquetas y confianzas en un buffer circular con
+    conteos por gesto actualizados de forma incremental (O(1) por frame). Un gesto
+    pasa a candidato cuando tiene al menos enter_ratio de los votos de la ventana y
+    deja de serlo al bajar de exit_ratio (histéresis). El candidato dispara cuando
+    se mantuvo hold_time segundos con confianza media suficiente y pasó su
+    cooldown. hold_time, cooldown y min_confidence se pueden definir por gesto en
+    GESTURE_ACTIONS.
+    """
+
+    def __init__(self, window=8, enter_ratio=0.6, exit_ratio=0.4, hold_time=None, cooldown=2.0,
+                 min_confidence=0.7, actions=None, metrics=None):
+        if window < 1:
+            raise ValueError("La ventana debe tener al menos un frame")
+        if not 0 < exit_ratio <= enter_ratio <= 1:
+            raise ValueError("Se requiere 0 < exit_ratio <= enter_ratio <= 1")
+        actions = GESTURE_ACTIONS if actions is None else actions
+        hold_time = GESTURE_CONFIG['gesture_hold_time'] if hold_time is None else hold_time
+        self.metrics = metrics or default_metrics
+        self.window = window
+        self.enter_votes = max(1, math.ceil(enter_ratio * window))
+        self.exit_votes = max(1, math.ceil(exit_ratio * window))
+
+        # Código 0 = sin gesto o gesto sin acción
+        self.names = [None] + list(actions)
+        self._codes_by_name = {name: code for code, name in enumerate(self.names)}
+        self._hold = [0.0] + [float(actions[g].get('hold_time', hold_time)) for g in actions]
+        self._cooldown = [0.0] + [float(actions[g].get('cooldown', cooldown)) for g in actions]
+        self._min_confidence = [0.0] + [float(actions[g].get('min_confidence', min_confidence)) for g in actions]
+        self.reset()
+
+    def reset(self):
+        """Vaciar la ventana y olvidar candidatos y cooldowns"""
+        window = self.window
+        self._codes = [0] * window
+        self._confidences = [0.0] * window
+        self._times = [0.0] * window
+        self._pos = 0
+        self._counts = [0] * len(self.names)
+        self._counts[0] = window
+        self._confidence_sums = [0.0] * len(self.names)
+        self._last_trigger = [-math.inf] * len(self.names)
+        self.candidate = None
+        self._onset = 0.0
+        self._triggered = False
+        self.triggers = 0
+
+    def _push(self, timestamp, code, confidence):
+        i = self._pos
+        old = self._codes[i]
+        self._counts[old] -= 1
+        self._confidence_sums[old] = (self._confidence_sums[old] - self._confidences[i]
+                                      if self._counts[old] else 0.0)
+        self._codes[i] = code
+        self._confidences[i] = confidence
+        self._times[i] = timestamp
+        self._counts[code] += 1
+        self._confidence_sums[code] += confidence
+        self._pos = (i + 1) % self.window
+
+    def _onset_of(self, code):
+        """Momento del frame más antiguo de la ventana con ese gesto (solo al cambiar de candidato)"""
+        for k in range(self.window):
+            i = (self._pos + k) % self.window
+            if self._codes[i] == code:
+                return self._times[i]
+        return self._times[(self._pos - 1) % self.window]
+
+    def update(self, timestamp, gesture, confidence):
+        """Agregar un frame; retorna (gesto, confianza media, tiempo hasta disparo) o None.
+
+        El tiempo hasta disparo se mide desde el primer frame del gesto en la
+        ventana y es None en las repeticiones tras el cooldown.
+        """
+        code = self._codes_by_name.get(gesture, 0)
+        self._push(timestamp, code, float(confidence) if code else 0.0)
+
+        counts = self._counts
+        candidate = self.candidate
+        if candidate is None or counts[candidate] < self.exit_votes:
+            # Buscar un nuevo candidato entre los gestos con acción
+            best = max(range(1, len(counts)), key=counts.__getitem__, default=0)
+            if best and counts[best] >= self.enter_votes:
+                if best != candidate:
+                    self._onset = self._onset_of(best)
+                    self._triggered = False
+                candidate = best
+            else:
+                candidate = None
+            self.candidate = candidate
+        if candidate is None:
+            return None
+
+        if timestamp - self._onset < self._hold[candidate]:
+            return None
+        confidence_avg = self._confidence_sums[candidate] / counts[candidate]
+        if confidence_avg < self._min_confidence[candidate]:
+            return None
+        if timestamp - self._last_trigger[candidate] < self._cooldown[candidate]:
+            return None
+
+        self._last_trigger[candidate] = timestamp
+        self.triggers += 1
+        self.metrics.increment('gesture_triggers')
+        time_to_trigger = None
+        if not self._triggered:
+            self._triggered = True
+            time_to_trigger = timestamp - self._onset
+            self.metrics.observe('time_to_trigger', time_to_trigger)
+        return self.names[candidate], confidence_avg, time_to_trigger
+
+    @property
+    def candidate_gesture(self):
+        return self.names[self.candidate] if self.candidate else None
+
+
+def evaluate_session(timestamps, labels, confidences, engine, confirm=0.5):
+    """Pasar una sesión grabada por el motor y medir latencia y disparos falsos.
+
+    Un disparo es falso si en los `confirm` segundos siguientes menos de la mitad
+    de los frames tienen ese gesto: la mano no estaba realmente en esa pose.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    labels = np.asarray(labels, dtype=object)
+    triggers = []
+    for t, gesture, confidence in zip(timestamps, labels, confidences):
+        decision = engine.update(float(t), gesture, confidence)
+        if decision:
+            triggers.append((float(t),) + decision)
+
+    false_triggers = 0
+    per_gesture = {}
+    for t, gesture, _, _ in triggers:
+        start, end = np.searchsorted(timestamps, [t, t + confirm], side='right')
+        following = labels[start:end]
+        if len(following) and np.count_nonzero(following == gesture) * 2 < len(following):
+            false_triggers += 1
+        per_gesture[gesture] = per_gesture.get(gesture, 0) + 1
+
+    latencies = np.array([ttt for _, _, _, ttt in triggers if ttt is not None], dtype=np.float64)
+    return {
+        'triggers': len(triggers),
+        'false_triggers': false_triggers,
+        'false_rate': false_triggers / len(triggers) if triggers else 0.0,
+        'ttt_median': float(np.median(latencies)) if len(latencies) else 0.0,
+        'ttt_p95': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        'per_gesture': per_gesture,
+        'events': triggers
+    }
@@ -2,14 +2,245 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import time
-from config import GESTURE_CONFIG, GESTURE_ACTIONS
+from config import GESTURE_CONFIG, GESTURE_ACTIONS, ROI_CONFIG, DEBUG_LOG_CONFIG, CLASSIFIER_CONFIG
+from debug_log import create_debug_log
+from gesture_rules import compile_rules, validate_rules, log_rule_issues
+from landmark_classifier import load_classifier
+from metrics import metrics as default_metrics
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Landmarks de la punta y la base de cada dedo (pulgar, índice, medio, anular, meñique)
+FINGER_TIPS = np.array([4, 8, 12, 16, 20], dtype=np.intp)
+FINGER_BASES = np.array([2, 5, 9, 13, 17], dtype=np.intp)
+# Eje comparado en cada dedo: X para el pulgar, Y para el resto
+FINGER_AXES = np.array([0, 1, 1, 1, 1], dtype=np.intp)
+
+# Índices planos sobre el buffer (21*3) para extraer todas las coordenadas de una vez
+_TIP_INDEX = FINGER_TIPS * 3 + FINGER_AXES
+_BASE_INDEX = FINGER_BASES * 3 + FINGER_AXES
+
+# Un dedo está extendido si izquierda < derecha + holgura, tomando ambos lados del buffer.
+# Regla estricta (_classify_gesture): pulgar punta.x > base.x, resto punta.y < base.y;
+# para el pulgar se intercambian punta y base
+STRICT_INDEX = np.array([np.r_[_BASE_INDEX[:1], _TIP_INDEX[1:]],
+                         np.r_[_TIP_INDEX[:1], _BASE_INDEX[1:]]], dtype=np.intp)
+STRICT_SLACK = np.zeros(5, dtype=np.float32)
+# Regla de depuración (process_frame): punta < base + 0.02 en todos los dedos
+DEBUG_INDEX = np.array([_TIP_INDEX, _BASE_INDEX], dtype=np.intp)
+DEBUG_SLACK = np.full(5, 0.02, dtype=np.float32)
+
+# Reglas de GESTURE_ACTIONS compiladas a una tabla indexada por la máscara de dedos
+GESTURE_RULES = compile_rules(GESTURE_ACTIONS)
+log_rule_issues(validate_rules(GESTURE_ACTIONS, GESTURE_RULES))
+
+def identify_gesture(fingers_extended):
+    """Identificar el gesto específico basado en los dedos extendidos (pulgar, índice, medio, anular, meñique)"""
+    try:
+        return GESTURE_RULES.lookup(fingers_extended)
+    except Exception as e:
+        logger.error(f"Error en identify_gesture: {e}")
+        return None, 0.0
+
+_overlay_styles = None
+
+def landmark_list(landmarks):
+    """Arreglo 21x3 (p. ej. de un proceso de inferencia) como NormalizedLandmarkList para dibujarlo"""
+    from mediapipe.framework.formats import landmark_pb2
+    return landmark_pb2.NormalizedLandmarkList(
+        landmark=[landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z)) for x, y, z in landmarks]
+    )
+
+class FrameOverlay:
+    """Landmarks, dedos y gesto de un frame, para dibujarlos solo cuando se necesiten"""
+    
+    __slots__ = ('hand_landmarks', 'fingers', 'gesture', 'confidence')
+    
+    def __init__(self, hand_landmarks=None, fingers=None, gesture=None, confidence=0.0):
+        self.hand_landmarks = hand_landmarks
+        self.fingers = fingers if fingers is not None else [False] * 5
+        self.gesture = gesture
+        self.confidence = confidence
+    
+    def draw(self, frame):
+        """Dibujar landmarks y textos sobre el frame (en el lugar)"""
+        global _overlay_styles
+        hand_landmarks = self.hand_landmarks
+        if isinstance(hand_landmarks, np.ndarray):
+            hand_landmarks = landmark_list(hand_landmarks)
+        if hand_landmarks is not None:
+            if _overlay_styles is None:
+                styles = mp.solutions.drawing_styles
+                _overlay_styles = (styles.get_default_hand_landmarks_style(),
+                                   styles.get_default_hand_connections_style())
+            mp.solutions.drawing_utils.draw_landmarks(
+                frame,
+                hand_landmarks,
+                mp.solutions.hands.HAND_CONNECTIONS,
+                *_overlay_styles
+            )
+        
+        # Mostrar vector de dedos y confianza en pantalla
+        info_text = f"Dedos: {self.fingers} | Confianza: {self.confidence:.2f}"
+        cv2.putText(frame, info_text, (10, frame.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        
+        # Mostrar el gesto detectado y la confianza en el overlay del video
+        gesture_text = f"Gesto: {self.gesture if self.gesture else 'Ninguno'} | Confianza: {self.confidence:.2f}"
+        cv2.putText(frame, gesture_text, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+class HandROITracker:
+    """Región de interés cuadrada alrededor de la última mano detectada.
+    
+    Mientras la mano se sigue encontrando, MediaPipe procesa solo el recorte
+    (opcionalmente escalado a input_size) y los landmarks se devuelven a
+    coordenadas del frame completo. Si el recorte no contiene la mano se vuelve
+    a buscar en el frame completo.
+    
+    El score de MediaPipe es la confianza de izquierda/derecha, no de que la
+    mano siga bien detectada, así que cada detección en el recorte se valida
+    por geometría: la caja de los landmarks no debe tocar un borde del recorte
+    que no sea borde del frame (mano cortada o que se está yendo) ni ocupar
+    menos de min_fill de su lado (detección espuria). Además, cada
+    refresh_frames frames se busca en el frame completo aunque la ROI siga
+    encontrando algo, para no quedar fijos en una región vieja.
+    """
+    
+    def __init__(self, padding=0.35, input_size=0, min_score=0.8, min_size=96,
+                 min_fill=0.2, edge_margin=0.02, refresh_frames=30):
+        self.padding = padding
+        self.input_size = input_size
+        self.min_score = min_score
+        self.min_size = min_size
+        self.min_fill = min_fill
+        self.edge_margin = edge_margin
+        self.refresh_frames = refresh_frames
+        self.box = None  # (x0, y0, lado) en píxeles del frame completo
+        self._searching = False
+        self._lost_frames = 0
+        self._since_full = 0
+        # Contadores para roi_stats()
+        self.roi_frames = 0
+        self.roi_hits = 0
+        self.full_frames = 0
+        self.lost = 0
+        self.rejected = 0
+        self.refreshes = 0
+        self.reacquired = 0
+        self.reacquire_frames = 0
+        self.roi_time = 0.0
+        self.full_time = 0.0
+    
+    def crop(self, frame):
+        """Recorte del frame para la ROI actual (una vista, escalada si corresponde)"""
+        x0, y0, side = self.box
+        region = frame[y0:y0 + side, x0:x0 + side]
+        if self.input_size and side > self.input_size:
+            region = cv2.resize(region, (self.input_size, self.input_size), interpolation=cv2.INTER_AREA)
+        return region
+    
+    def refresh_due(self):
+        """Toca verificar la ROI con una búsqueda en el frame completo"""
+        return bool(self.refresh_frames) and self._since_full >= self.refresh_frames
+    
+    def plausible(self, hand_landmarks, frame_shape):
+        """La mano detectada en el recorte (coordenadas del recorte) está completa y tiene tamaño de mano"""
+        height, width = frame_shape[:2]
+        x0, y0, side = self.box
+        xs = [lm.x for lm in hand_landmarks.landmark]
+        ys = [lm.y for lm in hand_landmarks.landmark]
+        x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+        if max(x_max - x_min, y_max - y_min) < self.min_fill:
+            return False
+        # Solo cuentan los bordes del recorte que están dentro del frame
+        margin = self.edge_margin
+        return not ((x0 > 0 and x_min < margin) or (x0 + side < width and x_max > 1.0 - margin) or
+                    (y0 > 0 and y_min < margin) or (y0 + side < height and y_max > 1.0 - margin))
+    
+    def to_frame_coordinates(self, hand_landmarks, frame_shape):
+        """Convertir en el lugar los landmarks normalizados del recorte al frame completo"""
+        height, width = frame_shape[:2]
+        x0, y0, side = self.box
+        sx, sy = side / width, side / height
+        ox, oy = x0 / width, y0 / height
+        for lm in hand_landmarks.landmark:
+            lm.x = ox + lm.x * sx
+            lm.y = oy + lm.y * sy
+            lm.z = lm.z * sx
+    
+    def update(self, landmarks, frame_shape):
+        """Centrar la ROI en los landmarks (21x3 normalizados al frame completo)"""
+        height, width = frame_shape[:2]
+        xs = landmarks[:, 0] * width
+        ys = landmarks[:, 1] * height
+        x_min, x_max = float(xs.min()), float(xs.max())
+        y_min, y_max = float(ys.min()), float(ys.max())
+        side = max(x_max - x_min, y_max - y_min) * (1.0 + 2.0 * self.padding)
+        side = int(min(max(side, self.min_size), width, height))
+        x0 = int(min(max((x_min + x_max - side) / 2, 0), width - side))
+        y0 = int(min(max((y_min + y_max - side) / 2, 0), height - side))
+        self.box = (x0, y0, side)
+    
+    def record_roi(self, elapsed, found, rejected=False):
+        self.roi_frames += 1
+        self.roi_time += elapsed
+        self._since_full += 1
+        if found:
+            self.roi_hits += 1
+        else:
+            # Mano perdida (o descartada por geometría) en el recorte: buscar de nuevo en el frame completo
+            self.box = None
+            self.lost += 1
+            if rejected:
+                self.rejected += 1
+            self._searching = True
+            self._lost_frames = 0
+    
+    def record_full(self, elapsed, found, refresh=False):
+        self.full_frames += 1
+        self.full_time += elapsed
+        self._since_full = 0
+        if refresh:
+            self.refreshes += 1
+            if not found:
+                # La ROI seguía encontrando algo que el frame completo no confirma
+                self.box = None
+        if self._searching:
+            self._lost_frames += 1
+            if found:
+                self.reacquired += 1
+                self.reacquire_frames += self._lost_frames
+                self._searching = False
+    
+    def reset(self):
+        self.box = None
+        self._searching = False
+        self._since_full = 0
+    
+    def stats(self):
+        """Tiempo de inferencia ahorrado por frame y tasa de re-adquisición"""
+        avg_full = self.full_time / self.full_frames if self.full_frames else 0.0
+        avg_roi = self.roi_time / self.roi_frames if self.roi_frames else 0.0
+        return {
+            'tracking': self.box is not None,
+            'roi_frames': self.roi_frames,
+            'full_frames': self.full_frames,
+            'roi_hit_rate': round(self.roi_hits / self.roi_frames, 4) if self.roi_frames else 0.0,
+            'avg_full_ms': round(avg_full * 1000, 3),
+            'avg_roi_ms': round(avg_roi * 1000, 3),
+            'saved_ms_per_roi_frame': round((avg_full - avg_roi) * 1000, 3) if self.roi_frames and self.full_frames else 0.0,
+            'lost': self.lost,
+            'rejected': self.rejected,
+            'refreshes': self.refreshes,
+            'reacquired': self.reacquired,
+            'reacquire_rate': round(self.reacquired / self.lost, 4) if self.lost else 0.0,
+            'avg_reacquire_frames': round(self.reacquire_frames / self.reacquired, 2) if self.reacquired else 0.0
+        }
+
 class GestureDetector:
-    def __init__(self):
+    def __init__(self, metrics=None, roi_tracking=None, debug_log=None):
+        self.metrics = metrics or default_metrics
         self.mp_hands = mp.solutions.hands
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
@@ -21,11 +252,68 @@ class GestureDetector:
             min_tracking_confidence=GESTURE_CONFIG['min_tracking_confidence']
         )
         
-        self.current_gesture = None
-        self.gesture_start_time = None
-        self.last_action_time = 0
-        self.action_cooldown = 2.0  # segundos entre acciones
-        self.gesture_hold_time = 1.0  # Exigir 1 segundo de estabilidad
+        # Buffers reutilizables: el camino de clasificación no reserva memoria por frame
+        self._landmarks = np.zeros((21, 3), dtype=np.float32)
+        self._landmarks_flat = self._landmarks.reshape(-1)
+        # Vista de bajo nivel del mismo buffer: asignar floats de Python sin crear arreglos ni listas
+        self._landmarks_view = memoryview(self._landmarks_flat)
+        self._pairs = np.empty((2, 5), dtype=np.float32)
+        self._left, self._right = self._pairs
+        self._fingers = np.zeros(5, dtype=bool)
+        
+        # Landmarks y mano (izquierda/derecha) del último frame procesado, para grabación
+        self.last_landmarks = None
+        self.last_handedness = None
+        # Overlay pendiente del último frame procesado
+        self.last_overlay = None
+        
+        # Clasificador: None = reglas; un modelo de landmark_classifier.py con engine 'learned'
+        self.engine = 'rules'
+        self.classifier = None
+        if CLASSIFIER_CONFIG['engine'] != 'rules':
+            try:
+                self.set_engine(CLASSIFIER_CONFIG['engine'])
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"No se pudo cargar el clasificador '{CLASSIFIER_CONFIG['engine']}', se usan las reglas: {e}")
+        
+        # Registro de decisiones en segundo plano (None = según DEBUG_LOG_CONFIG)
+        self.debug_log = debug_log if debug_log is not None else create_debug_log(DEBUG_LOG_CONFIG)
+        
+        # Seguimiento por ROI (None = según ROI_CONFIG)
+        if roi_tracking is None:
+            roi_tracking = ROI_CONFIG['enabled']
+        self.roi_tracker = HandROITracker(
+            padding=ROI_CONFIG['padding'],
+            input_size=ROI_CONFIG['input_size'],
+            min_score=ROI_CONFIG['min_score'],
+            min_size=ROI_CONFIG['min_size'],
+            min_fill=ROI_CONFIG['min_fill'],
+            refresh_frames=ROI_CONFIG['refresh_frames']
+        ) if roi_tracking else None
+        
+    def _fill_landmarks(self, hand_landmarks):
+        """Copiar los landmarks de MediaPipe (o un arreglo 21x3) al buffer preasignado (21x3 float32)"""
+        if isinstance(hand_landmarks, np.ndarray):
+            self._landmarks[:] = hand_landmarks
+        else:
+            view = self._landmarks_view
+            i = 0
+            for lm in hand_landmarks.landmark:
+                view[i] = lm.x
+                view[i + 1] = lm.y
+                view[i + 2] = lm.z
+                i += 3
+        return self._landmarks
+    
+    def _finger_states(self, landmarks, index, slack):
+        """Calcular los cinco dedos extendidos con una sola comparación vectorizada.
+        
+        El resultado es un buffer compartido que se sobrescribe en el siguiente frame.
+        """
+        np.take(np.asarray(landmarks).reshape(-1), index, out=self._pairs)
+        np.add(self._right, slack, out=self._right)
+        np.less(self._left, self._right, out=self._fingers)
+        return self._fingers
         
     def detect_gesture(self, hand_landmarks):
         """Detectar el gesto basado en los landmarks de la mano"""
@@ -33,11 +321,7 @@ class GestureDetector:
             return None, 0.0
             
         try:
-            landmarks = []
-            for lm in hand_landmarks.landmark:
-                landmarks.append([lm.x, lm.y, lm.z])
-            
-            landmarks = np.array(landmarks)
+            landmarks = self._fill_landmarks(hand_landmarks)
             
             # Detectar gestos específicos
             gesture, confidence = self._classify_gesture(landmarks)
@@ -50,32 +334,8 @@ class GestureDetector:
     def _classify_gesture(self, landmarks):
         """Clasificar el gesto basado en la posición de los dedos"""
         try:
-            # Obtener puntos clave de los dedos
-            thumb_tip = landmarks[4]
-            index_tip = landmarks[8]
-            middle_tip = landmarks[12]
-            ring_tip = landmarks[16]
-            pinky_tip = landmarks[20]
-            
-            # Puntos de referencia (base de los dedos)
-            thumb_base = landmarks[2]
-            index_base = landmarks[5]
-            middle_base = landmarks[9]
-            ring_base = landmarks[13]
-            pinky_base = landmarks[17]
-            
-            # Calcular si los dedos están extendidos
-            fingers_extended = []
-            
-            # Pulgar (comparar con el eje X)
-            thumb_extended = thumb_tip[0] > thumb_base[0]
-            fingers_extended.append(thumb_extended)
-            
-            # Otros dedos (comparar con el eje Y)
-            for tip, base in [(index_tip, index_base), (middle_tip, middle_base), 
-                              (ring_tip, ring_base), (pinky_tip, pinky_base)]:
-                finger_extended = tip[1] < base[1]
-                fingers_extended.append(finger_extended)
+            # Pulgar en el eje X y resto de dedos en el eje Y
+            fingers_extended = self._finger_states(landmarks, STRICT_INDEX, STRICT_SLACK)
             
             # Clasificar gestos
             gesture, confidence = self._identify_gesture(fingers_extended, landmarks)
@@ -86,144 +346,183 @@ class GestureDetector:
             return None, 0.0
     
     def _identify_gesture(self, fingers_extended, landmarks):
-        """Identificar el gesto específico basado en los dedos extendidos"""
-        try:
-            # Contar dedos extendidos
-            extended_count = sum(fingers_extended)
-            
-            # Mano abierta: todos los dedos extendidos
-            if extended_count == 5:
-                return 'mano_abierta', 0.95
-            
-            # Puño cerrado: ningún dedo extendido
-            elif extended_count == 0:
-                return 'puño_cerrado', 0.90
-            
-            # Pulgar arriba: solo pulgar extendido (índice 0)
-            elif fingers_extended[0] and not any(fingers_extended[1:]):
-                return 'pulgar_arriba', 0.85
-            
-            # Dos dedos: índice y medio extendidos
-            elif fingers_extended[1] and fingers_extended[2] and not fingers_extended[3] and not fingers_extended[4]:
-                return 'dos_dedos', 0.88
-            
-            # Rock & roll: índice y meñique extendidos
-            elif fingers_extended[1] and fingers_extended[4] and not fingers_extended[2] and not fingers_extended[3]:
-                return 'rock_roll', 0.82
-            
-            # Casos adicionales para mejor reconocimiento
-            # Pulgar arriba con variaciones menores
-            elif fingers_extended[0] and sum(fingers_extended[1:]) <= 1:
-                return 'pulgar_arriba', 0.80
-            
-            # Mano semi-abierta (3-4 dedos)
-            elif extended_count >= 3:
-                return 'mano_abierta', 0.85
-            
-            # Gesto no reconocido
-            else:
-                return None, 0.0
-        except Exception as e:
-            logger.error(f"Error en _identify_gesture: {e}")
-            return None, 0.0
+        """Identificar el gesto: por los dedos extendidos o, con un modelo cargado, por los landmarks"""
+        classifier = self.classifier
+        if classifier is not None:
+            return classifier.classify(landmarks)
+        return identify_gesture(fingers_extended)
+    
+    def set_engine(self, engine, model_path=None):
+        """Cambiar el clasificador en caliente: 'rules' o 'learned' (modelo de CLASSIFIER_CONFIG o model_path)"""
+        if engine == 'rules':
+            classifier = None
+        elif engine == 'learned':
+            classifier = load_classifier(model_path or CLASSIFIER_CONFIG['model_path'],
+                                         CLASSIFIER_CONFIG['budget_us'])
+        else:
+            raise ValueError(f"Clasificador no soportado: {engine}")
+        # Un solo cambio de referencia: el frame en curso termina con el anterior
+        self.classifier = classifier
+        self.engine = engine
+        logger.info(f"Clasificador de gestos: {engine}")
+    
+    def classifier_info(self):
+        info = {'engine': self.engine}
+        if self.classifier is not None:
+            info.update(self.classifier.info())
+        return info
     
-    def process_frame(self, frame):
-        """Procesar un frame de la cámara y detectar gestos"""
+    def process_frame(self, frame, draw=True):
+        """Procesar un frame de la cámara y detectar gestos
+        
+        Con draw=False el frame no se modifica: el overlay queda en last_overlay
+        para dibujarlo después (ver MJPEGBroadcastHub).
+        """
         try:
             # Verificar que el frame sea válido
             if frame is None or frame.size == 0:
                 logger.warning("Frame inválido recibido")
                 return frame, None, 0.0
             
-            # Convertir BGR a RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Procesar con MediaPipe
-            results = self.hands.process(rgb_frame)
+            metrics = self.metrics
+            metrics.increment('frames_processed')
             
-            gesture = None
-            confidence = 0.0
-            fingers_extended = [False]*5
+            results = self._run_hands(frame)
             
+            hand = None
             if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    try:
-                        gesture, confidence, fingers_extended = self.detect_gesture_debug(hand_landmarks)
-                        
-                        # Dibujar landmarks
-                        self.mp_drawing.draw_landmarks(
-                            frame,
-                            hand_landmarks,
-                            self.mp_hands.HAND_CONNECTIONS,
-                            self.mp_drawing_styles.get_default_hand_landmarks_style(),
-                            self.mp_drawing_styles.get_default_hand_connections_style()
-                        )
-                        
-                        # Mostrar vector de dedos y confianza en pantalla
-                        info_text = f"Dedos: {fingers_extended} | Confianza: {confidence:.2f}"
-                        cv2.putText(frame, info_text, (10, frame.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                        
-                        # Mostrar el gesto detectado y la confianza en el overlay del video
-                        gesture_text = f"Gesto: {gesture if gesture else 'Ninguno'} | Confianza: {confidence:.2f}"
-                        cv2.putText(frame, gesture_text, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                        
-                        # Log en archivo para depuración (solo si hay gesto detectado)
-                        if gesture:
-                            with open('debug_gestos.txt', 'a') as f:
-                                f.write(f"{time.strftime('%H:%M:%S')} - Dedos: {fingers_extended} | Confianza: {confidence:.2f} | Gesto: {gesture}\n")
-                        
-                        break  # Solo procesar la primera mano
-                        
-                    except Exception as e:
-                        logger.error(f"Error procesando landmarks: {e}")
-                        continue
-            else:
-                # Si no hay mano detectada, mostrar info
-                info_text = f"Dedos: {fingers_extended} | Confianza: {confidence:.2f}"
-                cv2.putText(frame, info_text, (10, frame.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                gesture_text = f"Gesto: Ninguno | Confianza: 0.00"
-                cv2.putText(frame, gesture_text, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+                # Solo procesar la primera mano
+                handedness, score = None, 1.0
+                if results.multi_handedness:
+                    classification = results.multi_handedness[0].classification[0]
+                    handedness, score = classification.label, classification.score
+                hand = (results.multi_hand_landmarks[0], handedness, score)
             
-            return frame, gesture, confidence
+            return self._finish_frame(frame, hand, draw)
             
         except Exception as e:
             logger.error(f"Error en process_frame: {e}")
+            self.metrics.increment('errors')
             # Retornar el frame original sin procesar en caso de error
             return frame, None, 0.0
     
+    def process_landmarks(self, frame, landmarks, handedness=None, score=1.0, draw=True):
+        """Como process_frame, con landmarks (21x3) ya calculados fuera de este proceso"""
+        self.metrics.increment('frames_processed')
+        try:
+            hand = (landmarks, handedness, score) if landmarks is not None else None
+            return self._finish_frame(frame, hand, draw)
+        except Exception as e:
+            logger.error(f"Error en process_landmarks: {e}")
+            self.metrics.increment('errors')
+            return frame, None, 0.0
+    
+    def _finish_frame(self, frame, hand, draw):
+        """Clasificar la mano (landmarks, lado, score) o None, y preparar el overlay"""
+        metrics = self.metrics
+        gesture = None
+        confidence = 0.0
+        overlay = FrameOverlay()
+        self.last_landmarks = None
+        self.last_handedness = None
+        
+        if hand is not None:
+            hand_landmarks, handedness, score = hand
+            try:
+                t0 = time.perf_counter()
+                gesture, confidence, fingers_extended = self.detect_gesture_debug(hand_landmarks)
+                t1 = time.perf_counter()
+                metrics.observe('classify', t1 - t0)
+                metrics.increment('hands_detected')
+                self.last_landmarks = self._landmarks
+                self.last_handedness = handedness
+                # Seguir la mano con un recorte tras una detección confiable (score es la
+                # confianza de izquierda/derecha; la ROI se valida por geometría en _run_hands)
+                tracker = self.roi_tracker
+                if tracker and (tracker.box is not None or score >= tracker.min_score):
+                    tracker.update(self._landmarks, frame.shape)
+                
+                if isinstance(hand_landmarks, np.ndarray):
+                    # El buffer del detector se reutiliza: el overlay guarda su propia copia
+                    hand_landmarks = self._landmarks.copy()
+                overlay = FrameOverlay(hand_landmarks, [bool(f) for f in fingers_extended],
+                                       gesture, confidence)
+                
+                # Registro de depuración (solo si hay gesto): se encola, sin E/S aquí
+                if gesture and self.debug_log:
+                    self.debug_log.log(time.time(), overlay.fingers, confidence, gesture,
+                                       self.last_handedness)
+                
+            except Exception as e:
+                logger.error(f"Error procesando landmarks: {e}")
+                metrics.increment('errors')
+        
+        # El overlay se dibuja aquí o más tarde, solo si alguien mira el video
+        self.last_overlay = overlay
+        if draw:
+            t0 = time.perf_counter()
+            overlay.draw(frame)
+            metrics.observe('overlay', time.perf_counter() - t0)
+        
+        return frame, gesture, confidence
+    
+    def _hands_process(self, image, stage):
+        """Convertir a RGB y procesar con MediaPipe midiendo cada paso"""
+        metrics = self.metrics
+        t0 = time.perf_counter()
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        t1 = time.perf_counter()
+        metrics.observe('color_convert', t1 - t0)
+        results = self.hands.process(rgb_image)
+        elapsed = time.perf_counter() - t1
+        metrics.observe('hands_process', elapsed)
+        metrics.observe(stage, elapsed)
+        return results, elapsed
+    
+    def _run_hands(self, frame):
+        """Detectar la mano en la ROI si hay una activa; si no, en el frame completo.
+        
+        Los landmarks del resultado quedan siempre en coordenadas del frame completo.
+        """
+        tracker = self.roi_tracker
+        if tracker is None:
+            return self._hands_process(frame, 'hands_process_full')[0]
+        
+        refresh = tracker.box is not None and tracker.refresh_due()
+        if tracker.box is not None and not refresh:
+            results, elapsed = self._hands_process(tracker.crop(frame), 'hands_process_roi')
+            self.metrics.increment('roi_frames')
+            found = bool(results.multi_hand_landmarks)
+            rejected = found and not tracker.plausible(results.multi_hand_landmarks[0], frame.shape)
+            if rejected:
+                found = False
+                self.metrics.increment('roi_rejected')
+            if found:
+                tracker.to_frame_coordinates(results.multi_hand_landmarks[0], frame.shape)
+            tracker.record_roi(elapsed, found, rejected)
+            if found:
+                return results
+            self.metrics.increment('roi_lost')
+        elif refresh:
+            self.metrics.increment('roi_refreshes')
+        
+        results, elapsed = self._hands_process(frame, 'hands_process_full')
+        reacquired = tracker.reacquired
+        tracker.record_full(elapsed, bool(results.multi_hand_landmarks), refresh)
+        if tracker.reacquired > reacquired:
+            self.metrics.increment('roi_reacquired')
+        return results
+    
+    def roi_stats(self):
+        """Estadísticas del seguimiento por ROI (None si está desactivado)"""
+        return self.roi_tracker.stats() if self.roi_tracker else None
+    
     def detect_gesture_debug(self, hand_landmarks):
         try:
-            landmarks = []
-            for lm in hand_landmarks.landmark:
-                landmarks.append([lm.x, lm.y, lm.z])
-            landmarks = np.array(landmarks)
+            landmarks = self._fill_landmarks(hand_landmarks)
             
-            # Obtener puntos clave de los dedos
-            thumb_tip = landmarks[4]
-            index_tip = landmarks[8]
-            middle_tip = landmarks[12]
-            ring_tip = landmarks[16]
-            pinky_tip = landmarks[20]
-            
-            # Puntos de referencia (base de los dedos)
-            thumb_base = landmarks[2]
-            index_base = landmarks[5]
-            middle_base = landmarks[9]
-            ring_base = landmarks[13]
-            pinky_base = landmarks[17]
-            
-            # Calcular si los dedos están extendidos
-            fingers_extended = []
-            
-            # Pulgar (comparar con el eje X) - ajustado para mejor detección
-            thumb_extended = thumb_tip[0] < thumb_base[0] + 0.02
-            fingers_extended.append(thumb_extended)
-            
-            # Otros dedos (comparar con el eje Y) - ajustado para mejor detección
-            for tip, base in [(index_tip, index_base), (middle_tip, middle_base), 
-                              (ring_tip, ring_base), (pinky_tip, pinky_base)]:
-                finger_extended = tip[1] < base[1] + 0.02
-                fingers_extended.append(finger_extended)
+            # Pulgar (eje X) y resto de dedos (eje Y) con holgura de 0.02
+            fingers_extended = self._finger_states(landmarks, DEBUG_INDEX, DEBUG_SLACK)
             
             # Clasificar gestos usando la lógica correcta
             gesture, confidence = self._identify_gesture(fingers_extended, landmarks)
@@ -234,27 +533,6 @@ class GestureDetector:
             logger.error(f"Error en detect_gesture_debug: {e}")
             return None, 0.0, [False]*5
     
-    def should_execute_action(self, gesture, confidence):
-        """Determinar si se debe ejecutar una acción basado en el gesto"""
-        current_time = time.time()
-        
-        # Verificar si el gesto ha cambiado
-        if gesture != self.current_gesture:
-            self.current_gesture = gesture
-            self.gesture_start_time = current_time
-            return False
-        
-        # Verificar si el gesto se ha mantenido por el tiempo requerido
-        if (self.gesture_start_time and 
-            current_time - self.gesture_start_time >= self.gesture_hold_time):
-            
-            # Verificar cooldown entre acciones
-            if current_time - self.last_action_time >= self.action_cooldown:
-                self.last_action_time = current_time
-                return True
-        
-        return False
-    
     def get_gesture_info(self, gesture):
         """Obtener información sobre un gesto específico"""
         if gesture in GESTURE_ACTIONS:
@@ -264,6 +542,8 @@ class GestureDetector:
     def release(self):
         """Liberar recursos"""
         try:
+            if self.debug_log:
+                self.debug_log.close()
             if self.hands:
                 self.hands.close()
         except Exception as e:
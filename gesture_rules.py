@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Reglas de gestos por patrón de dedos, compiladas a una tabla de 32 entradas
+
+Cada gesto de GESTURE_ACTIONS declara en 'patterns' sus patrones de dedos
+(pulgar, índice, medio, anular, meñique): '1' extendido, '0' doblado, 'x'
+cualquiera. 'extended': (mín, máx) limita además cuántos dedos hay
+extendidos. Al cargar, las reglas se evalúan para las 32 máscaras posibles
+y clasificar queda en indexar la tabla con la máscara del frame.
+
+Si varias reglas cubren la misma máscara gana la más específica (más dedos
+fijos); a igual especificidad, la declarada primero.
+"""
+
+import argparse
+import logging
+import numpy as np
+from config import GESTURE_ACTIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FINGER_NAMES = ('pulgar', 'índice', 'medio', 'anular', 'meñique')
+WILDCARDS = 'x*?'
+
+
+def finger_mask(fingers_extended):
+    """Máscara de 5 bits (bit 0 = pulgar) de una lista o arreglo de dedos extendidos"""
+    # tolist() y desplazamientos en Python: más barato que packbits para cinco valores
+    f = fingers_extended.tolist() if isinstance(fingers_extended, np.ndarray) else fingers_extended
+    return int(bool(f[0]) | bool(f[1]) << 1 | bool(f[2]) << 2 | bool(f[3]) << 3 | bool(f[4]) << 4)
+
+
+def fingers_from_mask(mask):
+    """Convertir una máscara de 5 bits (bit 0 = pulgar) en la lista de dedos extendidos"""
+    return [bool(mask >> i & 1) for i in range(5)]
+
+
+def mask_text(mask):
+    """Máscara como patrón de '1'/'0' en el orden de los dedos ('10000' = solo pulgar)"""
+    return ''.join('1' if mask >> i & 1 else '0' for i in range(5))
+
+
+class GestureRule:
+    """Un patrón de dedos de un gesto, con su confianza"""
+
+    __slots__ = ('gesture', 'pattern', 'extended', 'confidence', 'order', 'masks', 'fixed')
+
+    def __init__(self, gesture, pattern, confidence, extended=None, order=0):
+        self.gesture = gesture
+        self.pattern = pattern
+        self.extended = extended
+        self.confidence = confidence
+        self.order = order
+        self.masks = self._matching_masks()
+        self.fixed = sum(c in '01' for c in self.pattern)
+
+    def _matching_masks(self):
+        if len(self.pattern) != 5 or any(c not in '01' + WILDCARDS for c in self.pattern):
+            raise ValueError(f"Patrón inválido en '{self.gesture}': {self.pattern!r} "
+                             f"(5 caracteres '1', '0' o 'x': pulgar a meñique)")
+        care = value = 0
+        for i, c in enumerate(self.pattern):
+            if c in '01':
+                care |= 1 << i
+                value |= (c == '1') << i
+        low, high = self.extended if self.extended is not None else (0, 5)
+        return [mask for mask in range(32)
+                if mask & care == value and low <= bin(mask).count('1') <= high]
+
+    def describe(self):
+        extended = f" con {self.extended[0]}-{self.extended[1]} dedos" if self.extended else ""
+        return f"{self.gesture} '{self.pattern}'{extended} ({self.confidence:.2f})"
+
+
+def parse_rules(gesture_actions=None):
+    """Reglas de GESTURE_ACTIONS en el orden en que se declaran (gestos y sus patrones)"""
+    gesture_actions = GESTURE_ACTIONS if gesture_actions is None else gesture_actions
+    rules = []
+    for gesture, info in gesture_actions.items():
+        for pattern in info.get('patterns', ()):
+            extended = pattern.get('extended')
+            if extended is not None:
+                extended = (int(extended[0]), int(extended[1]))
+            rules.append(GestureRule(gesture, str(pattern['fingers']).lower(),
+                                     float(pattern.get('confidence', info.get('confidence', 0.8))),
+                                     extended, len(rules)))
+    return rules
+
+
+class GestureRuleTable:
+    """Tabla densa máscara -> (gesto, confianza)"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        # Prioridad: más dedos fijos primero, luego el orden de declaración
+        self.priority = sorted(rules, key=lambda rule: (-rule.fixed, rule.order))
+        self.gestures = [None]
+        self.labels = np.empty(32, dtype=object)
+        self.confidences = np.zeros(32, dtype=np.float64)
+        # Índice del gesto (0 = ninguno) y de la regla ganadora (-1 = ninguna) por máscara
+        self.gesture_index = np.zeros(32, dtype=np.uint8)
+        self.rule_index = np.full(32, -1, dtype=np.int16)
+        for rule in self.priority:
+            if rule.gesture not in self.gestures:
+                self.gestures.append(rule.gesture)
+            for mask in rule.masks:
+                if self.rule_index[mask] < 0:
+                    self.rule_index[mask] = rule.order
+                    self.labels[mask] = rule.gesture
+                    self.confidences[mask] = rule.confidence
+                    self.gesture_index[mask] = self.gestures.index(rule.gesture)
+        # Tuplas ya armadas: classify() no crea objetos por frame
+        self._results = [(self.labels[mask], float(self.confidences[mask])) for mask in range(32)]
+
+    def classify(self, mask):
+        """(gesto, confianza) de una máscara de dedos; (None, 0.0) si ninguna regla la cubre"""
+        return self._results[mask]
+
+    def lookup(self, fingers_extended):
+        return self._results[finger_mask(fingers_extended)]
+
+
+def compile_rules(gesture_actions=None):
+    return GestureRuleTable(parse_rules(gesture_actions))
+
+
+def validate_rules(gesture_actions=None, table=None):
+    """Revisar las reglas; retorna una lista de (nivel, texto).
+
+    'warning': una regla inalcanzable (no cubre ninguna combinación, se la
+    quitan reglas más prioritarias o su confianza no llega al min_confidence
+    del gesto), un gesto sin patrones, o dos gestos que se disputan una
+    combinación con la misma especificidad (decide el orden de declaración).
+    'info': superposiciones que resuelve la especificidad, como la mano
+    semi-abierta frente a dos dedos con el pulgar extendido.
+    """
+    gesture_actions = GESTURE_ACTIONS if gesture_actions is None else gesture_actions
+    table = table or compile_rules(gesture_actions)
+    issues = []
+    for gesture, info in gesture_actions.items():
+        if not info.get('patterns'):
+            issues.append(('warning', f"gesto sin patrones: '{gesture}' nunca se detecta"))
+    for rule in table.rules:
+        won = [mask for mask in rule.masks if table.rule_index[mask] == rule.order]
+        if not rule.masks:
+            issues.append(('warning', f"inalcanzable: {rule.describe()} no cubre ninguna combinación de dedos"))
+        elif not won:
+            issues.append(('warning', f"inalcanzable: {rule.describe()} queda tapada por reglas más prioritarias"))
+        min_conf = float(gesture_actions[rule.gesture].get('min_confidence', 0.7))
+        if won and rule.confidence < min_conf:
+            issues.append(('warning', f"inalcanzable: {rule.describe()} está debajo de "
+                                      f"min_confidence {min_conf:.2f}"))
+        lost = {}
+        for mask in rule.masks:
+            winner = table.rules[table.rule_index[mask]]
+            if winner.gesture != rule.gesture:
+                lost.setdefault(winner.order, []).append(mask_text(mask))
+        for order, masks in lost.items():
+            winner = table.rules[order]
+            level = 'warning' if winner.fixed == rule.fixed else 'info'
+            reason = "mismo número de dedos fijos, gana la declarada antes" if level == 'warning' else "más específica"
+            issues.append((level, f"superposición: {rule.describe()} pierde contra {winner.describe()} "
+                                  f"({reason}) en {', '.join(masks)}"))
+    return issues
+
+
+def log_rule_issues(issues):
+    for level, text in issues:
+        if level == 'warning':
+            logger.warning(f"Reglas de gestos: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabla de gestos compilada desde GESTURE_ACTIONS")
+    parser.add_argument('--table', action='store_true', help="Mostrar las 32 combinaciones de dedos")
+    args = parser.parse_args()
+
+    table = compile_rules()
+    if args.table:
+        print("máscara  " + " ".join(name[:3] for name in FINGER_NAMES) + "  gesto (confianza)")
+        for mask in range(32):
+            gesture, confidence = table.classify(mask)
+            print(f"{mask:7d}  {'   '.join(mask_text(mask))}    "
+                  f"{gesture or '-'}{f' ({confidence:.2f})' if gesture else ''}")
+    issues = validate_rules(table=table)
+    covered = int(np.count_nonzero(table.rule_index >= 0))
+    print(f"Reglas: {len(table.rules)} | combinaciones reconocidas: {covered}/32")
+    for level, text in issues:
+        print(f"  [{level}] {text}")
+    return 1 if any(level == 'warning' for level, _ in issues) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Inferencia de MediaPipe en procesos separados
+Los frames viajan por un anillo de memoria compartida y solo vuelven los landmarks
+"""
+
+import argparse
+import logging
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory, resource_tracker
+import cv2
+import numpy as np
+from metrics import metrics as default_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tarea enviada a un proceso: secuencia, slot del anillo, alto y ancho del frame
+TASK = struct.Struct('<qiii')
+
+# Resultado de tamaño fijo (276 bytes); landmarks en coordenadas normalizadas del frame
+RESULT_DTYPE = np.dtype([
+    ('seq', '<i8'),
+    ('slot', '<i4'),
+    ('found', 'u1'),
+    ('handedness', 'u1'),
+    ('reserved', '<u2'),
+    ('score', '<f4'),
+    ('elapsed', '<f4'),
+    ('landmarks', '<f4', (21, 3))
+])
+
+HANDEDNESS_NAMES = {0: None, 1: 'Left', 2: 'Right'}
+HANDEDNESS_CODES = {name: code for code, name in HANDEDNESS_NAMES.items()}
+
+
+class InferenceResult:
+    """Landmarks de un frame enviado al pool, entregados en orden de envío"""
+
+    __slots__ = ('seq', 'tag', 'landmarks', 'handedness', 'score', 'elapsed', 'submitted', 'latency')
+
+    def __init__(self, seq, tag, landmarks=None, handedness=None, score=0.0, elapsed=0.0, submitted=0.0):
+        self.seq = seq
+        self.tag = tag
+        self.landmarks = landmarks
+        self.handedness = handedness
+        self.score = score
+        # Tiempo de MediaPipe en el proceso y desde el envío hasta la entrega en orden
+        self.elapsed = elapsed
+        self.submitted = submitted
+        self.latency = 0.0
+
+
+def _attach(name):
+    """Abrir un bloque existente sin que este proceso lo borre al salir (el dueño es el pool)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: el resource_tracker del proceso lo borraría al terminar
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class _Worker:
+    """Proceso de inferencia y el hilo que lee sus resultados"""
+
+    def __init__(self, pool, index, command):
+        self.index = index
+        self.inflight = 0
+        self.completed = 0
+        self.alive = True
+        self.ready = threading.Event()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        self._thread = threading.Thread(target=self._read_results, args=(pool,),
+                                        name=f'inference-worker-{index}', daemon=True)
+        self._thread.start()
+
+    def send(self, seq, slot, height, width):
+        try:
+            self.process.stdin.write(TASK.pack(seq, slot, height, width))
+            return True
+        except (BrokenPipeError, OSError):
+            self.alive = False
+            return False
+
+    def _read_results(self, pool):
+        size = RESULT_DTYPE.itemsize
+        stdout = self.process.stdout
+        while True:
+            data = stdout.read(size)
+            while data and len(data) < size:
+                chunk = stdout.read(size - len(data))
+                if not chunk:
+                    break
+                data += chunk
+            if len(data) < size:
+                break
+            record = np.frombuffer(data, dtype=RESULT_DTYPE)[0]
+            if record['seq'] < 0:
+                # Aviso de arranque: MediaPipe ya está cargado en el proceso
+                self.ready.set()
+                continue
+            pool._complete(self, record)
+        if self.alive and not pool.closed:
+            logger.error(f"El proceso de inferencia {self.index} terminó (código {self.process.poll()})")
+        self.alive = False
+        pool._release_worker(self)
+
+    def close(self, timeout=2.0):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._thread.join(timeout=timeout)
+
+
+class ProcessInferencePool:
+    """MediaPipe Hands en procesos aparte, fuera del GIL de la aplicación.
+
+    submit() copia el frame a un slot libre de un anillo de memoria compartida
+    con frames de frame_shape preasignados y envía al proceso activo solo
+    (secuencia, slot, tamaño). Todos los frames van al mismo proceso: Hands
+    con static_image_mode=False sigue la mano entre frames consecutivos, y
+    repartir la secuencia entre procesos le rompería el seguimiento (más
+    re-detecciones y landmarks que saltan). Los demás procesos quedan de
+    reserva y toman la secuencia si el activo muere; para más throughput se
+    usa un pool por fuente, no más procesos por pool. El proceso responde con un registro fijo
+    de landmarks; nada se serializa con pickle. get() entrega los resultados en
+    el orden de envío: los que llegan adelantados esperan en un buffer y un
+    resultado que no llega en result_timeout se da por perdido.
+
+    Si no hay slots libres (o ningún proceso terminó de cargar MediaPipe) el
+    frame se descarta, como en las colas del pipeline. Un slot cuyo resultado
+    se dio por perdido no vuelve a usarse hasta que el proceso responda o
+    muera. Sin procesos vivos submit() lanza RuntimeError; alive permite
+    consultarlo antes y seguir sin el pool.
+    """
+
+    def __init__(self, workers=1, slots=None, frame_shape=(480, 640, 3), result_timeout=2.0,
+                 min_detection_confidence=0.7, min_tracking_confidence=0.4, metrics=None):
+        if workers < 1:
+            raise ValueError("El pool necesita al menos un proceso")
+        self.frame_shape = tuple(frame_shape)
+        self.slot_bytes = int(np.prod(self.frame_shape))
+        # Dos slots alcanzan para copiar un frame mientras el proceso activo infiere el anterior
+        self.slots = slots or 2
+        self.result_timeout = result_timeout
+        self.metrics = metrics or default_metrics
+        self.closed = False
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots)
+        self._ring = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8, buffer=self._shm.buf)
+        self._free = deque(range(self.slots))
+        self._cond = threading.Condition()
+        self._pending = {}
+        # Slots de resultados vencidos: el proceso puede seguir leyéndolos hasta responder o morir
+        self._quarantine = {}
+        self._done = {}
+        self._next_seq = 0
+        self._next_result = 0
+        self._active = None
+        self.failovers = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.lost = 0
+
+        command = [sys.executable, os.path.abspath(__file__), '--worker',
+                   '--shm', self._shm.name, '--slots', str(self.slots),
+                   '--shape', 'x'.join(str(v) for v in self.frame_shape),
+                   '--min-detection-confidence', str(min_detection_confidence),
+                   '--min-tracking-confidence', str(min_tracking_confidence)]
+        self._workers = [_Worker(self, i, command) for i in range(workers)]
+        logger.info(f"Pool de inferencia: {workers} procesos, {self.slots} slots de {self.frame_shape}")
+
+    def submit(self, frame, tag=None):
+        """Enviar un frame; retorna su secuencia o None si el anillo está lleno"""
+        with self._cond:
+            if not any(w.alive for w in self._workers):
+                raise RuntimeError("No quedan procesos de inferencia activos")
+            workers = [w for w in self._workers if w.alive and w.ready.is_set()]
+            if not workers or not self._free:
+                self.dropped += 1
+                self.metrics.increment('pool_frames_dropped')
+                return None
+            worker = self._active
+            if worker is None or not worker.alive:
+                if worker is not None:
+                    # El seguimiento de la mano vuelve a empezar en el proceso de reserva
+                    self.failovers += 1
+                    self.metrics.increment('pool_failovers')
+                    logger.warning(f"Proceso de inferencia {worker.index} caído, "
+                                   f"la secuencia sigue en el {workers[0].index}")
+                worker = self._active = workers[0]
+            slot = self._free.popleft()
+            worker.inflight += 1
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending[seq] = (slot, worker, tag, time.perf_counter())
+            self.submitted += 1
+
+        # El slot es de este frame hasta que vuelva su resultado: se copia fuera del lock
+        target = self._ring[slot]
+        height, width = frame.shape[:2]
+        if frame.shape == self.frame_shape:
+            np.copyto(target, frame)
+        elif height <= self.frame_shape[0] and width <= self.frame_shape[1]:
+            target.reshape(-1)[:frame.size].reshape(frame.shape)[...] = frame
+        else:
+            # Frame más grande que el slot: los landmarks son normalizados, se puede reducir
+            height, width = self.frame_shape[:2]
+            cv2.resize(frame, (width, height), dst=target, interpolation=cv2.INTER_AREA)
+        if not worker.send(seq, slot, height, width):
+            logger.error(f"No se pudo enviar el frame {seq} al proceso {worker.index}")
+        return seq
+
+    def wait_ready(self, timeout=30.0):
+        """Esperar a que todos los procesos hayan cargado MediaPipe"""
+        deadline = time.perf_counter() + timeout
+        for worker in self._workers:
+            if not worker.ready.wait(max(0.0, deadline - time.perf_counter())):
+                return False
+        return True
+
+    def _complete(self, worker, record):
+        """Llamado desde el hilo lector de cada proceso"""
+        seq = int(record['seq'])
+        landmarks = record['landmarks'].copy() if record['found'] else None
+        with self._cond:
+            entry = self._pending.pop(seq, None)
+            if entry is None:
+                # Llegó después de darlo por perdido: recién ahora el proceso soltó el slot
+                late = self._quarantine.pop(seq, None)
+                if late is not None:
+                    slot, owner = late
+                    self._free.append(slot)
+                    owner.inflight -= 1
+                    self._cond.notify_all()
+                return
+            slot, owner, tag, submitted = entry
+            self._free.append(slot)
+            owner.inflight -= 1
+            owner.completed += 1
+            self.completed += 1
+            self._done[seq] = InferenceResult(
+                seq, tag, landmarks, HANDEDNESS_NAMES.get(int(record['handedness'])),
+                float(record['score']), float(record['elapsed']), submitted
+            )
+            self._cond.notify_all()
+        self.metrics.observe('hands_process_pool', float(record['elapsed']))
+
+    def get(self, timeout=None):
+        """Siguiente resultado en orden de envío, o None si no hay uno antes de timeout"""
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                seq = self._next_result
+                result = self._done.pop(seq, None)
+                if result is not None:
+                    self._next_result += 1
+                    result.latency = time.perf_counter() - result.submitted
+                    self.metrics.observe('pool_latency', result.latency)
+                    return result
+                entry = self._pending.get(seq)
+                now = time.perf_counter()
+                if entry is not None and now - entry[3] > self.result_timeout:
+                    # El proceso no respondió: seguir con el siguiente. El slot queda en
+                    # cuarentena hasta su respuesta tardía o su muerte; si se reusara, el
+                    # proceso lento podría leer el frame nuevo a medio copiar
+                    slot, worker, _, _ = self._pending.pop(seq)
+                    if worker.alive:
+                        self._quarantine[seq] = (slot, worker)
+                    else:
+                        self._free.append(slot)
+                        worker.inflight -= 1
+                    self._next_result += 1
+                    self.lost += 1
+                    self.metrics.increment('pool_results_lost')
+                    continue
+                remaining = deadline - now if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                wait = self.result_timeout if remaining is None else min(remaining, self.result_timeout)
+                self._cond.wait(wait)
+
+    def _release_worker(self, worker):
+        """Llamado al morir un proceso: ya no lee sus slots en cuarentena"""
+        with self._cond:
+            for seq, (slot, owner) in list(self._quarantine.items()):
+                if owner is worker:
+                    del self._quarantine[seq]
+                    self._free.append(slot)
+                    worker.inflight -= 1
+            self._cond.notify_all()
+
+    @property
+    def alive(self):
+        """True mientras quede al menos un proceso de inferencia"""
+        return any(w.alive for w in self._workers)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': len(self._workers),
+                'alive': sum(1 for w in self._workers if w.alive),
+                'slots': self.slots,
+                'free_slots': len(self._free),
+                'quarantined_slots': len(self._quarantine),
+                'in_flight': len(self._pending),
+                'reorder_buffer': len(self._done),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'dropped': self.dropped,
+                'lost': self.lost,
+                'active_worker': self._active.index if self._active else None,
+                'failovers': self.failovers,
+                'per_worker': [w.completed for w in self._workers]
+            }
+
+    def close(self):
+        """Terminar los procesos y liberar la memoria compartida"""
+        if self.closed:
+            return
+        self.closed = True
+        for worker in self._workers:
+            worker.close()
+        del self._ring
+        self._shm.close()
+        self._shm.unlink()
+
+
+def run_worker(shm_name, slots, frame_shape, min_detection_confidence, min_tracking_confidence):
+    """Bucle de un proceso: leer tareas de stdin y escribir resultados fijos en stdout"""
+    # stdout queda solo para resultados; cualquier salida de MediaPipe va a stderr
+    results_out = os.fdopen(os.dup(1), 'wb', buffering=0)
+    os.dup2(2, 1)
+    tasks_in = sys.stdin.buffer
+
+    import mediapipe as mp
+    hands = mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=1,
+        min_detection_confidence=min_detection_confidence,
+        min_tracking_confidence=min_tracking_confidence
+    )
+    shm = _attach(shm_name)
+    ring = np.ndarray((slots,) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+    slot_size = int(np.prod(frame_shape))
+    result = np.zeros(1, dtype=RESULT_DTYPE)
+    record = result[0]
+    record['seq'] = -1
+    results_out.write(result.tobytes())
+    rgb = None
+    frame = None
+    try:
+        while True:
+            data = tasks_in.read(TASK.size)
+            if len(data) < TASK.size:
+                break
+            seq, slot, height, width = TASK.unpack(data)
+            if height * width * 3 > slot_size:
+                continue
+            frame = ring[slot].reshape(-1)[:height * width * 3].reshape(height, width, 3)
+
+            start = time.perf_counter()
+            if rgb is None or rgb.shape != frame.shape:
+                rgb = np.empty_like(frame)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+            results = hands.process(rgb)
+
+            record['seq'] = seq
+            record['slot'] = slot
+            record['found'] = 0
+            record['handedness'] = 0
+            record['score'] = 0.0
+            if results.multi_hand_landmarks:
+                record['found'] = 1
+                record['landmarks'] = [(lm.x, lm.y, lm.z) for lm in results.multi_hand_landmarks[0].landmark]
+                if results.multi_handedness:
+                    classification = results.multi_handedness[0].classification[0]
+                    record['handedness'] = HANDEDNESS_CODES.get(classification.label, 0)
+                    record['score'] = classification.score
+            record['elapsed'] = time.perf_counter() - start
+            results_out.write(result.tobytes())
+    finally:
+        del frame, ring
+        hands.close()
+        shm.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proceso de inferencia del pool (uso interno)")
+    parser.add_argument('--worker', action='store_true', required=True)
+    parser.add_argument('--shm', required=True)
+    parser.add_argument('--slots', type=int, required=True)
+    parser.add_argument('--shape', required=True, help="Alto x ancho x canales de cada slot")
+    parser.add_argument('--min-detection-confidence', type=float, default=0.7)
+    parser.add_argument('--min-tracking-confidence', type=float, default=0.4)
+    args = parser.parse_args()
+    return run_worker(args.shm, args.slots, tuple(int(v) for v in args.shape.split('x')),
+                      args.min_detection_confidence, args.min_tracking_confidence)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
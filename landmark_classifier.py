@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Clasificador de gestos aprendido sobre landmarks (alternativa a las reglas)
+Entrena un kNN o una capa softmax con NumPy a partir de sesiones grabadas
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+from config import GESTURE_ACTIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Landmarks que fijan el marco de la mano: muñeca y base del dedo medio
+WRIST = 0
+MIDDLE_MCP = 9
+FEATURE_SIZE = 20 * 3
+# Etiqueta de "sin gesto" dentro del modelo (None hacia afuera)
+NO_GESTURE = ''
+
+
+def landmark_features(landmarks):
+    """Características de N manos (Nx21x3 o 21x3) -> Nx60 float32.
+
+    Coordenadas relativas a la muñeca, rotadas en el plano XY para que el eje
+    muñeca -> base del dedo medio apunte hacia arriba y divididas por su
+    largo: no dependen de dónde está la mano, de su tamaño ni de su giro.
+    Incluye z, que las reglas no usan.
+    """
+    points = np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+    relative = points[:, 1:, :] - points[:, WRIST:WRIST + 1, :]
+    axis = relative[:, MIDDLE_MCP - 1, :2]
+    length = np.maximum(np.hypot(axis[:, 0], axis[:, 1]), 1e-6)
+    # Rotación que lleva el eje a (0, -largo): cos = -ay / L, sen = -ax / L
+    cos = (-axis[:, 1] / length)[:, None]
+    sin = (-axis[:, 0] / length)[:, None]
+    x, y, z = relative[..., 0], relative[..., 1], relative[..., 2]
+    features = np.empty((points.shape[0], 20, 3), dtype=np.float32)
+    features[..., 0] = cos * x - sin * y
+    features[..., 1] = sin * x + cos * y
+    features[..., 2] = z
+    features /= length[:, None, None]
+    return features.reshape(-1, FEATURE_SIZE)
+
+
+class LearnedClassifier:
+    """Base de los modelos: clases, inferencia vectorizada y guardado.
+
+    Los modelos no se modifican después de entrenarse ni guardan buffers por
+    llamada, así que varias cámaras pueden compartir el mismo objeto.
+    """
+
+    kind = None
+
+    def __init__(self, classes):
+        self.classes = [str(name) for name in classes]
+        self._labels = np.array([name or None for name in self.classes], dtype=object)
+
+    def predict_features(self, features):
+        """(índices de clase, confianzas) para un arreglo NxF de características"""
+        raise NotImplementedError
+
+    def classify_batch(self, landmarks, chunk=4096):
+        """(etiquetas, confianzas) de N manos, con None donde no hay gesto.
+
+        Se procesa por bloques de chunk manos: la matriz de distancias del kNN
+        no crece con la sesión entera.
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+        index = np.zeros(len(landmarks), dtype=np.intp)
+        confidence = np.zeros(len(landmarks), dtype=np.float64)
+        for start in range(0, len(landmarks), chunk):
+            block = slice(start, start + chunk)
+            index[block], confidence[block] = self.predict_features(landmark_features(landmarks[block]))
+        labels = self._labels[index]
+        return labels, np.where(labels == None, 0.0, confidence)  # noqa: E711
+
+    def classify(self, landmarks):
+        """(gesto, confianza) de una mano 21x3, como identify_gesture"""
+        index, confidence = self.predict_features(landmark_features(landmarks))
+        gesture = self._labels[index[0]]
+        return (gesture, float(confidence[0])) if gesture is not None else (None, 0.0)
+
+    def time_per_frame(self, repeat=200):
+        """Microsegundos por frame (mediana) de classify() sobre una mano cualquiera"""
+        hand = np.random.default_rng(0).random((21, 3), dtype=np.float32)
+        self.classify(hand)
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.classify(hand)
+            samples.append(time.perf_counter() - start)
+        return float(np.median(samples)) * 1e6
+
+    def fit_budget(self, budget_us):
+        """Ajustar el modelo para no superar budget_us por frame; retorna el costo medido"""
+        cost = self.time_per_frame()
+        if budget_us and cost > budget_us:
+            logger.warning(f"Clasificador {self.kind}: {cost:.0f} us por frame supera el presupuesto de {budget_us:.0f} us")
+        return cost
+
+    def _arrays(self):
+        return {}
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, kind=self.kind, classes=np.array(self.classes), **self._arrays())
+        logger.info(f"Modelo guardado: {path}")
+
+    def info(self):
+        return {'kind': self.kind, 'classes': [name or None for name in self.classes]}
+
+
+class KNNClassifier(LearnedClassifier):
+    """k vecinos más cercanos sobre un conjunto acotado de prototipos.
+
+    El índice se precalcula al cargar: prototipos transpuestos y contiguos y
+    sus normas al cuadrado, así la distancia a todos ellos es un producto de
+    matrices. Como el costo crece con los prototipos, fit_budget() los reduce
+    por clase hasta entrar en el presupuesto por frame.
+    """
+
+    kind = 'knn'
+
+    def __init__(self, classes, prototypes, labels, k=5):
+        super().__init__(classes)
+        self.k = int(k)
+        self._set_prototypes(np.asarray(prototypes, dtype=np.float32), np.asarray(labels, dtype=np.int16))
+
+    def _set_prototypes(self, prototypes, labels):
+        self.prototypes = prototypes
+        self.labels = labels
+        self._transposed = np.ascontiguousarray(prototypes.T)
+        self._norms = np.einsum('ij,ij->i', prototypes, prototypes)
+        self.k = min(self.k, len(labels))
+
+    @classmethod
+    def train(cls, features, labels, classes, k=5, max_prototypes=2000, seed=0):
+        model = cls(classes, features, labels, k)
+        model.limit(max_prototypes, seed)
+        return model
+
+    def limit(self, max_prototypes, seed=0):
+        """Quedarse con a lo sumo max_prototypes, repartidos por igual entre las clases"""
+        if not max_prototypes or len(self.labels) <= max_prototypes:
+            return
+        rng = np.random.default_rng(seed)
+        present = np.unique(self.labels)
+        per_class = max(self.k, max_prototypes // len(present))
+        keep = []
+        for label in present:
+            rows = np.flatnonzero(self.labels == label)
+            keep.append(rng.choice(rows, size=min(per_class, len(rows)), replace=False))
+        keep = np.sort(np.concatenate(keep))
+        self._set_prototypes(self.prototypes[keep], self.labels[keep])
+
+    def predict_features(self, features):
+        # |x - p|^2 = |x|^2 - 2 x.p + |p|^2; |x|^2 no cambia el orden de los vecinos
+        distances = self._norms - 2.0 * (features @ self._transposed)
+        nearest = np.argpartition(distances, self.k - 1, axis=1)[:, :self.k]
+        # Votos por clase con un solo bincount sobre (fila, clase)
+        count, classes = features.shape[0], len(self.classes)
+        cells = (np.arange(count)[:, None] * classes + self.labels[nearest]).reshape(-1)
+        votes = np.bincount(cells, minlength=count * classes).reshape(count, classes)
+        index = votes.argmax(axis=1)
+        return index, votes[np.arange(count), index] / self.k
+
+    def fit_budget(self, budget_us):
+        cost = self.time_per_frame()
+        while budget_us and cost > budget_us and len(self.labels) > self.k * len(self.classes):
+            self.limit(len(self.labels) // 2)
+            cost = self.time_per_frame()
+        return super().fit_budget(budget_us)
+
+    def _arrays(self):
+        return {'prototypes': self.prototypes, 'labels': self.labels, 'k': self.k}
+
+    def info(self):
+        info = super().info()
+        info.update({'k': self.k, 'prototypes': len(self.labels)})
+        return info
+
+
+class SoftmaxClassifier(LearnedClassifier):
+    """Capa lineal con softmax: un producto de matrices por frame, costo fijo.
+
+    La estandarización de las características se pliega en los pesos al
+    entrenar, así que la inferencia no la repite.
+    """
+
+    kind = 'softmax'
+
+    def __init__(self, classes, weights, bias):
+        super().__init__(classes)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+
+    @classmethod
+    def train(cls, features, labels, classes, epochs=300, learning_rate=0.5, l2=1e-4):
+        """Descenso de gradiente por lotes completos sobre la entropía cruzada"""
+        mean = features.mean(axis=0)
+        std = features.std(axis=0) + 1e-6
+        x = (features - mean) / std
+        onehot = np.eye(len(classes), dtype=np.float32)[labels]
+        weights = np.zeros((x.shape[1], len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        for _ in range(epochs):
+            probs = _softmax(x @ weights + bias)
+            error = (probs - onehot) / len(x)
+            weights -= learning_rate * (x.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return cls(classes, weights / std[:, None], bias - (mean / std) @ weights)
+
+    def predict_features(self, features):
+        probs = _softmax(features @ self.weights + self.bias)
+        index = probs.argmax(axis=1)
+        return index, probs[np.arange(len(index)), index]
+
+    def _arrays(self):
+        return {'weights': self.weights, 'bias': self.bias}
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+MODEL_TYPES = {'knn': KNNClassifier, 'softmax': SoftmaxClassifier}
+
+# Modelos ya cargados por ruta: las cámaras comparten el mismo
+_loaded = {}
+
+
+def load_classifier(path, budget_us=None):
+    """Cargar un modelo guardado con save(); se reutiliza mientras el archivo no cambie"""
+    key = (os.path.abspath(path), os.path.getmtime(path), budget_us)
+    model = _loaded.get(key)
+    if model is not None:
+        return model
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data['kind'])
+        classes = [str(name) for name in data['classes']]
+        if kind == 'knn':
+            model = KNNClassifier(classes, data['prototypes'], data['labels'], int(data['k']))
+        elif kind == 'softmax':
+            model = SoftmaxClassifier(classes, data['weights'], data['bias'])
+        else:
+            raise ValueError(f"Tipo de modelo no soportado: {kind}")
+    cost = model.fit_budget(budget_us)
+    logger.info(f"Clasificador {kind} cargado desde {path}: {cost:.0f} us por frame")
+    _loaded[key] = model
+    return model
+
+
+def train_classifier(landmarks, labels, kind='knn', **params):
+    """Entrenar un modelo con manos Nx21x3 y etiquetas (nombres de gesto o None)"""
+    names = [NO_GESTURE if label is None else str(label) for label in labels]
+    classes = [NO_GESTURE] + [name for name in GESTURE_ACTIONS if name in set(names)]
+    unknown = sorted(set(names) - set(classes))
+    if unknown:
+        raise ValueError(f"Gestos que no están en GESTURE_ACTIONS: {unknown}")
+    codes = np.array([classes.index(name) for name in names], dtype=np.int16)
+    if kind not in MODEL_TYPES:
+        raise ValueError(f"Tipo de modelo no soportado: {kind}")
+    return MODEL_TYPES[kind].train(landmark_features(landmarks), codes, classes, **params)
+
+
+def load_labelled_sessions(specs):
+    """Manos y etiquetas de sesiones grabadas.
+
+    Cada spec es 'ruta' (se usan los gestos grabados) o 'ruta:gesto' para
+    etiquetar todas las manos de la sesión con ese gesto ('ruta:ninguno' =
+    sin gesto), por ejemplo una sesión grabada manteniendo una sola pose.
+    """
+    from session_recording import SessionReplay
+
+    all_landmarks, all_labels = [], []
+    for spec in specs:
+        path, label = spec, False
+        if ':' in spec:
+            head, tail = spec.rsplit(':', 1)
+            if tail in GESTURE_ACTIONS or tail == 'ninguno':
+                path, label = head, (None if tail == 'ninguno' else tail)
+        session = SessionReplay(path)
+        has_hand = session.has_hand
+        all_landmarks.append(np.asarray(session.landmarks[has_hand]))
+        if label is False:
+            all_labels.extend(session.gesture_labels()[has_hand])
+        else:
+            all_labels.extend([label] * int(has_hand.sum()))
+    if not all_landmarks:
+        return np.zeros((0, 21, 3), dtype=np.float32), np.zeros(0, dtype=object)
+    return np.concatenate(all_landmarks), np.array(all_labels, dtype=object)
+
+
+def accuracy(predicted, expected):
+    return float(np.mean(predicted == expected)) if len(expected) else 0.0
+
+
+def main():
+    """Entrenar y evaluar modelos desde sesiones grabadas"""
+    from gesture_batch import classify_batch
+
+    parser = argparse.ArgumentParser(description="Clasificador de gestos aprendido")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help="Entrenar un modelo con sesiones grabadas")
+    train_parser.add_argument('sessions', nargs='+', help="ruta.gsr o ruta.gsr:gesto")
+    train_parser.add_argument('--kind', choices=list(MODEL_TYPES), default='knn')
+    train_parser.add_argument('--out', default='models/gestos.npz')
+    train_parser.add_argument('--k', type=int, default=5)
+    train_parser.add_argument('--max-prototypes', type=int, default=2000)
+    train_parser.add_argument('--holdout', type=float, default=0.2, help="Fracción reservada para evaluar")
+    train_parser.add_argument('--seed', type=int, default=0)
+
+    eval_parser = subparsers.add_parser('evaluate', help="Exactitud de un modelo contra las reglas")
+    eval_parser.add_argument('model')
+    eval_parser.add_argument('sessions', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        landmarks, labels = load_labelled_sessions(args.sessions)
+        if len(labels) == 0:
+            print("Las sesiones no tienen manos")
+            return 1
+        order = np.random.default_rng(args.seed).permutation(len(labels))
+        split = int(len(labels) * (1 - args.holdout))
+        train_rows, test_rows = order[:split], order[split:]
+        params = {'k': args.k, 'max_prototypes': args.max_prototypes, 'seed': args.seed} if args.kind == 'knn' else {}
+        model = train_classifier(landmarks[train_rows], labels[train_rows], args.kind, **params)
+        print(f"Manos: {len(labels)} (entrenamiento {len(train_rows)}, evaluación {len(test_rows)}) | {model.info()}")
+        if len(test_rows):
+            predicted, _ = model.classify_batch(landmarks[test_rows])
+            rules, _, _ = classify_batch(landmarks[test_rows])
+            print(f"Exactitud: modelo {accuracy(predicted, labels[test_rows]):.1%} | "
+                  f"reglas {accuracy(rules, labels[test_rows]):.1%}")
+        model.save(args.out)
+        return 0
+
+    model = load_classifier(args.model)
+    landmarks, labels = load_labelled_sessions(args.sessions)
+    predicted, _ = model.classify_batch(landmarks)
+    rules, _, _ = classify_batch(landmarks)
+    print(f"Manos: {len(labels)} | {model.info()} | {model.time_per_frame():.1f} us por frame")
+    print(f"Exactitud: modelo {accuracy(predicted, labels):.1%} | reglas {accuracy(rules, labels):.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
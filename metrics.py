@@ -0,0 +1,172 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Límites de los buckets en segundos: de 50 us a 5 s (escala 1-1.5-2-3-5-7)
+DEFAULT_BUCKETS = tuple(
+    round(m * 10.0 ** e, 6)
+    for e in range(-5, 1)
+    for m in (1, 1.5, 2, 3, 5, 7)
+    if 0.00005 <= m * 10.0 ** e <= 5.0
+)
+
+
+class Histogram:
+    """Histograma de latencias con buckets fijos (sin listas que crezcan)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Un bucket extra para valores mayores al último límite (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimar un cuantil interpolando linealmente dentro del bucket"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= target:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Temporizadores por etapa, contadores y gauges del sistema"""
+
+    def __init__(self, prefix='gestos'):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        """Registrar la duración de una etapa (medida con time.perf_counter)"""
+        self._histogram(stage).observe(seconds)
+
+    def timer(self, stage):
+        """Context manager para medir bloques fuera del camino crítico"""
+        return _Timer(self, stage)
+
+    def increment(self, name, amount=1):
+        # Leer y escribir el contador no es atómico entre hilos
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def summary(self):
+        """Resumen JSON: conteo, promedio y p50/p95/p99 en milisegundos por etapa"""
+        stages = {}
+        for stage, histogram in list(self.histograms.items()):
+            count = histogram.count
+            stages[stage] = {
+                'count': count,
+                'avg_ms': round(histogram.sum / count * 1000, 3) if count else 0.0,
+                'p50_ms': round(histogram.quantile(0.50) * 1000, 3),
+                'p95_ms': round(histogram.quantile(0.95) * 1000, 3),
+                'p99_ms': round(histogram.quantile(0.99) * 1000, 3)
+            }
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'stages': stages,
+            'counters': counters,
+            'gauges': dict(self.gauges)
+        }
+
+    def prometheus_text(self, extra_gauges=None):
+        """Exportar en formato de texto de Prometheus"""
+        return render_prometheus([({}, self, extra_gauges)], self.prefix)
+
+
+class _Timer:
+    __slots__ = ('registry', 'stage', 'start')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.stage, time.perf_counter() - self.start)
+
+
+def _label_text(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}' if items else ''
+
+
+def render_prometheus(entries, prefix='gestos'):
+    """Texto de Prometheus para varios registros, cada uno con sus etiquetas.
+
+    entries: lista de (etiquetas, registro, gauges extra). Cada familia de
+    métricas se declara una sola vez y sus series se distinguen por etiquetas
+    (por ejemplo source="0" para cada cámara).
+    """
+    lines = []
+    name = f'{prefix}_stage_duration_seconds'
+    lines.append(f'# HELP {name} Duración de cada etapa del procesamiento de frames')
+    lines.append(f'# TYPE {name} histogram')
+    for labels, registry, _ in entries:
+        for stage, histogram in sorted(registry.histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_label_text(labels, stage=stage, le=bound)} {cumulative}')
+            lines.append(f'{name}_bucket{_label_text(labels, stage=stage, le="+Inf")} {histogram.count}')
+            lines.append(f'{name}_sum{_label_text(labels, stage=stage)} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{_label_text(labels, stage=stage)} {histogram.count}')
+
+    counters = {}
+    gauges = {}
+    for labels, registry, extra_gauges in entries:
+        with registry._lock:
+            snapshot = list(registry.counters.items())
+        for counter, value in snapshot:
+            counters.setdefault(counter, []).append((labels, value))
+        merged = dict(registry.gauges)
+        merged.update(extra_gauges or {})
+        for gauge, value in merged.items():
+            gauges.setdefault(gauge, []).append((labels, value))
+
+    for counter, series in sorted(counters.items()):
+        metric = f'{prefix}_{counter}_total'
+        lines.append(f'# TYPE {metric} counter')
+        for labels, value in series:
+            lines.append(f'{metric}{_label_text(labels)} {value}')
+
+    for gauge, series in sorted(gauges.items()):
+        metric = f'{prefix}_{gauge}'
+        lines.append(f'# TYPE {metric} gauge')
+        for labels, value in series:
+            lines.append(f'{metric}{_label_text(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# Registro global del proceso
+metrics = MetricsRegistry()
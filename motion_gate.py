@@ -0,0 +1,134 @@
+import threading
+import time
+import cv2
+import numpy as np
+from metrics import metrics as default_metrics
+
+
+class MotionGate:
+    """Filtro barato antes de MediaPipe: diferencia entre frames reducidos en gris.
+
+    Mientras hay movimiento o una mano vista hace menos de active_hold segundos
+    se procesan todos los frames. Con la escena quieta y vacía solo se procesa
+    a idle_fps, y al primer frame con movimiento se vuelve a la tasa completa.
+    check() y report_hand() pueden llamarse desde hilos distintos (con el pool
+    de procesos la mano se informa desde el hilo de resultados).
+    """
+
+    def __init__(self, width=64, pixel_delta=12, motion_fraction=0.01, idle_fps=2.0, active_hold=3.0,
+                 metrics=None):
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self.motion_fraction = motion_fraction
+        self.idle_interval = 1.0 / idle_fps if idle_fps > 0 else float('inf')
+        self.active_hold = active_hold
+        self.metrics = metrics or default_metrics
+        self._lock = threading.Lock()
+        self._reference = None
+        self._diff = None
+        self._mask = None
+        self._last_active = 0.0
+        self._last_inference = 0.0
+        self.active = True
+        self.motion_score = 0.0
+        self.frames_skipped = 0
+        self.frames_idle = 0
+        self.wakeups = 0
+
+    def _small_gray(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _motion(self, frame):
+        """Fracción de píxeles que cambiaron respecto al frame anterior"""
+        gray = self._small_gray(frame)
+        if self._reference is None or self._reference.shape != gray.shape:
+            self._reference = gray
+            self._diff = np.empty_like(gray)
+            self._mask = np.empty(gray.shape, dtype=bool)
+            return 1.0
+        cv2.absdiff(gray, self._reference, dst=self._diff)
+        np.greater(self._diff, self.pixel_delta, out=self._mask)
+        self._reference = gray
+        return float(np.count_nonzero(self._mask)) / self._mask.size
+
+    def check(self, frame, now=None):
+        """Decidir si el frame pasa a inferencia.
+
+        Retorna 'active' (tasa completa), 'wake' (primer frame con movimiento
+        tras el reposo), 'idle' (muestra periódica en reposo) o None (omitir).
+        """
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        with self._lock:
+            self.motion_score = self._motion(frame)
+            self.metrics.observe('motion_gate', time.perf_counter() - start)
+
+            if self.motion_score >= self.motion_fraction:
+                self._last_active = max(self._last_active, now)
+            was_active = self.active
+            self.active = now - self._last_active < self.active_hold
+            self.metrics.set_gauge('inference_active', int(self.active))
+
+            if self.active:
+                decision = 'active' if was_active else 'wake'
+                if decision == 'wake':
+                    self.wakeups += 1
+                    self.metrics.increment('motion_wakeups')
+            elif now - self._last_inference >= self.idle_interval:
+                decision = 'idle'
+                self.frames_idle += 1
+                self.metrics.increment('frames_idle_inference')
+            else:
+                self.frames_skipped += 1
+                self.metrics.increment('frames_skipped_static')
+                return None
+            self._last_inference = now
+            return decision
+
+    def report_hand(self, hand_present, now=None):
+        """Una mano visible mantiene la tasa completa aunque la escena esté quieta"""
+        if hand_present:
+            now = time.time() if now is None else now
+            with self._lock:
+                # Con el pool el resultado llega tarde: no retroceder una marca más nueva de check()
+                self._last_active = max(self._last_active, now)
+                self.active = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self.active,
+                'motion_score': round(self.motion_score, 4),
+                'frames_skipped': self.frames_skipped,
+                'frames_idle': self.frames_idle,
+                'wakeups': self.wakeups
+            }
+
+
+class CpuUsage:
+    """Porcentaje de CPU de un reloj (process_time o thread_time) como gauge"""
+
+    def __init__(self, name, clock=time.process_time, interval=1.0, metrics=None):
+        self.name = name
+        self.clock = clock
+        self.interval = interval
+        self.metrics = metrics or default_metrics
+        self._cpu = clock()
+        self._wall = time.perf_counter()
+        self.percent = 0.0
+
+    def update(self):
+        """Recalcular como máximo una vez por intervalo; es barato llamarlo por frame"""
+        wall = time.perf_counter()
+        elapsed = wall - self._wall
+        if elapsed < self.interval:
+            return self.percent
+        cpu = self.clock()
+        self.percent = round((cpu - self._cpu) / elapsed * 100, 1)
+        self._cpu = cpu
+        self._wall = wall
+        self.metrics.set_gauge(self.name, self.percent)
+        return self.percent
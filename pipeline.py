@@ -0,0 +1,208 @@
+import threading
+import time
+import logging
+from collections import deque
+from metrics import metrics as default_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DropOldestQueue:
+    """Cola acotada que descarta el elemento más antiguo en lugar de bloquear"""
+
+    def __init__(self, name, maxsize=1, metrics=None):
+        if maxsize < 1:
+            raise ValueError("maxsize debe ser al menos 1")
+        self.name = name
+        self.maxsize = maxsize
+        # Los descartes también van al registro como contador (queue_<nombre>_dropped)
+        self.metrics = metrics
+        self._dropped_counter = f'queue_{name}_dropped'
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Encolar sin bloquear; si está llena se descarta el más antiguo"""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                if self.metrics:
+                    self.metrics.increment(self._dropped_counter)
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Obtener el siguiente elemento; retorna None si expira o se cierra"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        """Despertar a los consumidores en espera"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        """Profundidad actual y contadores de la cola"""
+        with self._cond:
+            return {
+                'name': self.name,
+                'depth': len(self._items),
+                'maxsize': self.maxsize,
+                'put': self.put_count,
+                'dropped': self.dropped
+            }
+
+
+class PipelineStage:
+    """Etapa del pipeline: consume de una cola, procesa y publica en la siguiente"""
+
+    def __init__(self, name, handler, input_queue, output_queue=None, metrics=None):
+        self.name = name
+        self.metrics = metrics or default_metrics
+        self.handler = handler
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.processed = 0
+        self.errors = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while self._running:
+            item = self.input_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            try:
+                result = self.handler(item)
+                self.processed += 1
+                if result is not None and self.output_queue is not None:
+                    self.output_queue.put(result)
+            except Exception as e:
+                self.errors += 1
+                self.metrics.increment('errors')
+                logger.error(f"Error en etapa '{self.name}': {e}")
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'processed': self.processed,
+            'errors': self.errors,
+            'alive': self.is_alive()
+        }
+
+
+class GesturePipeline:
+    """Pipeline captura -> inferencia -> publicación con colas acotadas.
+
+    La captura corre en el hilo que llama a run_capture() y nunca espera a las
+    etapas siguientes: si la inferencia va atrasada se descarta el frame más
+    antiguo, de modo que siempre se procesa el más reciente.
+    """
+
+    def __init__(self, read_frame, infer, publish, frame_queue_size=1, event_queue_size=4,
+                 max_consecutive_errors=5, metrics=None):
+        self.read_frame = read_frame
+        self.metrics = metrics or default_metrics
+        self.frame_queue = DropOldestQueue('frames', frame_queue_size, self.metrics)
+        self.event_queue = DropOldestQueue('events', event_queue_size, self.metrics)
+        self.inference_stage = PipelineStage('inference', infer, self.frame_queue, self.event_queue,
+                                             metrics=self.metrics)
+        self.publish_stage = PipelineStage('publish', publish, self.event_queue, metrics=self.metrics)
+        self.max_consecutive_errors = max_consecutive_errors
+        self.captured = 0
+        self.capture_errors = 0
+        self._running = False
+
+    def start(self):
+        """Arrancar las etapas de inferencia y publicación"""
+        self._running = True
+        self.inference_stage.start()
+        self.publish_stage.start()
+
+    def stop(self):
+        """Detener todas las etapas y despertar a los consumidores"""
+        self._running = False
+        self.inference_stage.stop()
+        self.publish_stage.stop()
+        self.frame_queue.close()
+        self.event_queue.close()
+
+    def join(self, timeout=None):
+        self.inference_stage.join(timeout)
+        self.publish_stage.join(timeout)
+
+    def run_capture(self, should_run):
+        """Bucle de captura a la velocidad del sensor; retorna al detenerse o fallar"""
+        consecutive_errors = 0
+        metrics = self.metrics
+        while self._running and should_run():
+            start = time.perf_counter()
+            try:
+                ret, frame = self.read_frame()
+            except Exception as e:
+                logger.error(f"Error al leer frame: {e}")
+                ret, frame = False, None
+            metrics.observe('capture', time.perf_counter() - start)
+
+            if not ret or frame is None:
+                consecutive_errors += 1
+                self.capture_errors += 1
+                metrics.increment('errors')
+                if consecutive_errors > self.max_consecutive_errors:
+                    logger.error(f'Demasiados errores consecutivos ({consecutive_errors}). Deteniendo cámara...')
+                    break
+                logger.warning(f'Error al leer frame (intento {consecutive_errors}/{self.max_consecutive_errors})')
+                time.sleep(0.1)
+                continue
+
+            consecutive_errors = 0
+            self.captured += 1
+            metrics.increment('frames_captured')
+            self.frame_queue.put((self.captured, time.time(), frame))
+
+    def queue_gauges(self):
+        """Profundidad de cada cola como gauge para /api/metrics (los descartes son contadores)"""
+        gauges = {}
+        for queue in (self.frame_queue, self.event_queue):
+            gauges[f"queue_{queue.name}_depth"] = queue.qsize()
+        return gauges
+
+    def stats(self):
+        """Profundidad de colas, descartes y contadores por etapa"""
+        return {
+            'running': self._running,
+            'captured': self.captured,
+            'capture_errors': self.capture_errors,
+            'queues': [self.frame_queue.stats(), self.event_queue.stats()],
+            'stages': [self.inference_stage.stats(), self.publish_stage.stats()]
+        }
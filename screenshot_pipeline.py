@@ -0,0 +1,206 @@
+import io
+import os
+import itertools
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import SCREENSHOT_CONFIG
+from metrics import metrics as default_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# formato -> (nombre para PIL, mimetype, extensión, modos que acepta sin convertir)
+FORMATS = {
+    'png': ('PNG', 'image/png', '.png', None),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg', ('RGB', 'L')),
+    'webp': ('WEBP', 'image/webp', '.webp', ('RGB', 'RGBA')),
+}
+
+
+def encode_params(config):
+    """Parámetros de Image.save según el formato: nivel de compresión en PNG, calidad en JPEG/WebP"""
+    fmt = config['format']
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de captura no soportado: {fmt}")
+    if fmt == 'png':
+        return {'compress_level': int(config['png_compress_level'])}
+    return {'quality': int(config['quality'])}
+
+
+class Capture:
+    """Captura ya codificada; data son los bytes del archivo"""
+
+    __slots__ = ('seq', 'name', 'path', 'mimetype', 'data', 'captured_at', 'grab_time', 'encode_time')
+
+    def __init__(self, seq, name, path, mimetype, data, captured_at, grab_time, encode_time):
+        self.seq = seq
+        self.name = name
+        self.path = path
+        self.mimetype = mimetype
+        self.data = data
+        self.captured_at = captured_at
+        self.grab_time = grab_time
+        self.encode_time = encode_time
+
+    def info(self):
+        return {
+            'seq': self.seq,
+            'name': self.name,
+            'path': self.path,
+            'mimetype': self.mimetype,
+            'bytes': len(self.data),
+            'captured_at': self.captured_at,
+            'grab_ms': round(self.grab_time * 1000, 2),
+            'encode_ms': round(self.encode_time * 1000, 2)
+        }
+
+
+class ScreenshotPipeline:
+    """Capturas de pantalla con la codificación fuera del hilo que las pide.
+
+    capture() solo toma la imagen (grab) y le asigna un nombre; la codificación
+    y la escritura a disco van a un pool de hilos (Pillow libera el GIL al
+    comprimir). Los nombres llevan fecha con milisegundos y un contador del
+    proceso, así que dos capturas en el mismo segundo no se pisan y ordenan en
+    el orden en que se tomaron; el archivo se abre en modo exclusivo por si
+    otro proceso escribe en el mismo directorio. Con ring_size > 0 las últimas
+    capturas quedan en memoria para servirlas sin leer el disco.
+    """
+
+    def __init__(self, grab, config=None, metrics=None):
+        self.grab = grab
+        self.config = dict(SCREENSHOT_CONFIG if config is None else config)
+        self.metrics = metrics or default_metrics
+        fmt = self.config['format']
+        self.params = encode_params(self.config)
+        self.pil_format, self.mimetype, self.extension, self.modes = FORMATS[fmt]
+        self.directory = self.config['directory'] if self.config.get('save', True) else None
+        if self.directory:
+            # El directorio se crea una vez, no en cada captura
+            os.makedirs(self.directory, exist_ok=True)
+        self.max_pending = int(self.config.get('max_pending', 4))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(self.config.get('workers', 1))),
+                                            thread_name_prefix='screenshot')
+        self._counter = itertools.count(1)
+        self._ring = deque(maxlen=int(self.config.get('ring_size', 0))) if self.config.get('ring_size') else None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.pending = 0
+        self.captured = 0
+        self.encoded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.bytes_written = 0
+
+    def next_name(self, now=None):
+        """Nombre único y creciente: captura_AAAAMMDD_HHMMSS_mmm_NNNNNN.ext"""
+        now = time.time() if now is None else now
+        seq = next(self._counter)
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(now))
+        return seq, f"captura_{stamp}_{int(now * 1000) % 1000:03d}_{seq:06d}{self.extension}"
+
+    def capture(self):
+        """Tomar la pantalla y encolar su codificación; retorna el nombre asignado.
+
+        Si ya hay max_pending capturas codificándose se descarta la nueva
+        (retorna None): la pantalla tomada ya no sería la actual.
+        """
+        with self._lock:
+            if self._closed or self.pending >= self.max_pending:
+                self.rejected += 1
+                self.metrics.increment('screenshots_rejected')
+                logger.warning("Capturas pendientes de codificar: se descarta la nueva")
+                return None
+            self.pending += 1
+        try:
+            captured_at = time.time()
+            t0 = time.perf_counter()
+            image = self.grab()
+            grab_time = time.perf_counter() - t0
+            seq, name = self.next_name(captured_at)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        self.captured += 1
+        self.metrics.observe('screenshot_grab', grab_time)
+        self._executor.submit(self._encode, image, seq, name, captured_at, grab_time)
+        return name
+
+    def _encode(self, image, seq, name, captured_at, grab_time):
+        try:
+            t0 = time.perf_counter()
+            if self.modes and getattr(image, 'mode', None) not in self.modes:
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, format=self.pil_format, **self.params)
+            data = buffer.getvalue()
+            path = None
+            if self.directory:
+                path = os.path.join(self.directory, name)
+                with open(path, 'xb') as f:
+                    f.write(data)
+            encode_time = time.perf_counter() - t0
+            capture = Capture(seq, name, path, self.mimetype, data, captured_at, grab_time, encode_time)
+            with self._lock:
+                if self._ring is not None:
+                    self._ring.append(capture)
+                self.encoded += 1
+                self.bytes_written += len(data)
+            self.metrics.observe('screenshot_encode', encode_time)
+            logger.info(f"Captura de pantalla guardada: {path or name} ({len(data) / 1024:.0f} KB)")
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            self.metrics.increment('screenshots_failed')
+            logger.error(f"Error al codificar la captura {name}: {e}")
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def recent(self):
+        """Capturas en memoria, de la más nueva a la más vieja (por orden de captura, no de codificación)"""
+        with self._lock:
+            captures = list(self._ring) if self._ring is not None else []
+        return sorted(captures, key=lambda capture: capture.seq, reverse=True)
+
+    def get(self, name):
+        """Captura en memoria por nombre (None si no está o ya salió del anillo)"""
+        for capture in self.recent():
+            if capture.name == name:
+                return capture
+        return None
+
+    def wait_idle(self, timeout=None):
+        """Esperar a que terminen las codificaciones pendientes (benchmarks y pruebas)"""
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        while self.pending:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self):
+        """Terminar de codificar y escribir lo pendiente"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'format': self.config['format'],
+                'params': dict(self.params),
+                'pending': self.pending,
+                'captured': self.captured,
+                'encoded': self.encoded,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'bytes': self.bytes_written,
+                'in_memory': len(self._ring) if self._ring is not None else 0
+            }
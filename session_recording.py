@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Grabación y reproducción de sesiones de landmarks
+Formato binario de registros fijos que se abre con numpy.memmap
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import numpy as np
+from config import GESTURE_ACTIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GSTREC01'
+HEADER_ALIGN = 64
+
+# Un registro por frame procesado (hay o no mano)
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('landmarks', '<f4', (21, 3)),
+    ('has_hand', 'u1'),
+    ('handedness', 'u1'),
+    ('gesture', 'u1'),
+    ('reserved', 'u1'),
+    ('confidence', '<f4')
+])
+
+HANDEDNESS_CODES = {None: 0, 'Left': 1, 'Right': 2}
+HANDEDNESS_NAMES = {code: name for name, code in HANDEDNESS_CODES.items()}
+
+
+def _build_header(gesture_names):
+    """Cabecera: magic + longitud + JSON, alineada para que los registros empiecen en múltiplo de 64"""
+    meta = json.dumps({
+        'version': 1,
+        'record_size': RECORD_DTYPE.itemsize,
+        'gestures': gesture_names
+    }).encode('utf-8')
+    size = len(MAGIC) + 4 + len(meta)
+    padding = -size % HEADER_ALIGN
+    return MAGIC + struct.pack('<I', len(meta) + padding) + meta + b' ' * padding
+
+
+def _read_header(f):
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError("El archivo no es una sesión de landmarks")
+    (meta_size,) = struct.unpack('<I', f.read(4))
+    meta = json.loads(f.read(meta_size).decode('utf-8'))
+    if meta.get('record_size') != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Tamaño de registro incompatible: {meta.get('record_size')}")
+    return meta, len(MAGIC) + 4 + meta_size
+
+
+class SessionRecorder:
+    """Agregar registros de landmarks/gesto a un archivo de sesión"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records_written = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Continuar una sesión existente con su propia tabla de gestos
+            with open(path, 'rb') as f:
+                meta, _ = _read_header(f)
+            self.gesture_names = meta['gestures']
+        else:
+            self.gesture_names = [None] + list(GESTURE_ACTIONS.keys())
+            with open(path, 'wb') as f:
+                f.write(_build_header(self.gesture_names))
+
+        self._gesture_codes = {name: code for code, name in enumerate(self.gesture_names)}
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._file = open(path, 'ab')
+
+    def record(self, timestamp, landmarks, handedness, gesture, confidence):
+        """Escribir un registro; landmarks es None cuando no se detectó mano"""
+        rec = self._record[0]
+        rec['timestamp'] = timestamp
+        if landmarks is not None:
+            rec['landmarks'] = landmarks
+            rec['has_hand'] = 1
+        else:
+            rec['landmarks'] = 0
+            rec['has_hand'] = 0
+        rec['handedness'] = HANDEDNESS_CODES.get(handedness, 0)
+        rec['gesture'] = self._gesture_codes.get(gesture, 0)
+        rec['confidence'] = confidence
+        self._file.write(self._record.tobytes())
+        self.records_written += 1
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            logger.info(f"Sesión guardada: {self.path} ({self.records_written} registros)")
+
+
+class SessionReplay:
+    """Lectura de una sesión mediante numpy.memmap (no carga el archivo en memoria)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.meta, offset = _read_header(f)
+        self.gesture_names = self.meta['gestures']
+        # Ignorar un registro final incompleto (grabación interrumpida)
+        count = (os.path.getsize(path) - offset) // RECORD_DTYPE.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records['timestamp']
+
+    @property
+    def landmarks(self):
+        return self.records['landmarks']
+
+    @property
+    def has_hand(self):
+        return self.records['has_hand'].astype(bool)
+
+    def gesture_labels(self):
+        """Gestos grabados como arreglo de nombres (None sin gesto)"""
+        table = np.array(self.gesture_names, dtype=object)
+        return table[self.records['gesture']]
+
+    def frames(self):
+        """Iterar (timestamp, landmarks o None, mano, gesto, confianza) como en vivo"""
+        for rec in self.records:
+            landmarks = rec['landmarks'] if rec['has_hand'] else None
+            yield (float(rec['timestamp']), landmarks, HANDEDNESS_NAMES.get(int(rec['handedness'])),
+                   self.gesture_names[rec['gesture']], float(rec['confidence']))
+
+
+def main():
+    """Reclasificar una sesión grabada y medir las decisiones sin cámara"""
+    from gesture_batch import classify_batch, FINGER_RULES
+    from gesture_decision import GestureDecisionEngine, evaluate_session
+    from metrics import MetricsRegistry
+
+    parser = argparse.ArgumentParser(description="Reproducir una sesión de landmarks")
+    parser.add_argument('path')
+    parser.add_argument('--rule', choices=list(FINGER_RULES), default='debug')
+    parser.add_argument('--window', type=int, default=8, help="Frames en la ventana de votación")
+    parser.add_argument('--hold', type=float, default=None, help="Tiempo de mantenimiento (s)")
+    parser.add_argument('--cooldown', type=float, default=2.0)
+    parser.add_argument('--confirm', type=float, default=0.5,
+                        help="Segundos tras un disparo en los que el gesto debe seguir presente")
+    parser.add_argument('--sweep', action='store_true', help="Probar combinaciones de ventana y hold")
+    args = parser.parse_args()
+
+    session = SessionReplay(args.path)
+    if len(session) == 0:
+        print("Sesión vacía")
+        return 0
+
+    has_hand = session.has_hand
+    labels, confidences, _ = classify_batch(session.landmarks, args.rule)
+    labels[~has_hand] = None
+    confidences[~has_hand] = 0.0
+
+    recorded = session.gesture_labels()
+    changed = int(np.count_nonzero(labels != recorded))
+    duration = float(session.timestamps[-1] - session.timestamps[0])
+    print(f"Registros: {len(session)} | Duración: {duration:.1f} s | Con mano: {int(has_hand.sum())}")
+    print(f"Gestos distintos a los grabados: {changed}")
+
+    def evaluate(window, hold):
+        engine = GestureDecisionEngine(window=window, hold_time=hold, cooldown=args.cooldown,
+                                       metrics=MetricsRegistry())
+        return evaluate_session(session.timestamps, labels, confidences, engine, args.confirm)
+
+    if args.sweep:
+        rows = []
+        for window in (3, 5, 8, 12):
+            for hold in (0.0, 0.2, 0.35, 0.5, 0.75):
+                result = evaluate(window, hold)
+                rows.append((result['false_rate'], result['ttt_median'], window, hold, result))
+        # Primero los más estables y, entre ellos, los de menor latencia
+        rows.sort(key=lambda row: (round(row[0], 3), row[1]))
+        print(f"{'ventana':>7} {'hold':>5} {'disparos':>8} {'falsos':>7} {'ttt p50':>8} {'ttt p95':>8}")
+        for false_rate, _, window, hold, result in rows:
+            print(f"{window:>7} {hold:>5.2f} {result['triggers']:>8} {false_rate:>7.1%} "
+                  f"{result['ttt_median'] * 1000:>6.0f}ms {result['ttt_p95'] * 1000:>6.0f}ms")
+        return 0
+
+    result = evaluate(args.window, args.hold)
+    print(f"Acciones simuladas: {result['triggers']} | Disparos falsos: {result['false_triggers']} "
+          f"({result['false_rate']:.1%})")
+    print(f"Tiempo hasta disparo: p50 {result['ttt_median'] * 1000:.0f} ms | p95 {result['ttt_p95'] * 1000:.0f} ms")
+    for gesture, count in sorted(result['per_gesture'].items()):
+        print(f"  {gesture}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
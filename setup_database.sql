@@ -12,21 +12,32 @@ CREATE TABLE IF NOT EXISTS acciones (
     gesto VARCHAR(50) NOT NULL,
     accion_ejecutada VARCHAR(100) NOT NULL,
     confianza DECIMAL(5,2) NOT NULL,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME(6) NULL
+);
+
+-- Resumen por gesto, mantenido de forma incremental por la aplicación
+CREATE TABLE IF NOT EXISTS acciones_resumen (
+    gesto VARCHAR(50) NOT NULL PRIMARY KEY,
+    total_uses BIGINT NOT NULL DEFAULT 0,
+    confidence_sum DECIMAL(16,2) NOT NULL DEFAULT 0,
+    last_used VARCHAR(40) NULL
 );
 
 -- Crear índices para mejorar el rendimiento
 CREATE INDEX idx_gesto ON acciones(gesto);
 CREATE INDEX idx_timestamp ON acciones(timestamp);
 CREATE INDEX idx_usuario_id ON acciones(usuario_id);
+-- Paginación por cursor de /api/actions (orden created_at DESC, id DESC)
+CREATE INDEX idx_acciones_created_at ON acciones(created_at, id);
 
 -- Insertar algunos datos de ejemplo (opcional)
-INSERT INTO acciones (gesto, accion_ejecutada, confianza) VALUES
-('mano_abierta', 'Abrir navegador Chrome', 0.95),
-('puño_cerrado', 'Cerrar ventana activa', 0.88),
-('pulgar_arriba', 'Subir volumen del sistema', 0.92),
-('dos_dedos', 'Tomar captura de pantalla', 0.85),
-('rock_roll', 'Refrescar página (F5)', 0.90);
+INSERT INTO acciones (gesto, accion_ejecutada, confianza, created_at) VALUES
+('mano_abierta', 'Abrir navegador Chrome', 0.95, UTC_TIMESTAMP(6)),
+('puño_cerrado', 'Cerrar ventana activa', 0.88, UTC_TIMESTAMP(6)),
+('pulgar_arriba', 'Subir volumen del sistema', 0.92, UTC_TIMESTAMP(6)),
+('dos_dedos', 'Tomar captura de pantalla', 0.85, UTC_TIMESTAMP(6)),
+('rock_roll', 'Refrescar página (F5)', 0.90, UTC_TIMESTAMP(6));
 
 -- Verificar que la tabla se creó correctamente
 SELECT * FROM acciones LIMIT 5; 
\ No newline at end of file
@@ -90,27 +90,29 @@ def check_camera():
     logger.info("🔍 Verificando cámara...")
     
     try:
-        import cv2
-        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+        from config import CAMERA_CONFIG
+        from frame_sources import create_source
+        source = create_source(CAMERA_CONFIG.get('source') or 0, CAMERA_CONFIG)
         
-        if not cap.isOpened():
-            logger.error("❌ No se pudo abrir la cámara")
+        if not source.open():
+            logger.error(f"❌ No se pudo abrir la fuente {source.name}")
             logger.info("💡 Verifica:")
             logger.info("   - Que la cámara esté conectada")
             logger.info("   - Que no esté siendo usada por otra aplicación")
             logger.info("   - Los permisos de cámara en Windows")
-            cap.release()
+            logger.info("   - O usa CAMERA_SOURCE=synthetic para probar sin cámara")
+            source.release()
             return False
         
         # Leer un frame de prueba
-        ret, frame = cap.read()
+        ret, frame = source.read()
         if not ret or frame is None:
             logger.error("❌ No se pudo leer frame de la cámara")
-            cap.release()
+            source.release()
             return False
         
-        logger.info(f"✅ Cámara funcionando - Resolución: {frame.shape[1]}x{frame.shape[0]}")
-        cap.release()
+        logger.info(f"✅ Fuente {source.name} funcionando - Resolución: {frame.shape[1]}x{frame.shape[0]}")
+        source.release()
         return True
         
     except Exception as e:
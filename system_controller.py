@@ -1,18 +1,131 @@
+import shutil
 import subprocess
-import pyautogui
 import os
+import sys
+import threading
 import time
 import logging
-from config import GESTURE_ACTIONS
+from config import GESTURE_ACTIONS, ACTIONS_CONFIG
+from screenshot_pipeline import ScreenshotPipeline
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SystemController:
+# Rutas habituales de Chrome; las del PATH se buscan con shutil.which
+CHROME_CANDIDATES = [
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    "chrome", "google-chrome", "google-chrome-stable", "chromium", "chromium-browser"
+]
+
+def resolve_chrome_command(configured=None):
+    """Comando para abrir Chrome, resuelto una sola vez (None si no se encuentra)"""
+    for candidate in ([configured] if configured else []) + CHROME_CANDIDATES:
+        path = candidate if os.path.isfile(candidate) else shutil.which(candidate)
+        if path:
+            return [path]
+    # Último recurso en Windows: que el shell resuelva la asociación
+    if sys.platform == 'win32':
+        return ['cmd', '/c', 'start', '', 'chrome']
+    return None
+
+class PyAutoGUIBackend:
+    """Teclado, pantalla y procesos reales (pyautogui se importa solo al usarlo)"""
+    
+    name = 'pyautogui'
+    
     def __init__(self):
+        import pyautogui
+        self.pyautogui = pyautogui
         # Configurar pyautogui para mayor seguridad
         pyautogui.FAILSAFE = True
         pyautogui.PAUSE = 0.1
+    
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys)
+    
+    def press(self, key, presses=1, interval=0.0):
+        self.pyautogui.press(key, presses=presses, interval=interval)
+    
+    def pause(self, seconds):
+        time.sleep(seconds)
+    
+    def screenshot(self):
+        return self.pyautogui.screenshot()
+    
+    def launch(self, command):
+        subprocess.Popen(command)
+
+class RecordingBackend:
+    """Backend sin pantalla: registra cada llamada en lugar de ejecutarla.
+    
+    Permite medir el despachador de acciones en un servidor Linux sin
+    escritorio. delay_scale multiplica las pausas de las acciones (0 = no esperar)
+    y latency simula el costo de cada llamada.
+    """
+    
+    name = 'recording'
+    
+    def __init__(self, delay_scale=0.0, latency=0.0):
+        self.delay_scale = delay_scale
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+    
+    def _record(self, call, *args):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append((time.time(), call) + args)
+    
+    def hotkey(self, *keys):
+        self._record('hotkey', *keys)
+    
+    def press(self, key, presses=1, interval=0.0):
+        if self.delay_scale and presses > 1:
+            time.sleep(interval * (presses - 1) * self.delay_scale)
+        self._record('press', key, presses)
+    
+    def pause(self, seconds):
+        if self.delay_scale:
+            time.sleep(seconds * self.delay_scale)
+        self._record('pause', seconds)
+    
+    def screenshot(self):
+        self._record('screenshot')
+        return _RecordedImage(self)
+    
+    def launch(self, command):
+        self._record('launch', tuple(command))
+
+class _RecordedImage:
+    mode = 'RGB'
+    
+    def __init__(self, backend):
+        self.backend = backend
+    
+    def save(self, fp, format=None, **params):
+        self.backend._record('save', format)
+
+def create_backend(name=None):
+    """Backend de acciones según ACTIONS_CONFIG ('pyautogui' o 'recording')"""
+    name = name or ACTIONS_CONFIG['backend']
+    if name == 'recording':
+        return RecordingBackend()
+    if name == 'pyautogui':
+        return PyAutoGUIBackend()
+    raise ValueError(f"Backend de acciones no soportado: {name}")
+
+class SystemController:
+    def __init__(self, backend=None, screenshot_config=None):
+        self.backend = backend or create_backend()
+        # Las capturas se codifican y guardan fuera del hilo de la acción
+        self.screenshots = ScreenshotPipeline(self.backend.screenshot, screenshot_config)
+        # La ruta de Chrome se busca una vez, no en cada gesto
+        self.chrome_command = resolve_chrome_command(ACTIONS_CONFIG.get('chrome_path'))
+        if self.chrome_command is None:
+            logger.warning("No se encontró Chrome: la acción 'chrome' fallará")
         
         # Mapeo de comandos a funciones
         self.action_handlers = {
@@ -23,8 +136,8 @@ class SystemController:
             'f5': self._refresh_page
         }
     
-    def execute_action(self, gesture):
-        """Ejecutar la acción correspondiente al gesto"""
+    def execute_action(self, gesture, repeat=1):
+        """Ejecutar la acción correspondiente al gesto (repeat: repeticiones agrupadas en una llamada)"""
         if gesture not in GESTURE_ACTIONS:
             logger.warning(f"Gesto no reconocido: {gesture}")
             return False
@@ -34,10 +147,10 @@ class SystemController:
         description = action_info['description']
         
         try:
-            logger.info(f"Ejecutando acción: {description}")
+            logger.info(f"Ejecutando acción: {description}" + (f" (x{repeat})" if repeat > 1 else ""))
             
             if command in self.action_handlers:
-                self.action_handlers[command]()
+                self.action_handlers[command](repeat)
             else:
                 logger.error(f"Comando no implementado: {command}")
                 return False
@@ -49,81 +162,60 @@ class SystemController:
             logger.error(f"Error al ejecutar acción {description}: {e}")
             return False
     
-    def _open_chrome(self):
+    def _open_chrome(self, repeat=1):
         """Abrir navegador Chrome"""
         try:
-            # Intentar diferentes rutas de Chrome
-            chrome_paths = [
-                r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-                r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-                "chrome.exe"  # Si está en PATH
-            ]
-            
-            for path in chrome_paths:
-                try:
-                    subprocess.Popen([path], shell=True)
-                    logger.info("Chrome abierto exitosamente")
-                    return
-                except FileNotFoundError:
-                    continue
-            
-            # Si no se encuentra Chrome, intentar con el comando genérico
-            subprocess.Popen(["start", "chrome"], shell=True)
-            
+            if self.chrome_command is None:
+                raise FileNotFoundError("Chrome no está instalado o no está en el PATH")
+            self.backend.launch(self.chrome_command)
+            logger.info("Chrome abierto exitosamente")
         except Exception as e:
             logger.error(f"Error al abrir Chrome: {e}")
             raise
     
-    def _close_active_window(self):
+    def _close_active_window(self, repeat=1):
         """Cerrar la ventana activa"""
         try:
-            pyautogui.hotkey('alt', 'f4')
-            time.sleep(0.5)  # Pequeña pausa para que se procese
+            self.backend.hotkey('alt', 'f4')
+            self.backend.pause(0.5)  # Pequeña pausa para que se procese
         except Exception as e:
             logger.error(f"Error al cerrar ventana: {e}")
             raise
     
-    def _increase_volume(self):
-        """Aumentar el volumen del sistema"""
+    def _increase_volume(self, repeat=1):
+        """Aumentar el volumen del sistema (dos pasos por repetición, en una sola llamada)"""
         try:
-            pyautogui.press('volumeup')
-            time.sleep(0.1)
-            pyautogui.press('volumeup')  # Aumentar dos veces para efecto más notable
+            # Aumentar dos veces para efecto más notable
+            self.backend.press('volumeup', presses=2 * repeat, interval=0.1)
         except Exception as e:
             logger.error(f"Error al aumentar volumen: {e}")
             raise
     
-    def _take_screenshot(self):
-        """Tomar captura de pantalla"""
+    def _take_screenshot(self, repeat=1):
+        """Tomar captura de pantalla (la codificación y el guardado siguen en segundo plano)"""
         try:
-            # Crear directorio de capturas si no existe
-            screenshots_dir = "screenshots"
-            if not os.path.exists(screenshots_dir):
-                os.makedirs(screenshots_dir)
-            
-            # Generar nombre único para la captura
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"{screenshots_dir}/captura_{timestamp}.png"
-            
-            # Tomar captura
-            screenshot = pyautogui.screenshot()
-            screenshot.save(filename)
-            
-            logger.info(f"Captura de pantalla guardada: {filename}")
+            name = self.screenshots.capture()
+            if name is None:
+                raise RuntimeError("Demasiadas capturas pendientes de guardar")
+            logger.info(f"Captura de pantalla tomada: {name}")
             
         except Exception as e:
             logger.error(f"Error al tomar captura de pantalla: {e}")
             raise
     
-    def _refresh_page(self):
+    def _refresh_page(self, repeat=1):
         """Refrescar la página actual (F5)"""
         try:
-            pyautogui.press('f5')
-            time.sleep(0.5)  # Pequeña pausa para que se procese
+            self.backend.press('f5')
+            self.backend.pause(0.5)  # Pequeña pausa para que se procese
         except Exception as e:
             logger.error(f"Error al refrescar página: {e}")
             raise
     
+    def close(self):
+        """Terminar de guardar las capturas pendientes"""
+        self.screenshots.close()
+    
     def get_available_actions(self):
         """Obtener lista de acciones disponibles"""
         return list(GESTURE_ACTIONS.keys())
@@ -0,0 +1,113 @@
+import threading
+import logging
+import time
+import cv2
+import numpy as np
+from frame_slot import VersionedSlot
+from metrics import metrics as default_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MJPEGBroadcastHub:
+    """Difusión MJPEG: cada frame nuevo se codifica una sola vez para todos los clientes.
+
+    El productor solo publica el frame (y su overlay pendiente) como una
+    instantánea de solo lectura en un VersionedSlot. El overlay y la codificación
+    JPEG los hace el primer suscriptor que pide esa generación, dibujando sobre un
+    buffer propio preasignado; los demás reutilizan los mismos bytes. Sin
+    suscriptores no se dibuja ni se codifica nada.
+    """
+
+    def __init__(self, quality=70, metrics=None):
+        self.metrics = metrics or default_metrics
+        self.encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self._cond = threading.Condition()
+        self._slot = VersionedSlot()
+        self._encode_lock = threading.Lock()
+        self._canvas = None
+        self._chunk = None
+        self._chunk_generation = 0
+        self.frames_published = 0
+        self.frames_encoded = 0
+        self.subscribers = 0
+
+    def publish(self, frame, overlay=None):
+        """Publicar un frame nuevo (el hub no lo copia; queda de solo lectura).
+        
+        overlay es un objeto con draw(frame) que se aplica al codificar, sobre una copia.
+        """
+        self._slot.publish(frame, overlay)
+        self.frames_published += 1
+        # El lock solo se toma para despertar a los suscriptores en espera
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def generation(self):
+        return self._slot.generation
+
+    def wait_for_chunk(self, last_generation, timeout=1.0):
+        """Esperar una generación posterior a last_generation.
+
+        Retorna (generación, bytes del chunk multipart) o (last_generation, None)
+        si no llegó nada nuevo dentro del timeout.
+        """
+        snapshot = self._slot.current
+        if snapshot.generation <= last_generation:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._slot.generation > last_generation, timeout):
+                    return last_generation, None
+            snapshot = self._slot.current
+        return self._encode(snapshot.generation, snapshot.frame, snapshot.overlay)
+
+    def _encode(self, generation, frame, overlay=None):
+        with self._encode_lock:
+            # Otro suscriptor ya codificó esta generación (o una más nueva)
+            if self._chunk_generation >= generation:
+                return self._chunk_generation, self._chunk
+            if overlay is not None:
+                start = time.perf_counter()
+                # El frame publicado es compartido: el overlay va sobre el buffer propio del hub
+                if self._canvas is None or self._canvas.shape != frame.shape:
+                    self._canvas = np.empty_like(frame)
+                np.copyto(self._canvas, frame)
+                overlay.draw(self._canvas)
+                frame = self._canvas
+                self.metrics.observe('overlay', time.perf_counter() - start)
+            start = time.perf_counter()
+            ret, buffer = cv2.imencode('.jpg', frame, self.encode_param)
+            self.metrics.observe('jpeg_encode', time.perf_counter() - start)
+            if not ret:
+                logger.warning("Error al codificar frame")
+                return generation, None
+            self._chunk = (b'--frame\r\n'
+                           b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+            self._chunk_generation = generation
+            self.frames_encoded += 1
+            return generation, self._chunk
+
+    def stream(self, timeout=1.0):
+        """Generador multipart para un cliente de /video_feed"""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            last_generation = 0
+            while True:
+                generation, chunk = self.wait_for_chunk(last_generation, timeout)
+                last_generation = generation
+                if chunk is not None:
+                    yield chunk
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def stats(self):
+        """Contadores de publicación, codificación y suscriptores"""
+        return {
+            'generation': self._slot.generation,
+            'frames_published': self.frames_published,
+            'frames_encoded': self.frames_encoded,
+            'subscribers': self.subscribers
+        }